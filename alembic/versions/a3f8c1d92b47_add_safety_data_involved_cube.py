@@ -0,0 +1,69 @@
+"""Add the safety data involved cube table
+
+Revision ID: a3f8c1d92b47
+Revises: e4b7d2a9c613
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "a3f8c1d92b47"
+down_revision = "e4b7d2a9c613"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+sd_involved_cube_table = "safety_data_involved_cube"
+accident_dimensions = [
+    "provider_code",
+    "accident_year",
+    "accident_month",
+    "day_night",
+    "road_type",
+    "vehicles",
+]
+involved_dimensions = [
+    "injury_severity",
+    "injured_type",
+    "sex",
+    "age_group",
+    "population_type",
+]
+
+
+def upgrade():
+    op.create_table(  # pylint: disable=no-member
+        sd_involved_cube_table,
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("provider_code", sa.Integer(), nullable=False),
+        sa.Column("accident_year", sa.Integer(), nullable=False),
+        *[
+            sa.Column(dimension, sa.Integer(), nullable=True)
+            for dimension in accident_dimensions[2:] + involved_dimensions
+        ],
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    # as sd_utils.sd_build_cube, so the cube answers the requests before the next load_data
+    columns = ", ".join(accident_dimensions + involved_dimensions)
+    selected = ", ".join(
+        [f"a.{dimension}" for dimension in accident_dimensions]
+        + [f"i.{dimension}" for dimension in involved_dimensions]
+    )
+    op.execute(
+        f"""
+        INSERT INTO {sd_involved_cube_table} ({columns}, count)
+        SELECT {selected}, count(i._id)
+        FROM safety_data_involved i
+        JOIN safety_data_accident a
+          ON i.provider_code = a.provider_code
+         AND i.accident_id = a.accident_id
+         AND i.accident_year = a.accident_year
+        GROUP BY {selected}
+        """
+    )
+
+
+def downgrade():
+    op.drop_table(sd_involved_cube_table)  # pylint: disable=no-member
@@ -0,0 +1,32 @@
+"""Add the geocoding cache table
+
+Revision ID: b7e2d4f81c35
+Revises: a3f8c1d92b47
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "b7e2d4f81c35"
+down_revision = "a3f8c1d92b47"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+geocoding_cache_table = "geocoding_cache"
+
+
+def upgrade():
+    op.create_table(  # pylint: disable=no-member
+        geocoding_cache_table,
+        sa.Column("key", sa.Text(), primary_key=True, nullable=False),
+        sa.Column("results", postgresql.JSON(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table(geocoding_cache_table)  # pylint: disable=no-member
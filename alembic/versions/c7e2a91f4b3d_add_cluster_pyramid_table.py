@@ -0,0 +1,46 @@
+"""Add cluster pyramid table
+
+Revision ID: c7e2a91f4b3d
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "c7e2a91f4b3d"
+down_revision = "a1b2c3d4e5f6"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        "cluster_pyramid",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("zoom", sa.Integer(), nullable=False),
+        sa.Column("cell_x", sa.BigInteger(), nullable=False),
+        sa.Column("cell_y", sa.BigInteger(), nullable=False),
+        sa.Column("accident_year", sa.Integer(), nullable=True),
+        sa.Column("accident_severity", sa.Integer(), nullable=True),
+        sa.Column("location_accuracy", sa.Integer(), nullable=True),
+        sa.Column("provider_code", sa.Integer(), nullable=True),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("sum_x", sa.Float(), nullable=False),
+        sa.Column("sum_y", sa.Float(), nullable=False),
+        sa.Column("sum_z", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "cluster_pyramid_zoom_cell_idx",
+        "cluster_pyramid",
+        ["zoom", "cell_x", "cell_y"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("cluster_pyramid_zoom_cell_idx", table_name="cluster_pyramid")
+    op.drop_table("cluster_pyramid")
@@ -0,0 +1,80 @@
+"""Add a unique index on the source and link of the news flashes
+
+Revision ID: c9d3e5a7f214
+Revises: b7e2d4f81c35
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "c9d3e5a7f214"
+down_revision = "b7e2d4f81c35"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+news_flash_table = "news_flash"
+index_name = "news_flash_source_link_idx"
+
+
+def upgrade():
+    from anyway.backend_constants import NewsflashLocationQualification
+
+    not_verified = NewsflashLocationQualification.NOT_VERIFIED.value
+    # one news flash of each (source, link) is kept: a manually qualified one, else one with
+    # location verification history, else the first stored one
+    op.execute(
+        f"""
+        CREATE TEMPORARY TABLE news_flash_duplicates ON COMMIT DROP AS
+        SELECT id, kept_id
+        FROM (SELECT n.id,
+                     first_value(n.id) OVER (
+                         PARTITION BY n.source, n.link
+                         ORDER BY (coalesce(n.newsflash_location_qualification, {not_verified})
+                                       <> {not_verified}
+                                   OR n.location_qualifying_user IS NOT NULL) DESC,
+                                  EXISTS (SELECT 1
+                                          FROM location_verification_history h
+                                          WHERE h.news_flash_id = n.id) DESC,
+                                  n.id
+                     ) AS kept_id
+              FROM news_flash n
+              WHERE n.link IS NOT NULL) ids
+        WHERE id <> kept_id
+        """
+    )
+    # the references to the dropped news flashes are moved to the kept ones
+    for table, column in (
+        ("location_verification_history", "news_flash_id"),
+        ("telegram_forwarded_messages", "newsflash_id"),
+    ):
+        op.execute(
+            f"""
+            UPDATE {table} t
+            SET {column} = d.kept_id
+            FROM news_flash_duplicates d
+            WHERE t.{column} = d.id
+            """
+        )
+    # the infographics of the kept news flashes are cached by their own ids
+    for table in ("infographics_data_cache", "infographics_data_cache_temp"):
+        op.execute(
+            f"""
+            DELETE FROM {table} c
+            USING news_flash_duplicates d
+            WHERE c.news_flash_id = d.id
+            """
+        )
+    op.execute(
+        """
+        DELETE FROM news_flash n
+        USING news_flash_duplicates d
+        WHERE n.id = d.id
+        """
+    )
+    op.create_index(index_name, news_flash_table, ["source", "link"], unique=True)
+
+
+def downgrade():
+    op.drop_index(index_name, table_name=news_flash_table)
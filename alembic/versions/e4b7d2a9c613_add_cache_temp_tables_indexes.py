@@ -0,0 +1,41 @@
+"""Add indexes to the cache temp tables, so they can be swapped with the cache tables
+
+Revision ID: e4b7d2a9c613
+Revises: c7e2a91f4b3d
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "e4b7d2a9c613"
+down_revision = "c7e2a91f4b3d"
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index(
+        "infographics_street_data_cache_temp_id_years_idx",
+        "infographics_street_data_cache_temp",
+        ["yishuv_symbol", "street", "years_ago"],
+        unique=True,
+    )
+    op.create_index(
+        "infographics_road_segments_data_cache_temp_id_years_idx",
+        "infographics_road_segments_data_cache_temp",
+        ["road_segment_id", "years_ago"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "infographics_road_segments_data_cache_temp_id_years_idx",
+        table_name="infographics_road_segments_data_cache_temp",
+    )
+    op.drop_index(
+        "infographics_street_data_cache_temp_id_years_idx",
+        table_name="infographics_street_data_cache_temp",
+    )
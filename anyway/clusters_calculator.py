@@ -1,10 +1,60 @@
+import datetime
 import logging
 import time
-from anyway.models import AccidentMarker
-from anyway.pymapcluster import calculate_clusters
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, func, not_, or_, sql
+
+from anyway import globalmaptiles as globaltiles
+from anyway.app_and_db import db
+from anyway.backend_constants import BE_CONST
+from anyway.models import AccidentMarker, ClusterPyramidCell
+from anyway.pymapcluster import (
+    calculate_clusters,
+    cartesian_to_latlngs,
+    grid_cell_coordinates,
+    grid_cell_latlng_bounds,
+    latlngs_to_cartesian,
+    markers_to_latlngs,
+)
+from anyway.utilities import chunks
+
+# above this zoom a bounding box holds few enough markers to cluster them on the fly
+CLUSTER_PYRAMID_ZOOMS = range(0, 14)
+CLUSTER_PYRAMID_BUCKET_COLUMNS = [
+    "accident_year",
+    "accident_severity",
+    "location_accuracy",
+    "provider_code",
+]
+# filter values for which bounding_box_query does not filter the markers at all
+CLUSTER_PYRAMID_NEUTRAL_FILTERS = {
+    "show_markers": True,
+    "show_urban": 3,
+    "show_intersection": 3,
+    "show_lane": 3,
+    "show_day": 7,
+    "show_holiday": 0,
+    "show_time": 24,
+    "weather": 0,
+    "road": 0,
+    "separation": 0,
+    "surface": 0,
+    "acctype": 0,
+    "controlmeasure": 0,
+    "district": 0,
+    "case_type": 0,
+    "light_transportation": False,
+}
 
 
 def retrieve_clusters(**kwargs):
+    if is_covered_by_cluster_pyramid(**kwargs) and is_cluster_pyramid_built(kwargs["zoom"]):
+        start_time = time.time()
+        clusters = retrieve_clusters_from_pyramid(**kwargs)
+        logging.debug("getting clusters from pyramid took %f seconds" % (time.time() - start_time))
+        return clusters
     start_time = time.time()
     result = AccidentMarker.bounding_box_query(is_thin=True, **kwargs)
     accident_markers_in_box = result.accident_markers.all()
@@ -14,3 +64,217 @@ def retrieve_clusters(**kwargs):
     clusters = calculate_clusters(accident_markers_in_box + rsa_markers_in_box, kwargs["zoom"])
     logging.debug("calculating clusters took %f seconds" % (time.time() - start_time))
     return clusters
+
+
+def is_covered_by_cluster_pyramid(**kwargs):
+    """
+    Whether the cluster pyramid buckets can answer the request exactly: only the zoom, whole
+    years, severity, location accuracy and provider filters are supported.
+    """
+    if kwargs["zoom"] not in CLUSTER_PYRAMID_ZOOMS:
+        return False
+    for arg, neutral_value in CLUSTER_PYRAMID_NEUTRAL_FILTERS.items():
+        if kwargs.get(arg, neutral_value) != neutral_value:
+            return False
+    if kwargs.get("start_time", 25) != 25 and kwargs.get("end_time", 25) != 25:
+        return False
+    age_groups = kwargs.get("age_groups")
+    if not age_groups or len(age_groups.split(",")) < BE_CONST.AGE_GROUPS_NUMBER + 1:
+        return False
+    start_date, end_date = kwargs["start_date"], kwargs["end_date"]
+    if (start_date.month, start_date.day) != (1, 1):
+        return False
+    return (end_date.month, end_date.day) == (12, 31) or end_date >= datetime.date.today()
+
+
+def is_cluster_pyramid_built(zoom):
+    return (
+        db.session.query(ClusterPyramidCell.id).filter(ClusterPyramidCell.zoom == zoom).first()
+        is not None
+    )
+
+
+def get_cluster_pyramid_filter(**kwargs):
+    """
+    Mirrors the filters AccidentMarker.bounding_box_query applies to the accident and rsa markers
+    """
+    approx = kwargs.get("approx", True)
+    accurate = kwargs.get("accurate", True)
+    if not accurate and not approx:
+        # bounding_box_query returns neither accident nor rsa markers
+        return sql.false()
+    rsa_filter = ClusterPyramidCell.provider_code == BE_CONST.RSA_PROVIDER_CODE
+    if not kwargs["show_rsa"]:
+        rsa_filter = sql.false()
+    accidents_filter = [ClusterPyramidCell.provider_code != BE_CONST.RSA_PROVIDER_CODE]
+    if not kwargs["show_accidents"]:
+        accidents_filter.append(
+            ClusterPyramidCell.provider_code.notin_(
+                [
+                    BE_CONST.CBS_ACCIDENT_TYPE_1_CODE,
+                    BE_CONST.CBS_ACCIDENT_TYPE_3_CODE,
+                    BE_CONST.UNITED_HATZALA_CODE,
+                ]
+            )
+        )
+    if accurate and not approx:
+        accidents_filter.append(ClusterPyramidCell.location_accuracy == 1)
+    elif approx and not accurate:
+        accidents_filter.append(ClusterPyramidCell.location_accuracy != 1)
+    for arg, severity in (("show_fatal", 1), ("show_severe", 2), ("show_light", 3)):
+        if not kwargs.get(arg, True):
+            accidents_filter.append(ClusterPyramidCell.accident_severity != severity)
+    return or_(rsa_filter, and_(*accidents_filter))
+
+
+def retrieve_clusters_from_pyramid(**kwargs):
+    """
+    The cells fully inside the bounding box are summed from the pyramid. The cells on its edges
+    also hold markers outside of it, so these are clustered from the markers of the bounding box,
+    as retrieve_clusters does without the pyramid.
+    """
+    mercator = globaltiles.GlobalMercator()
+    zoom = kwargs["zoom"]
+    cell_x, cell_y = grid_cell_coordinates(
+        mercator,
+        np.array([float(kwargs["sw_lat"]), float(kwargs["ne_lat"])]),
+        np.array([float(kwargs["sw_lng"]), float(kwargs["ne_lng"])]),
+        zoom,
+    )
+    cells = (int(cell_x.min()), int(cell_y.min()), int(cell_x.max()), int(cell_y.max()))
+    inner_cells = get_inner_cells(*cells)
+    clusters = []
+    if inner_cells is not None:
+        clusters.extend(retrieve_pyramid_cells_clusters(inner_cells, **kwargs))
+    edge_markers = get_edge_markers(mercator, inner_cells, **kwargs)
+    clusters.extend(calculate_clusters(edge_markers, zoom))
+    return clusters
+
+
+def get_inner_cells(min_x, min_y, max_x, max_y):
+    """
+    :returns: (min_x, min_y, max_x, max_y) of the cells inside the cells range, not on its edges,
+    None when there are none
+    """
+    if max_x - min_x < 2 or max_y - min_y < 2:
+        return None
+    return min_x + 1, min_y + 1, max_x - 1, max_y - 1
+
+
+def retrieve_pyramid_cells_clusters(cells_range, **kwargs):
+    min_x, min_y, max_x, max_y = cells_range
+    cells = (
+        db.session.query(
+            func.sum(ClusterPyramidCell.size),
+            func.sum(ClusterPyramidCell.sum_x),
+            func.sum(ClusterPyramidCell.sum_y),
+            func.sum(ClusterPyramidCell.sum_z),
+        )
+        .filter(ClusterPyramidCell.zoom == kwargs["zoom"])
+        .filter(ClusterPyramidCell.cell_x.between(min_x, max_x))
+        .filter(ClusterPyramidCell.cell_y.between(min_y, max_y))
+        .filter(
+            ClusterPyramidCell.accident_year.between(
+                kwargs["start_date"].year, kwargs["end_date"].year
+            )
+        )
+        .filter(get_cluster_pyramid_filter(**kwargs))
+        .group_by(ClusterPyramidCell.cell_x, ClusterPyramidCell.cell_y)
+        .all()
+    )
+    if not cells:
+        return []
+    sizes, sum_x, sum_y, sum_z = (np.array(column, dtype=float) for column in zip(*cells))
+    center_lats, center_lngs = cartesian_to_latlngs(sum_x, sum_y, sum_z)
+    return [
+        {"longitude": float(lng), "latitude": float(lat), "size": int(size)}
+        for lat, lng, size in zip(center_lats, center_lngs, sizes)
+    ]
+
+
+def get_edge_markers(mercator, inner_cells, **kwargs):
+    """
+    :returns: the markers of the bounding box that are not in inner_cells
+    """
+    result = AccidentMarker.bounding_box_query(is_thin=True, **kwargs)
+    queries = [result.accident_markers, result.rsa_markers]
+    if inner_cells is not None:
+        min_x, min_y, max_x, max_y = inner_cells
+        sw_lat, sw_lng, _, _ = grid_cell_latlng_bounds(mercator, min_x, min_y, kwargs["zoom"])
+        _, _, ne_lat, ne_lng = grid_cell_latlng_bounds(mercator, max_x, max_y, kwargs["zoom"])
+        inner_polygon = "POLYGON(({0} {1},{0} {3},{2} {3},{2} {1},{0} {1}))".format(
+            sw_lng, sw_lat, ne_lng, ne_lat
+        )
+        outside_inner = not_(
+            func.ST_Within(AccidentMarker.geom, func.ST_GeomFromText(inner_polygon))
+        )
+        queries = [query.filter(outside_inner) for query in queries]
+    markers = [marker for query in queries for marker in query.all()]
+    if inner_cells is None or not markers:
+        return markers
+    # the markers on the borders of the inner cells are assigned to their cells by the grid
+    cell_x, cell_y = grid_cell_coordinates(mercator, *markers_to_latlngs(markers), kwargs["zoom"])
+    min_x, min_y, max_x, max_y = inner_cells
+    inner = (min_x <= cell_x) & (cell_x <= max_x) & (min_y <= cell_y) & (cell_y <= max_y)
+    return [marker for marker, is_inner in zip(markers, inner) if not is_inner]
+
+
+def aggregate_cluster_pyramid_cells(markers, zoom, mercator):
+    """
+    Aggregates a DataFrame of markers into the cluster pyramid rows of a single zoom level
+    """
+    cell_x, cell_y = grid_cell_coordinates(
+        mercator, markers["latitude"].values, markers["longitude"].values, zoom
+    )
+    cells = (
+        markers.assign(zoom=zoom, cell_x=cell_x, cell_y=cell_y)
+        .groupby(["zoom", "cell_x", "cell_y"] + CLUSTER_PYRAMID_BUCKET_COLUMNS, dropna=False)
+        .agg(size=("x", "size"), sum_x=("x", "sum"), sum_y=("y", "sum"), sum_z=("z", "sum"))
+        .reset_index()
+    )
+    for column in CLUSTER_PYRAMID_BUCKET_COLUMNS:
+        cells[column] = cells[column].astype("Int64")
+    return cells.astype(object).where(cells.notnull(), None)
+
+
+def build_cluster_pyramid(batch_size=5000, provider_code=None):
+    """
+    Rebuilds the cluster_pyramid table from all the markers, should run after every markers import
+    :param provider_code: rebuilds only the cells of the markers of this provider, the cells are
+    bucketed by provider so the cells of the other providers are unchanged
+    """
+    started = time.time()
+    query = (
+        db.session.query(
+            AccidentMarker.latitude,
+            AccidentMarker.longitude,
+            func.extract("year", AccidentMarker.created).label("accident_year"),
+            AccidentMarker.accident_severity,
+            AccidentMarker.location_accuracy,
+            AccidentMarker.provider_code,
+        )
+        .filter(AccidentMarker.latitude.isnot(None))
+        .filter(AccidentMarker.longitude.isnot(None))
+    )
+    cells_query = db.session.query(ClusterPyramidCell)
+    if provider_code is not None:
+        query = query.filter(AccidentMarker.provider_code == provider_code)
+        cells_query = cells_query.filter(ClusterPyramidCell.provider_code == provider_code)
+    markers = pd.read_sql_query(query.statement, db.session.connection())
+    x, y, z = latlngs_to_cartesian(markers["latitude"].values, markers["longitude"].values)
+    markers = markers.assign(x=x, y=y, z=z)
+    mercator = globaltiles.GlobalMercator()
+    cells_query.delete(synchronize_session=False)
+    total = 0
+    for zoom in CLUSTER_PYRAMID_ZOOMS:
+        cells = aggregate_cluster_pyramid_cells(markers, zoom, mercator)
+        for chunk in chunks(cells.to_dict("records"), batch_size):
+            db.session.bulk_insert_mappings(ClusterPyramidCell, chunk)
+        total += len(cells)
+        logging.debug(f"cluster pyramid zoom {zoom}: {len(cells)} cells")
+    db.session.commit()
+    logging.info(
+        f"Built cluster pyramid of {len(markers)} markers into {total} cells"
+        f" in {time.time() - started:.1f} seconds"
+    )
+    return total
@@ -25,3 +25,18 @@ LANGUAGES = {"en": "English", "he": "עברית"}
 #
 # *https://dev.anyway.co.il/ is for the FE team development.
 SERVER_ENV = os.getenv("SERVER_ENV", "prod")
+
+# redis url of the response cache shared by all the server processes, e.g. redis://localhost:6379/0
+# when not set, every process only has its own in-memory cache
+INFOGRAPHICS_RESPONSE_CACHE_URL = os.getenv("INFOGRAPHICS_RESPONSE_CACHE_URL")
+
+# when true, the widgets count accidents from an in-memory columnar copy of the markers views,
+# loaded by each process on first use, instead of querying the db
+ACCIDENTS_STORE_ENABLED = os.getenv("ACCIDENTS_STORE_ENABLED", "false").lower() == "true"
+# answer the /involved/groupby requests the cube covers from it, see sd_utils.sd_build_cube
+SAFETY_DATA_CUBE_ENABLED = os.getenv("SAFETY_DATA_CUBE_ENABLED", "true").lower() == "true"
+
+# a json file of recorded geocoding results, used instead of the google maps api when set,
+# see parsers.geocoding.FixtureBackend
+GEOCODING_FIXTURE_PATH = os.getenv("GEOCODING_FIXTURE_PATH")
+GEOCODING_CACHE_TABLE_ENABLED = os.getenv("GEOCODING_CACHE_TABLE_ENABLED", "true").lower() == "true"
@@ -9,7 +9,7 @@ from io import StringIO
 import jinja2
 import pandas as pd
 from flask import make_response, render_template, abort
-from flask import session
+from flask import session, stream_with_context
 from flask_assets import Environment
 from flask_babel import Babel, gettext
 from flask_compress import Compress
@@ -25,6 +25,17 @@ import json
 from anyway import utilities, secrets
 from anyway.app_and_db import api, get_cors_config
 from anyway.clusters_calculator import retrieve_clusters
+from anyway.vector_tiles import (
+    get_markers_tile,
+    is_valid_tile,
+    MVT_MIMETYPE,
+    TILE_CACHE_TTL_SECONDS,
+)
+from anyway.infographics_response_cache import (
+    get_cache_key,
+    get_cached_response,
+    set_cached_response,
+)
 from anyway.config import ENTRIES_PER_PAGE
 from anyway.constants import CONST
 from anyway.infographics_utils import (
@@ -719,6 +730,17 @@ def clusters():
     return Response(json.dumps({"clusters": results}), mimetype="application/json")
 
 
+@app.route("/tiles/<int:z>/<int:x>/<int:y>.mvt", methods=["GET"])
+def markers_tile(z, x, y):
+    if not is_valid_tile(z, x, y):
+        abort(http_client.BAD_REQUEST)
+    kwargs = get_kwargs()
+    tile = get_markers_tile(z, x, y, **kwargs)
+    response = Response(tile, mimetype=MVT_MIMETYPE)
+    response.headers["Cache-Control"] = "public, max-age={0}".format(TILE_CACHE_TTL_SECONDS)
+    return response
+
+
 @app.route("/highlightpoints", methods=["POST"])
 def highlightpoint():
     highlight = parse_data(HighlightPoint, get_json_object(request))
@@ -1293,20 +1315,26 @@ def infographics_data_by_location():
     mock_data = request.values.get("mock", "false")
     personalized_data = request.values.get("personalized", "false")
     if mock_data == "true":
-        output = get_infographics_mock_data()
+        json_data = json.dumps(get_infographics_mock_data(), default=str)
     elif mock_data == "false":
-        request_params = get_request_params_from_request_values(request.values)
-        if request_params is None:
-            log_bad_request(request)
-            return abort(http_client.NOT_FOUND)
-        output = get_infographics_data_for_location(request_params)
+        cache_key = get_cache_key(request.values)
+        json_data = get_cached_response(cache_key)
+        if json_data is None:
+            request_params = get_request_params_from_request_values(request.values)
+            if request_params is None:
+                log_bad_request(request)
+                return abort(http_client.NOT_FOUND)
+            output = get_infographics_data_for_location(request_params)
+            json_data = json.dumps(output, default=str)
+            if output:
+                set_cached_response(cache_key, json_data)
     else:
         log_bad_request(request)
         return abort(http_client.BAD_REQUEST)
 
     if personalized_data == "true":
-        output = widgets_personalisation_for_user(output)
-    json_data = json.dumps(output, default=str)
+        output = widgets_personalisation_for_user(json.loads(json_data))
+        json_data = json.dumps(output, default=str)
     return Response(json_data, mimetype="application/json")
 
 
@@ -1639,17 +1667,10 @@ app.add_url_rule("/api/test_roles", endpoint=None, view_func=test_roles, methods
 
 @app.route("/involved", methods=["GET"])
 def safety_involved():
-    chunk_size = 4096
     iq = involved_query.InvolvedQuery()
     try:
         res = iq.get_data()
-        j = json.dumps(res, default=str)
-        def generate():
-            chunked = [j[i : i + chunk_size] for i in range(0, len(j), chunk_size)]
-            for c in chunked:
-                yield c
-
-        return Response(generate(), mimetype='application/json')
+        return Response(stream_with_context(res), mimetype="application/json")
     except ValueError as e:
         logging.exception(e)
         return Response(e.args[0], http_client.BAD_REQUEST)
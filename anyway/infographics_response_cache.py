@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ModuleNotFoundError:
+    redis = None
+
+from anyway import config
+
+RESPONSE_CACHE_MAX_SIZE = 1024
+RESPONSE_CACHE_TTL_SECONDS = 10 * 60
+RESPONSE_CACHE_KEY_PREFIX = "infographics-response:"
+GENERATION_KEY = RESPONSE_CACHE_KEY_PREFIX + "generation"
+# request values that don't change the cached response
+IGNORED_REQUEST_VALUES = ("personalized", "mock")
+DEFAULT_REQUEST_VALUES = {"lang": "he"}
+
+# cache key -> (creation time, generation, response json)
+responses_cache = OrderedDict()
+responses_cache_lock = threading.Lock()
+local_generation = 0
+shared_store = None
+
+
+class InMemoryKeyValueStore(object):
+    """
+    The subset of the redis client api the response cache uses, kept in memory.
+    Stands in for a shared redis server in tests and local runs.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._values.get(key, (None, None))
+            if expires is not None and expires < time.time():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._values[key] = (
+                value.encode("utf-8") if isinstance(value, str) else value,
+                time.time() + ex if ex else None,
+            )
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._values.get(key, (0, None))[0]) + 1
+            self._values[key] = (str(value).encode("utf-8"), None)
+            return value
+
+
+def get_shared_store():
+    global shared_store
+    if shared_store is None and config.INFOGRAPHICS_RESPONSE_CACHE_URL:
+        if redis is None:
+            logging.error("INFOGRAPHICS_RESPONSE_CACHE_URL is set, but redis is not installed")
+        else:
+            shared_store = redis.Redis.from_url(config.INFOGRAPHICS_RESPONSE_CACHE_URL)
+    return shared_store
+
+
+def set_shared_store(store):
+    global shared_store
+    shared_store = store
+
+
+def get_cache_key(request_values) -> str:
+    values = dict(DEFAULT_REQUEST_VALUES)
+    values.update(
+        {
+            name: value
+            for name, value in request_values.items()
+            if name not in IGNORED_REQUEST_VALUES
+        }
+    )
+    values_str = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha1(values_str.encode("utf-8")).hexdigest()
+
+
+def get_generation(store) -> int:
+    """
+    :returns: the generation of the cached responses, responses of older generations are stale
+    """
+    if store is None:
+        return local_generation
+    try:
+        return int(store.get(GENERATION_KEY) or 0)
+    except Exception as e:
+        logging.warning(f"failed reading the infographics response cache generation: {e}")
+        return local_generation
+
+
+def get_cached_response(key):
+    """
+    :returns: the cached json of the response, or None
+    """
+    store = get_shared_store()
+    generation = get_generation(store)
+    with responses_cache_lock:
+        cached = responses_cache.get(key)
+        if cached is not None:
+            created, cached_generation, response = cached
+            if (
+                cached_generation == generation
+                and time.time() - created <= RESPONSE_CACHE_TTL_SECONDS
+            ):
+                responses_cache.move_to_end(key)
+                return response
+            del responses_cache[key]
+    if store is None:
+        return None
+    try:
+        response = store.get(f"{RESPONSE_CACHE_KEY_PREFIX}{generation}:{key}")
+    except Exception as e:
+        logging.warning(f"failed reading from the infographics response cache: {e}")
+        return None
+    if response is None:
+        return None
+    response = response.decode("utf-8")
+    set_local_response(key, generation, response)
+    return response
+
+
+def set_local_response(key, generation, response):
+    with responses_cache_lock:
+        responses_cache[key] = (time.time(), generation, response)
+        responses_cache.move_to_end(key)
+        while len(responses_cache) > RESPONSE_CACHE_MAX_SIZE:
+            responses_cache.popitem(last=False)
+
+
+def set_cached_response(key, response: str):
+    store = get_shared_store()
+    generation = get_generation(store)
+    set_local_response(key, generation, response)
+    if store is None:
+        return
+    try:
+        store.set(
+            f"{RESPONSE_CACHE_KEY_PREFIX}{generation}:{key}",
+            response,
+            ex=RESPONSE_CACHE_TTL_SECONDS,
+        )
+    except Exception as e:
+        logging.warning(f"failed writing to the infographics response cache: {e}")
+
+
+def invalidate_responses_cache():
+    """
+    Makes all the cached responses stale, should be called whenever the infographics cache
+    tables change
+    """
+    global local_generation
+    with responses_cache_lock:
+        local_generation += 1
+        responses_cache.clear()
+    store = get_shared_store()
+    if store is not None:
+        try:
+            store.incr(GENERATION_KEY)
+        except Exception as e:
+            logging.warning(f"failed invalidating the infographics response cache: {e}")
@@ -24,6 +24,8 @@ from anyway.parsers.resolution_fields import ResolutionFields as RF
 from anyway.infographics_dictionaries import head_on_collisions_comparison_dict
 from anyway.parsers import infographics_data_cache_updater
 from anyway.widgets.widget import Widget, widgets_dict
+from anyway.widgets.request_context import request_context
+from anyway.widgets.widget_utils import plan_accidents_stats
 
 # We need to import the modules, which in turn imports all the widgets, and registers them, even if they are not
 # explicitly used here
@@ -83,10 +85,18 @@ def convert_roads_fatal_accidents_to_frontend_view(data_dict):
 
 def generate_widgets_data(request_params: RequestParams) -> List[dict]:
     res = []
-    for w in widgets_dict.values():
-        d = w.generate_widget_data(request_params)
-        if d:
-            res.append(d)
+    stats_requests = [
+        stats_request
+        for w in widgets_dict.values()
+        if w.is_relevant(request_params)
+        for stats_request in w.get_stats_requests(request_params)
+    ]
+    with request_context(request_params):
+        plan_accidents_stats(stats_requests)
+        for w in widgets_dict.values():
+            d = w.generate_widget_data(request_params)
+            if d:
+                res.append(d)
     return res
 
 
@@ -159,15 +169,16 @@ def create_infographics_data_for_location(vals: dict) -> str:
     return json.dumps(output, default=str)
 
 
-def create_infographics_items(request_params: RequestParams) -> Dict:
-    def get_dates_comment():
-        return {
-            "date_range": [request_params.start_time.year, request_params.end_time.year],
-            "last_update": datetime.datetime.fromordinal(
-                request_params.end_time.toordinal()
-            ).isoformat(),
-        }
+def get_dates_comment(request_params: RequestParams) -> Dict:
+    return {
+        "date_range": [request_params.start_time.year, request_params.end_time.year],
+        "last_update": datetime.datetime.fromordinal(
+            request_params.end_time.toordinal()
+        ).isoformat(),
+    }
 
+
+def create_infographics_items(request_params: RequestParams) -> Dict:
     try:
         if request_params is None:
             return {}
@@ -183,7 +194,7 @@ def create_infographics_items(request_params: RequestParams) -> Dict:
             "location_info": request_params.location_info.copy(),
             "location_text": request_params.location_text,
             "resolution": request_params.resolution.name,
-            "dates_comment": get_dates_comment(),
+            "dates_comment": get_dates_comment(request_params),
         }
         output[WIDGETS] = generate_widgets_data(request_params)
 
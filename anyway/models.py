@@ -889,6 +889,7 @@ class Involved(Base):
 
 class NewsFlash(Base):
     __tablename__ = "news_flash"
+    __table_args__ = (Index("news_flash_source_link_idx", "source", "link", unique=True),)
     id = Column(BigInteger(), primary_key=True)
     accident = Column(Boolean(), nullable=False)
     author = Column(Text(), nullable=True)
@@ -2951,6 +2952,14 @@ class InfographicsRoadSegmentsDataCache(InfographicsRoadSegmentsDataCacheFields,
 
 class InfographicsRoadSegmentsDataCacheTemp(InfographicsRoadSegmentsDataCacheFields, Base):
     __tablename__ = "infographics_road_segments_data_cache_temp"
+    __table_args__ = (
+        Index(
+            "infographics_road_segments_data_cache_temp_id_years_idx",
+            "road_segment_id",
+            "years_ago",
+            unique=True,
+        ),
+    )
 
 
 class InfographicsTwoRoadsDataCacheFields(object):
@@ -3054,6 +3063,15 @@ class InfographicsStreetDataCache(InfographicsStreetDataCacheFields, Base):
 
 class InfographicsStreetDataCacheTemp(InfographicsStreetDataCacheFields, Base):
     __tablename__ = "infographics_street_data_cache_temp"
+    __table_args__ = (
+        Index(
+            "infographics_street_data_cache_temp_id_years_idx",
+            "yishuv_symbol",
+            "street",
+            "years_ago",
+            unique=True,
+        ),
+    )
 
 
 class CasualtiesCosts(Base):
@@ -3103,6 +3121,41 @@ class CBSLocations(Base):
     latitude = Column(Float(), nullable=True)
 
 
+class GeocodingCache(Base):
+    """Results of the geocoding api by the normalized lookup, see parsers.geocoding"""
+
+    __tablename__ = "geocoding_cache"
+    key = Column(Text(), primary_key=True)
+    results = Column(JSON(), nullable=False)
+    created = Column(DateTime(), default=datetime.datetime.now, nullable=False)
+
+
+class ClusterPyramidCell(Base):
+    """
+    Markers aggregated into the /clusters grid cells of every zoom level, one row per cell and
+    filter bucket. Sums of the unit-sphere coordinates of the markers are kept so that the
+    centroid of any union of rows can be computed without the markers themselves.
+    """
+
+    __tablename__ = "cluster_pyramid"
+    id = Column(BigInteger(), primary_key=True)
+    zoom = Column(Integer(), nullable=False)
+    cell_x = Column(BigInteger(), nullable=False)
+    cell_y = Column(BigInteger(), nullable=False)
+    accident_year = Column(Integer(), nullable=True)
+    accident_severity = Column(Integer(), nullable=True)
+    location_accuracy = Column(Integer(), nullable=True)
+    provider_code = Column(Integer(), nullable=True)
+    size = Column(Integer(), nullable=False)
+    sum_x = Column(Float(), nullable=False)
+    sum_y = Column(Float(), nullable=False)
+    sum_z = Column(Float(), nullable=False)
+    __table_args__ = (
+        Index("cluster_pyramid_zoom_cell_idx", "zoom", "cell_x", "cell_y", unique=False),
+        {},
+    )
+
+
 class TelegramGroupsBase(Base):
     id = Column(Integer(), primary_key=True)
     filter = Column(JSON(), nullable=False, server_default="{}")
@@ -3171,3 +3224,22 @@ class SDInvolved(Base):
             ondelete="CASCADE",
         ),
     )
+
+
+class SDInvolvedCube(Base):
+    """Counts of the involved by the low cardinality dimensions, rebuilt by sd_utils.load_data"""
+
+    __tablename__ = "safety_data_involved_cube"
+    id = Column(Integer(), primary_key=True)
+    provider_code = Column(Integer())
+    accident_year = Column(Integer())
+    accident_month = Column(Integer(), nullable=True)
+    day_night = Column(Integer(), nullable=True)
+    road_type = Column(Integer(), nullable=True)
+    vehicles = Column(Integer(), nullable=True)
+    injury_severity = Column(Integer(), nullable=True)
+    injured_type = Column(Integer(), nullable=True)
+    sex = Column(Integer(), nullable=True)
+    age_group = Column(Integer(), nullable=True)
+    population_type = Column(Integer(), nullable=True)
+    count = Column(Integer())
@@ -1,16 +1,21 @@
+import bisect
 import glob
 import json
 import logging
 import os
 import re
+import resource
 import shutil
+import time
 import traceback
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 
 import math
 import pandas as pd
-from sqlalchemy import or_, event
+from sqlalchemy import and_, or_, event
 from typing import Dict, List
 
 from anyway.parsers.cbs import preprocessing_cbs_files
@@ -85,11 +90,15 @@ from anyway.models import (
 )
 from anyway.parsers.cbs.exceptions import CBSParsingFailed
 from anyway.utilities import ItmToWGS84, time_delta, ImporterUI, truncate_tables, delete_all_rows_from_table, \
-    chunks, run_query_and_insert_to_table_in_chunks
+    chunks, run_query_and_insert_to_table_in_chunks, get_copy_data, copy_data_to_table
 from anyway.db_views import VIEWS
 from anyway.app_and_db import db
+from anyway.clusters_calculator import build_cluster_pyramid
 from anyway.parsers.cbs.s3 import S3DataRetriever
 from anyway.views.safety_data import sd_utils
+from anyway.widgets.accidents_store import invalidate_accidents_stores
+from anyway.infographics_response_cache import invalidate_responses_cache
+from anyway.parsers.locations_index import invalidate_locations_index
 
 street_map_type: Dict[int, List[dict]]
 
@@ -103,6 +112,7 @@ ACCIDENTS = "accidents"
 CITIES = "cities"
 STREETS = "streets"
 ROADS = "roads"
+ROADS_KM_INDEX = "roads_km_index"
 URBAN_INTERSECTION = "urban_intersection"
 NON_URBAN_INTERSECTION = "non_urban_intersection"
 NON_URBAN_INTERSECTION_HEBREW = "non_urban_intersection_hebrew"
@@ -244,21 +254,61 @@ TABLES_DICT = {
 
 coordinates_converter = ItmToWGS84()
 
+# marker fields that hold get_data_value of the accident field with the same name
+DATA_VALUE_FIELDS = [
+    "accident_type",
+    "accident_severity",
+    "location_accuracy",
+    "road_type",
+    "road_shape",
+    "day_type",
+    "police_unit",
+    "one_lane",
+    "multi_lane",
+    "speed_limit",
+    "road_intactness",
+    "road_width",
+    "road_sign",
+    "road_light",
+    "road_control",
+    "weather",
+    "road_surface",
+    "road_object",
+    "object_distance",
+    "didnt_cross",
+    "cross_mode",
+    "cross_location",
+    "cross_direction",
+    "road1",
+    "road2",
+    "yishuv_symbol",
+    "geo_area",
+    "day_night",
+    "day_in_week",
+    "traffic_light",
+    "region",
+    "district",
+    "natural_area",
+    "municipal_status",
+    "yishuv_shape",
+    "street1",
+    "street2",
+    "house_number",
+    "urban_intersection",
+    "non_urban_intersection",
+    "accident_year",
+    "accident_month",
+    "accident_day",
+]
+
 
 def get_street(yishuv_symbol, street_sign, streets):
     """
     extracts the street name using the settlement id and street id
+    :param streets: (yishuv_symbol, street_sign) -> street name, as built by get_files
     """
-    if yishuv_symbol not in streets:
-        # Changed to return blank string instead of None for correct presentation (Omer)
-        return ""
-    street_name = [
-        x[field_names.street_name]
-        for x in streets[yishuv_symbol]
-        if x[field_names.street_sign] == street_sign
-    ]
-    # there should be only one street name, or none if it wasn't found.
-    return street_name[0] if len(street_name) == 1 else ""
+    # Changed to return blank string instead of None for correct presentation (Omer)
+    return streets.get((yishuv_symbol, street_sign), "")
 
 
 def get_address(accident, streets):
@@ -334,28 +384,64 @@ def get_non_urban_intersection_by_junction_number(accident, non_urban_intersecti
         return junction
 
 
-def get_junction(accident, roads):
+def get_roads_km_index(roads):
+    """
+    indexes the junctions of every road by their km, for get_nearest_junction_key
+    :return: road1 -> (sorted kms, [(position in roads, road2)] of those kms)
+    """
+    road_kms = defaultdict(dict)
+    for position, (road1, road2, km) in enumerate(roads):
+        if pd.isnull(km):
+            continue
+        # the first junction at a km is the one the nearest junction search picks
+        road_kms[road1].setdefault(km, (position, road2))
+    roads_km_index = {}
+    for road1, kms in road_kms.items():
+        sorted_kms = sorted(kms)
+        roads_km_index[road1] = (sorted_kms, [kms[km] for km in sorted_kms])
+    return roads_km_index
+
+
+def get_nearest_junction_key(road1, km, roads_km_index, max_distance=100000):
+    """
+    :return: the roads key of the junction nearest to km on road1, the first one in roads
+    when two junctions are as near, or None if there is no junction on the road
+    """
+    if road1 not in roads_km_index or pd.isnull(km):
+        return None
+    kms, junctions = roads_km_index[road1]
+    index = bisect.bisect_left(kms, km)
+    nearest = None
+    for candidate in (index - 1, index):
+        if not 0 <= candidate < len(kms):
+            continue
+        distance = abs(km - kms[candidate])
+        if distance >= max_distance:
+            continue
+        position, road2 = junctions[candidate]
+        if nearest is None or (distance, position) < nearest[:2]:
+            nearest = (distance, position, road2, kms[candidate])
+    if nearest is None:
+        return None
+    return road1, nearest[2], nearest[3]
+
+
+def get_junction(accident, roads, roads_km_index):
     """
     extracts the junction from an accident
     omerxx: added "km" parameter to the calculation to only show the right junction,
     every non-urban accident shows nearest junction with distance and direction
+    :param roads_km_index: get_roads_km_index(roads), as built by get_files
     :return: returns the junction or None if it wasn't found
     """
     if (
             accident.get(field_names.km) is not None
             and accident.get(field_names.non_urban_intersection) is None
     ):
-        min_dist = 100000
-        key = (), ()
-        junc_km = 0
-        for option in roads:
-            if (
-                    accident.get(field_names.road1) == option[0]
-                    and abs(accident["KM"] - option[2]) < min_dist
-            ):
-                min_dist = abs(accident.get(field_names.km) - option[2])
-                key = accident.get(field_names.road1), option[1], option[2]
-                junc_km = option[2]
+        key = get_nearest_junction_key(
+            accident.get(field_names.road1), accident["KM"], roads_km_index
+        )
+        junc_km = key[2] if key is not None else 0
         junction = roads.get(key, None)
         if junction:
             if accident.get(field_names.km) - junc_km > 0:
@@ -417,16 +503,25 @@ def parse_date(accident):
     return accident_date
 
 
-def load_extra_data(accident, streets, roads):
+def load_extra_data(accident, streets, roads, roads_km_index):
     """
     loads more data about the accident
     :return: a dictionary containing all the extra fields and their values
     :rtype: dict
     """
+    main_street, secondary_street = get_streets(accident, streets)
+    junction = get_junction(accident, roads, roads_km_index)
+    return build_extra_data(accident, main_street, secondary_street, junction)
+
+
+def build_extra_data(accident, main_street, secondary_street, junction):
+    """
+    builds the extra data of load_extra_data from the already extracted streets and junction
+    :rtype: dict
+    """
     extra_fields = {}
     # if the accident occurred in an urban setting
     if bool(accident.get(field_names.urban_intersection)):
-        main_street, secondary_street = get_streets(accident, streets)
         if main_street:
             extra_fields[field_names.street1] = main_street
         if secondary_street:
@@ -434,7 +529,6 @@ def load_extra_data(accident, streets, roads):
 
     # if the accident occurred in a non urban setting (highway, etc')
     if bool(accident.get(field_names.non_urban_intersection)):
-        junction = get_junction(accident, roads)
         if junction:
             extra_fields[field_names.junction_name] = junction
 
@@ -456,7 +550,16 @@ def get_data_value(value):
     return None if value is None or math.isnan(value) else int(value)
 
 
-def create_marker(provider_code, accident, streets, roads, non_urban_intersection):
+def get_point_geom(lng, lat):
+    """
+    :returns: EWKT of the marker location, so geom is set while loading the marker
+    """
+    if lng is None or lat is None:
+        return None
+    return "SRID=4326;POINT({} {})".format(lng, lat)
+
+
+def create_marker(provider_code, accident, streets, roads, non_urban_intersection, roads_km_index):
     if field_names.x not in accident or field_names.y not in accident:
         raise ValueError("Missing x and y coordinates")
     if (
@@ -487,7 +590,7 @@ def create_marker(provider_code, accident, streets, roads, non_urban_intersectio
         "provider_code": provider_code,
         "file_type_police": file_type_police,
         "title": "Accident",
-        "description": json.dumps(load_extra_data(accident, streets, roads)),
+        "description": json.dumps(load_extra_data(accident, streets, roads, roads_km_index)),
         "address": get_address(accident, streets),
         "latitude": lat,
         "longitude": lng,
@@ -501,7 +604,7 @@ def create_marker(provider_code, accident, streets, roads, non_urban_intersectio
         "police_unit": get_data_value(accident.get(field_names.police_unit)),
         "mainStreet": main_street,
         "secondaryStreet": secondary_street,
-        "junction": get_junction(accident, roads),
+        "junction": get_junction(accident, roads, roads_km_index),
         "one_lane": get_data_value(accident.get(field_names.one_lane)),
         "multi_lane": get_data_value(accident.get(field_names.multi_lane)),
         "speed_limit": get_data_value(accident.get(field_names.speed_limit)),
@@ -559,34 +662,209 @@ def create_marker(provider_code, accident, streets, roads, non_urban_intersectio
         "y": accident.get(field_names.y),
         "vehicle_type_rsa": None,
         "violation_type_rsa": None,
-        "geom": None,
+        "geom": get_point_geom(lng, lat),
     }
     return marker
 
 
-def import_accidents(provider_code, accidents, streets, roads, non_urban_intersection, **kwargs):
-    logging.debug("Importing markers")
-    accidents_result = []
-    for _, accident in accidents.iterrows():
-        marker = create_marker(provider_code, accident, streets, roads, non_urban_intersection)
-        accidents_result.append(marker)
-    db.session.bulk_insert_mappings(AccidentMarker, accidents_result)
-    db.session.commit()
-    logging.debug("Finished Importing markers")
-    logging.debug("Inserted " + str(len(accidents_result)) + " new accident markers")
-    fill_db_geo_data()
-    return len(accidents_result)
+def get_data_values(column):
+    """
+    column version of get_data_value
+    """
+    return [None if math.isnan(value) else int(value) for value in column.astype(float).tolist()]
+
+
+def get_column_data_values(accidents, field):
+    if field not in accidents:
+        return [None] * len(accidents)
+    return get_data_values(accidents[field])
+
+
+def get_street_names(yishuv_symbols, street_signs, streets):
+    """
+    column version of get_street
+    """
+    return [
+        streets.get((yishuv_symbol, street_sign), "")
+        for yishuv_symbol, street_sign in zip(yishuv_symbols.tolist(), street_signs.tolist())
+    ]
+
+
+def get_cities_names():
+    return dict(db.session.query(City.yishuv_symbol, City.heb_name).all())
 
 
-def import_involved(provider_code, involved, **kwargs):
-    logging.debug("Importing involved")
+def get_city_names(yishuv_symbols, cities_names):
+    """
+    column version of City.get_name_from_symbol_or_none
+    """
+    return [
+        None if math.isnan(symbol) else cities_names.get(int(symbol))
+        for symbol in yishuv_symbols.astype(float).tolist()
+    ]
+
+
+def parse_dates(accidents):
+    """
+    column version of parse_date
+    """
+    minutes = accidents[field_names.accident_hour].astype(float) * 15 - 15
+    dates = pd.to_datetime(
+        pd.DataFrame(
+            {
+                "year": accidents[field_names.accident_year].astype(int),
+                "month": accidents[field_names.accident_month].astype(int),
+                "day": accidents[field_names.accident_day].astype(int),
+                "hour": (minutes // 60).astype(int),
+                "minute": (minutes % 60).astype(int),
+            }
+        )
+    )
+    return dates.dt.to_pydatetime().tolist()
+
+
+def get_addresses(street_names, house_numbers, settlements):
+    """
+    column version of get_address, given the extracted main streets and settlements
+    """
+    addresses = []
+    for street, house_number, settlement in zip(street_names, house_numbers, settlements):
+        if not street:
+            addresses.append("")
+            continue
+        # the house_number field is invalid if it's empty or if it contains 9999
+        house_number = house_number if house_number != 9999 else None
+        if not house_number and not settlement:
+            addresses.append(street)
+        elif not house_number and settlement:
+            addresses.append("{}, {}".format(street, settlement))
+        elif house_number and not settlement:
+            addresses.append("{} {}".format(street, house_number))
+        else:
+            addresses.append("{} {}, {}".format(street, house_number, settlement))
+    return addresses
+
+
+def create_markers(
+    provider_code,
+    accidents,
+    streets,
+    roads,
+    non_urban_intersection,
+    roads_km_index,
+    cities_names=None,
+):
+    """
+    column version of create_marker, creates the markers of all the accidents at once
+    :param cities_names: get_cities_names(), when already computed
+    :return: list of markers, identical to calling create_marker for every accident row
+    """
+    if field_names.x not in accidents or field_names.y not in accidents:
+        raise ValueError("Missing x and y coordinates")
+    # rows as iterrows would give them, for the fields that keep the raw csv values
+    rows = [
+        dict(zip(accidents.columns, values)) for values in accidents.to_numpy().tolist()
+    ]
+    x = accidents[field_names.x].astype(float)
+    y = accidents[field_names.y].astype(float)
+    has_coordinates = (x.fillna(0) != 0) & (y.fillna(0) != 0)
+    lngs = [None] * len(accidents)
+    lats = [None] * len(accidents)
+    if has_coordinates.any():
+        converted_lngs, converted_lats = coordinates_converter.convert(
+            x[has_coordinates].values, y[has_coordinates].values
+        )
+        for index, lng, lat in zip(
+            has_coordinates.values.nonzero()[0], converted_lngs.tolist(), converted_lats.tolist()
+        ):
+            lngs[index] = lng
+            lats[index] = lat
+
+    if cities_names is None:
+        cities_names = get_cities_names()
+    yishuv_symbols = accidents[field_names.yishuv_symbol]
+    street1_names = get_street_names(yishuv_symbols, accidents[field_names.street1], streets)
+    street2_names = get_street_names(yishuv_symbols, accidents[field_names.street2], streets)
+    city_names = get_city_names(yishuv_symbols, cities_names)
+    addresses = get_addresses(
+        street1_names, get_column_data_values(accidents, field_names.house_number), city_names
+    )
+    junctions = [get_junction(row, roads, roads_km_index) for row in rows]
+
+    kms = accidents[field_names.km].astype(float).tolist()
+    accident_datetimes = parse_dates(accidents)
+    data_values = {
+        field: get_column_data_values(accidents, getattr(field_names, field))
+        for field in DATA_VALUE_FIELDS
+    }
+    data_values["km_raw"] = get_data_values(accidents[field_names.km])
+    data_values["accident_hour_raw"] = get_column_data_values(accidents, field_names.accident_hour)
+    ids = get_data_values(accidents[field_names.id])
+
+    markers = []
+    for index, row in enumerate(rows):
+        km = None if math.isnan(kms[index]) else str(kms[index])
+        km_accurate = None
+        if km is not None:
+            km_accurate = False if "-" in km else True
+            km = float(km.strip("-"))
+        file_type_police = row.get(field_names.file_type_police)
+        if file_type_police is None:
+            file_type_police = provider_code
+        accident_datetime = accident_datetimes[index]
+        marker = {
+            "id": ids[index],
+            "provider_and_id": int(str(provider_code) + str(ids[index])),
+            "provider_code": provider_code,
+            "file_type_police": file_type_police,
+            "title": "Accident",
+            "description": json.dumps(
+                build_extra_data(row, addresses[index], street2_names[index], junctions[index])
+            ),
+            "address": addresses[index],
+            "latitude": lats[index],
+            "longitude": lngs[index],
+            "created": accident_datetime,
+            "mainStreet": addresses[index],
+            "secondaryStreet": street2_names[index],
+            "junction": junctions[index],
+            "km": km,
+            "km_accurate": km_accurate,
+            "yishuv_name": city_names[index],
+            "street1_hebrew": street1_names[index],
+            "street2_hebrew": street2_names[index],
+            "non_urban_intersection_hebrew": get_non_urban_intersection(row, roads),
+            "non_urban_intersection_by_junction_number": get_non_urban_intersection_by_junction_number(
+                row, non_urban_intersection
+            ),
+            "accident_hour": accident_datetime.hour,
+            "accident_minute": accident_datetime.minute,
+            "x": row.get(field_names.x),
+            "y": row.get(field_names.y),
+            "vehicle_type_rsa": None,
+            "violation_type_rsa": None,
+            "geom": get_point_geom(lngs[index], lats[index]),
+        }
+        marker.update({field: values[index] for field, values in data_values.items()})
+        markers.append(marker)
+    return markers
+
+
+def get_frame_batches(frame, batch_size):
+    for start in range(0, len(frame), batch_size):
+        yield frame.iloc[start : start + batch_size]
+
+
+def create_involved(provider_code, involved, cities_names):
     involved_result = []
-    for _, involve in involved.iterrows():
+    yishuv_names = get_city_names(involved[field_names.involve_yishuv_symbol], cities_names)
+    for index, (_, involve) in enumerate(involved.iterrows()):
         if not involve.get(field_names.id) or pd.isnull(
                 involve.get(field_names.id)
         ):  # skip lines with no accident id
             continue
-        file_type_police = involve.get(field_names.file_type_police)
+        # iterrows upcasts the int columns of a row with a float value to floats
+        file_type_police = get_data_value(involve.get(field_names.file_type_police))
         if file_type_police is None:
             file_type_police = provider_code
         involved_result.append(
@@ -604,9 +882,7 @@ def import_involved(provider_code, involved, **kwargs):
                 "involve_yishuv_symbol": get_data_value(
                     involve.get(field_names.involve_yishuv_symbol)
                 ),
-                "involve_yishuv_name": City.get_name_from_symbol_or_none(
-                    involve.get(field_names.involve_yishuv_symbol)
-                ),
+                "involve_yishuv_name": yishuv_names[index],
                 "injury_severity": get_data_value(involve.get(field_names.injury_severity)),
                 "injured_type": get_data_value(involve.get(field_names.injured_type)),
                 "injured_position": get_data_value(involve.get(field_names.injured_position)),
@@ -629,21 +905,18 @@ def import_involved(provider_code, involved, **kwargs):
                 "accident_month": get_data_value(involve.get(field_names.accident_month)),
             }
         )
-    db.session.bulk_insert_mappings(Involved, involved_result)
-    db.session.commit()
-    logging.debug("Finished Importing involved")
-    return len(involved_result)
+    return involved_result
 
 
-def import_vehicles(provider_code, vehicles, **kwargs):
-    logging.debug("Importing vehicles")
+def create_vehicles(provider_code, vehicles):
     vehicles_result = []
     for _, vehicle in vehicles.iterrows():
-        file_type_police = vehicle.get(field_names.file_type_police)
+        # iterrows upcasts the int columns of a row with a float value to floats
+        file_type_police = get_data_value(vehicle.get(field_names.file_type_police))
         if file_type_police is None:
             file_type_police = provider_code
-        engine_volume = vehicle.get(field_names.engine_volume)
-        if engine_volume is None or math.isnan(engine_volume):
+        engine_volume = get_data_value(vehicle.get(field_names.engine_volume))
+        if engine_volume is None:
             engine_volume = 0
         vehicles_result.append(
             {
@@ -665,26 +938,28 @@ def import_vehicles(provider_code, vehicles, **kwargs):
                 "vehicle_damage": get_data_value(vehicle.get(field_names.vehicle_damage)),
             }
         )
-    db.session.bulk_insert_mappings(Vehicle, vehicles_result)
-    db.session.commit()
-    logging.debug("Finished Importing vehicles")
-    return len(vehicles_result)
+    return vehicles_result
 
 
 def get_files(directory):
     def read_streets(df):
-        streets_map = {}
-        groups = df.groupby(field_names.settlement)
-        for key, settlement in groups:
-            streets_map[key] = [
-                {
-                    field_names.street_sign: x[field_names.street_sign],
-                    field_names.street_name: str(x[field_names.street_name]),
-                }
-                for _, x in settlement.iterrows() if isinstance(x[field_names.street_name], str) \
-                    or ((isinstance(x[field_names.street_name], int) or isinstance(x[field_names.street_name], float)) and x[field_names.street_name] > 0)
-            ]
-        return {STREETS: streets_map}
+        streets = {}
+        for yishuv_symbol, street_sign, street_name in zip(
+            df[field_names.settlement].tolist(),
+            df[field_names.street_sign].tolist(),
+            df[field_names.street_name].tolist(),
+        ):
+            if pd.isnull(yishuv_symbol) or pd.isnull(street_sign):
+                continue
+            if not (
+                isinstance(street_name, str)
+                or (isinstance(street_name, (int, float)) and street_name > 0)
+            ):
+                continue
+            key = (yishuv_symbol, street_sign)
+            # a street sign that appears twice in a settlement has no single name
+            streets[key] = "" if key in streets else str(street_name)
+        return {STREETS: streets}
 
     def read_non_urban_intersection(df):
         roads = {
@@ -696,7 +971,11 @@ def get_files(directory):
         non_urban_intersection = {
             x[field_names.junction]: x[field_names.junction_name] for _, x in df.iterrows()
         }
-        return {ROADS: roads, NON_URBAN_INTERSECTION: non_urban_intersection}
+        return {
+            ROADS: roads,
+            ROADS_KM_INDEX: get_roads_km_index(roads),
+            NON_URBAN_INTERSECTION: non_urban_intersection,
+        }
 
     def get_single_file(filename):
         files = [path for path in os.listdir(directory) if filename.lower() in path.lower()]
@@ -730,38 +1009,183 @@ def get_files(directory):
     return output_files_dict
 
 
-def import_to_datastore(directory, provider_code, year, batch_size) -> int:
+def get_memory_mb():
+    """
+    :return: the current resident memory of the process, None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * resource.getpagesize() / 2**20
+
+
+def log_file_load_stats(directory, file_name, rows_count, started, started_memory_mb):
+    """
+    :param started_memory_mb: get_memory_mb() when the load of the file started
+    """
+    memory_mb = get_memory_mb()
+    memory = ""
+    if memory_mb is not None and started_memory_mb is not None:
+        memory = (
+            f", memory {memory_mb:.0f} MB ({memory_mb - started_memory_mb:+.0f} MB by the file)"
+        )
+    # ru_maxrss is in kilobytes on linux, and is the peak of the whole process so far
+    process_peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logging.info(
+        f"Loaded {rows_count} rows of {file_name} from {directory}"
+        f" in {time.time() - started:.1f} seconds{memory}, process peak {process_peak_mb:.0f} MB"
+    )
+
+
+def get_copy_batches(create_rows, frame, batch_size):
+    """
+    :param create_rows: creates the table rows of a part of frame
+    :return: generator of the (columns, rows count, copy data) of every batch_size rows of frame,
+    each batch is created when it is reached
+    """
+    for frame_batch in get_frame_batches(frame, batch_size):
+        rows = create_rows(frame_batch)
+        if rows:
+            columns = list(rows[0].keys())
+            yield columns, len(rows), get_copy_data(rows, columns)
+
+
+def transform_directory(directory, provider_code, batch_size, cities_names):
+    """
+    parses the files of a cbs directory into batches ready to be loaded by load_directory.
+    doesn't access the db, so it can run in the import workers.
+    :return: the cbs dictionary of the directory, and generators of the batches of every loaded
+    file, so loading them one after the other keeps a single batch in memory
+    """
+    files_from_cbs = get_files(directory)
+    create_accident_markers = partial(
+        create_markers,
+        provider_code,
+        streets=files_from_cbs[STREETS],
+        roads=files_from_cbs[ROADS],
+        non_urban_intersection=files_from_cbs[NON_URBAN_INTERSECTION],
+        roads_km_index=files_from_cbs[ROADS_KM_INDEX],
+        cities_names=cities_names,
+    )
+    batches = {
+        ACCIDENTS: get_copy_batches(
+            create_accident_markers, files_from_cbs[ACCIDENTS], batch_size
+        ),
+        INVOLVED: get_copy_batches(
+            partial(create_involved, provider_code, cities_names=cities_names),
+            files_from_cbs[INVOLVED],
+            batch_size,
+        ),
+        VEHICLES: get_copy_batches(
+            partial(create_vehicles, provider_code), files_from_cbs[VEHICLES], batch_size
+        ),
+    }
+    return files_from_cbs[DICTIONARY], batches
+
+
+def transform_directory_in_worker(directory, provider_code, batch_size, cities_names):
+    """
+    transform_directory for the import workers, the batches are created in the worker and sent
+    to the writer process as lists
+    """
+    cbs_dictionary, batches = transform_directory(directory, provider_code, batch_size, cities_names)
+    return cbs_dictionary, {name: list(file_batches) for name, file_batches in batches.items()}
+
+
+def load_directory(directory, provider_code, year, cbs_dictionary, batches):
+    """
+    loads the output of transform_directory into the db, one file after the other
+    """
+    fill_dictionary_tables(cbs_dictionary, provider_code, year)
+    new_items = 0
+    for name, table in ((ACCIDENTS, AccidentMarker), (INVOLVED, Involved), (VEHICLES, Vehicle)):
+        file_started = time.time()
+        file_started_memory_mb = get_memory_mb()
+        count = 0
+        for columns, rows_count, data in batches[name]:
+            copy_data_to_table(db.session.connection(), table, columns, data)
+            count += rows_count
+        db.session.commit()
+        log_file_load_stats(directory, cbs_files[name], count, file_started, file_started_memory_mb)
+        new_items += count
+    return new_items
+
+
+def import_to_datastore(directory, provider_code, year, batch_size, cities_names=None) -> int:
     """
     goes through all the files in a given directory, parses and commits them
-    Returns number of new items, and new streets dict.
+    Returns number of new items.
     """
     try:
         assert batch_size > 0
-
-        files_from_cbs = get_files(directory)
-        if len(files_from_cbs) == 0:
-            return 0, {}
         logging.debug("Importing '{}'".format(directory))
         started = datetime.now()
+        if cities_names is None:
+            cities_names = get_cities_names()
+        cbs_dictionary, batches = transform_directory(
+            directory, provider_code, batch_size, cities_names
+        )
+        new_items = load_directory(directory, provider_code, year, cbs_dictionary, batches)
+        logging.debug("\t{0} items in {1}".format(new_items, time_delta(started)))
+        return new_items
+    except ValueError as e:
+        return handle_import_error(directory, e)
 
-        # import dictionary
-        fill_dictionary_tables(files_from_cbs[DICTIONARY], provider_code, year)
 
-        new_items = 0
-        accidents_count = import_accidents(provider_code=provider_code, **files_from_cbs)
-        new_items += accidents_count
-        involved_count = import_involved(provider_code=provider_code, **files_from_cbs)
-        new_items += involved_count
-        vehicles_count = import_vehicles(provider_code=provider_code, **files_from_cbs)
-        new_items += vehicles_count
+def handle_import_error(directory, error):
+    failed_dirs[directory] = str(error)
+    if "Not found" in str(error):
+        return 0
+    raise error
 
+
+def load_transformed_directory(directory, provider_code, year, transformed):
+    try:
+        started = datetime.now()
+        cbs_dictionary, batches = transformed.result()
+        new_items = load_directory(directory, provider_code, year, cbs_dictionary, batches)
         logging.debug("\t{0} items in {1}".format(new_items, time_delta(started)))
         return new_items
     except ValueError as e:
-        failed_dirs[directory] = str(e)
-        if "Not found" in str(e):
-            return 0
-        raise e
+        return handle_import_error(directory, e)
+
+
+def import_directories_to_datastore(directories, batch_size, workers=1) -> int:
+    """
+    imports the cbs directories in the given order.
+    with more than one worker, the directories are parsed by a pool of worker processes while
+    this process loads them into the db in the same order, so the result is the same as of the
+    sequential import.
+    :param directories: (directory, provider_code, year) of every directory to import
+    :return: number of new items
+    """
+    cities_names = get_cities_names()
+    if workers <= 1:
+        return sum(
+            import_to_datastore(directory, provider_code, year, batch_size, cities_names)
+            for directory, provider_code, year in directories
+        )
+    assert batch_size > 0
+    # the workers are forked and must not share the db connections of this process
+    db.session.remove()
+    db.engine.dispose()
+    total = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for directory, provider_code, year in directories:
+            logging.debug("Importing '{}'".format(directory))
+            transformed = pool.submit(
+                transform_directory_in_worker, directory, provider_code, batch_size, cities_names
+            )
+            pending.append((directory, provider_code, year, transformed))
+            # bounds the parsed directories waiting in memory for the writer
+            if len(pending) > workers:
+                total += load_transformed_directory(*pending.popleft())
+        while pending:
+            total += load_transformed_directory(*pending.popleft())
+    return total
 
 
 def delete_invalid_entries(batch_size):
@@ -980,35 +1404,72 @@ def receive_rollback(conn, **kwargs):
     print("---------------------------------------------")
 
 
-def create_tables():
+def get_hebrew_tables():
+    """
+    :return: (hebrew table, query of its rows, column to chunk the query by, table the query
+    selects from) of every hebrew table, in the order they should be built
+    """
+    return [
+        (AccidentMarkerView, VIEWS.create_markers_hebrew_view(), AccidentMarker.id, AccidentMarker),
+        (InvolvedView, VIEWS.create_involved_hebrew_view(), Involved.id, Involved),
+        (VehiclesView, VIEWS.create_vehicles_hebrew_view(), Vehicle.id, Vehicle),
+        (
+            VehicleMarkerView,
+            VIEWS.create_vehicles_markers_hebrew_view(),
+            VehiclesView.id,
+            VehiclesView,
+        ),
+        (
+            InvolvedMarkerView,
+            VIEWS.create_involved_hebrew_markers_hebrew_view(),
+            InvolvedView.accident_id,
+            InvolvedView,
+        ),
+    ]
+
+
+def get_cbs_partitions_filter(table, start_year):
+    """
+    filters the rows of the cbs accidents from start_year on, the ones an import reloads
+    """
+    return and_(
+        table.provider_code.in_(
+            [BE_CONST.CBS_ACCIDENT_TYPE_1_CODE, BE_CONST.CBS_ACCIDENT_TYPE_3_CODE]
+        ),
+        table.accident_year >= start_year,
+    )
+
+
+def create_tables(load_start_year=None):
+    """
+    rebuilds the hebrew tables from the cbs tables
+    :param load_start_year: only rebuild the (provider_code, accident_year) partitions of the cbs
+    accidents from this year on, which are the ones reloaded by an import with the same
+    load_start_year. All the rows are rebuilt by default.
+    """
     chunk_size = 5000
     try:
         with db.get_engine().begin() as conn:
             event.listen(conn, "rollback", receive_rollback)
-            delete_all_rows_from_table(conn, AccidentMarkerView)
-            run_query_and_insert_to_table_in_chunks(VIEWS.create_markers_hebrew_view(), AccidentMarkerView,
-                                                    AccidentMarker.id, chunk_size, conn)
-            logging.debug("after insertion to markers_hebrew ")
-
-            delete_all_rows_from_table(conn, InvolvedView)
-            run_query_and_insert_to_table_in_chunks(VIEWS.create_involved_hebrew_view(), InvolvedView,
-                                                    Involved.id, chunk_size, conn)
-            logging.debug("after insertion to involved_hebrew ")
-
-            delete_all_rows_from_table(conn, VehiclesView)
-            run_query_and_insert_to_table_in_chunks(VIEWS.create_vehicles_hebrew_view(),
-                                                    VehiclesView, Vehicle.id, chunk_size, conn)
-            logging.debug("after insertion to vehicles_hebrew ")
-
-            delete_all_rows_from_table(conn, VehicleMarkerView)
-            run_query_and_insert_to_table_in_chunks(VIEWS.create_vehicles_markers_hebrew_view(),
-                                                    VehicleMarkerView, VehiclesView.id, chunk_size, conn)
-            logging.debug("after insertion to vehicles_markers_hebrew ")
-
-            delete_all_rows_from_table(conn, InvolvedMarkerView)
-            run_query_and_insert_to_table_in_chunks(VIEWS.create_involved_hebrew_markers_hebrew_view(),
-                                                    InvolvedMarkerView, InvolvedView.accident_id, chunk_size, conn)
-            logging.debug("after insertion to involved_markers_hebrew")
+            for table, query, column_to_chunk_by, source_table in get_hebrew_tables():
+                if load_start_year is None:
+                    delete_all_rows_from_table(conn, table)
+                else:
+                    logging.info(
+                        f"Deleting cbs rows from {load_start_year} from table {table.__tablename__}"
+                    )
+                    conn.execute(
+                        table.__table__.delete().where(
+                            get_cbs_partitions_filter(table, int(load_start_year))
+                        )
+                    )
+                    query = query.where(
+                        get_cbs_partitions_filter(source_table, int(load_start_year))
+                    )
+                run_query_and_insert_to_table_in_chunks(
+                    query, table, column_to_chunk_by, chunk_size, conn
+                )
+                logging.debug(f"after insertion to {table.__tablename__}")
             logging.debug("Created DB Hebrew Tables")
     except Exception as e:
         logging.exception(f"Exception while creating hebrew tables, {e}", e)
@@ -1064,9 +1525,10 @@ def recreate_table_for_location_extraction():
                     AND latitude is not null)) LOCATIONS)"""
                             )
     db.session.commit()
+    invalidate_locations_index()
 
 
-def main(batch_size, source, load_start_year=None):
+def main(batch_size, source, load_start_year=None, workers=1):
     try:
         total = 0
         started = datetime.now()
@@ -1078,6 +1540,7 @@ def main(batch_size, source, load_start_year=None):
             s3_data_retriever = S3DataRetriever()
             s3_data_retriever.get_files_from_s3(start_year=load_start_year)
             delete_cbs_entries(load_start_year, batch_size)
+            directories = []
             for provider_code in [
                 BE_CONST.CBS_ACCIDENT_TYPE_1_CODE,
                 BE_CONST.CBS_ACCIDENT_TYPE_3_CODE,
@@ -1093,10 +1556,8 @@ def main(batch_size, source, load_start_year=None):
                     )
                     logging.debug("Importing Directory " + cbs_files_dir)
                     preprocessing_cbs_files.update_cbs_files_names(cbs_files_dir)
-                    num_new = import_to_datastore(
-                        cbs_files_dir, provider_code, year, batch_size
-                    )
-                    total += num_new
+                    directories.append((cbs_files_dir, provider_code, year))
+            total += import_directories_to_datastore(directories, batch_size, workers)
             shutil.rmtree(s3_data_retriever.local_temp_directory)
         elif source == "local_dir_for_tests_only":
             path = "static/data/cbs"
@@ -1107,6 +1568,7 @@ def main(batch_size, source, load_start_year=None):
             # wipe all the AccidentMarker and Vehicle and Involved data first
             if import_ui.is_delete_all():
                 truncate_tables(db, (Vehicle, Involved, AccidentMarker))
+            directories = []
             for directory in sorted(dir_list, reverse=False):
                 directory_name = os.path.basename(os.path.normpath(directory))
                 year = directory_name[1:5] if directory_name[0] == "H" else directory_name[0:4]
@@ -1115,12 +1577,9 @@ def main(batch_size, source, load_start_year=None):
                 )
                 provider_code = get_provider_code(parent_directory)
                 logging.debug("Importing Directory " + directory)
-                num_new = import_to_datastore(
-                    directory, provider_code, int(year), batch_size
-                )
-                total += num_new
+                directories.append((directory, provider_code, int(year)))
+            total += import_directories_to_datastore(directories, batch_size, workers)
 
-        fill_db_geo_data()
         failed = [
             "\t'{0}' ({1})".format(directory, fail_reason)
             for directory, fail_reason in failed_dirs.items()
@@ -1131,13 +1590,18 @@ def main(batch_size, source, load_start_year=None):
             )
         )
         logging.debug("Total: {0} items in {1}".format(total, time_delta(started)))
-        create_tables()
+        build_cluster_pyramid(batch_size)
+        logging.debug("Finished Building Cluster Pyramid")
+        # the local import may truncate all the tables, so its hebrew tables are fully rebuilt
+        create_tables(load_start_year if source == "s3" else None)
+        invalidate_accidents_stores()
         logging.debug("Finished Creating Hebrew DB Tables")
         recreate_table_for_location_extraction()
         logging.debug("Finished Recreating tables for location extraction")
         logging.debug("Loading safety data tables")
         sd_utils.load_data()
         logging.debug("Completed load of safety data tables")
+        invalidate_responses_cache()
     except Exception as ex:
         print("Traceback: {0}".format(traceback.format_exc()))
         raise CBSParsingFailed(message=str(ex))
@@ -0,0 +1,179 @@
+import json
+import logging
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional
+
+import googlemaps
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from anyway import config, secrets
+from anyway.models import GeocodingCache
+
+GEOCODING_LRU_MAX_SIZE = 4096
+# about 10cm, the precision of the reverse geocoding cache keys
+COORDINATES_DIGITS = 6
+GEOCODE = "geocode"
+REVERSE_GEOCODE = "reverse_geocode"
+
+
+class GeocodingBackend(ABC):
+    """The geocoding api of the news flash location extraction, results are in the gmaps format"""
+
+    @abstractmethod
+    def geocode(self, address: str, region: str) -> List[dict]:
+        pass
+
+    @abstractmethod
+    def reverse_geocode(self, latitude: float, longitude: float) -> List[dict]:
+        pass
+
+
+class GoogleMapsBackend(GeocodingBackend):
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = googlemaps.Client(key=secrets.get("GOOGLE_MAPS_KEY"))
+        return self._client
+
+    def geocode(self, address: str, region: str) -> List[dict]:
+        return self.client.geocode(address, region=region)
+
+    def reverse_geocode(self, latitude: float, longitude: float) -> List[dict]:
+        return self.client.reverse_geocode((latitude, longitude))
+
+
+class FixtureBackend(GeocodingBackend):
+    """
+    Answers from a json file of recorded results, for tests and benchmarks without the google
+    maps api: {"geocode": {address: results}, "reverse_geocode": {"lat,lng": results}}.
+    Lookups that are not in the file have no results.
+    """
+
+    def __init__(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            fixture = json.load(f)
+        self.geocode_results = {
+            normalize_address(address): results
+            for address, results in fixture.get(GEOCODE, {}).items()
+        }
+        self.reverse_geocode_results = fixture.get(REVERSE_GEOCODE, {})
+        self.calls = 0
+
+    def geocode(self, address: str, region: str) -> List[dict]:
+        self.calls += 1
+        return self.geocode_results.get(normalize_address(address), [])
+
+    def reverse_geocode(self, latitude: float, longitude: float) -> List[dict]:
+        self.calls += 1
+        return self.reverse_geocode_results.get(get_coordinates_key(latitude, longitude), [])
+
+
+def normalize_address(address: str) -> str:
+    return re.sub(r"\s+", " ", address).strip().lower()
+
+
+def get_coordinates_key(latitude: float, longitude: float) -> str:
+    return f"{latitude:.{COORDINATES_DIGITS}f},{longitude:.{COORDINATES_DIGITS}f}"
+
+
+backend: Optional[GeocodingBackend] = None
+# cache key -> results of the backend
+results_cache = OrderedDict()
+results_cache_lock = threading.Lock()
+
+
+def get_backend() -> GeocodingBackend:
+    global backend
+    if backend is None:
+        if config.GEOCODING_FIXTURE_PATH:
+            backend = FixtureBackend(config.GEOCODING_FIXTURE_PATH)
+        else:
+            backend = GoogleMapsBackend()
+    return backend
+
+
+def set_backend(new_backend: Optional[GeocodingBackend]):
+    global backend
+    backend = new_backend
+    with results_cache_lock:
+        results_cache.clear()
+
+
+def get_local_results(key: str) -> Optional[List[dict]]:
+    with results_cache_lock:
+        results = results_cache.get(key)
+        if results is not None:
+            results_cache.move_to_end(key)
+        return results
+
+
+def set_local_results(key: str, results: List[dict]):
+    with results_cache_lock:
+        results_cache[key] = results
+        results_cache.move_to_end(key)
+        while len(results_cache) > GEOCODING_LRU_MAX_SIZE:
+            results_cache.popitem(last=False)
+
+
+def get_stored_results(key: str) -> Optional[List[dict]]:
+    if not config.GEOCODING_CACHE_TABLE_ENABLED:
+        return None
+    from anyway.app_and_db import db
+
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select([GeocodingCache.results]).where(GeocodingCache.key == key)
+            ).scalar()
+    except Exception as e:
+        logging.warning(f"failed reading the geocoding cache: {e}")
+        return None
+
+
+def store_results(key: str, results: List[dict]):
+    """Stored in a transaction of its own, so the session of the news flash is not committed"""
+    if not config.GEOCODING_CACHE_TABLE_ENABLED:
+        return
+    from anyway.app_and_db import db
+
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(
+                insert(GeocodingCache.__table__)
+                .values(key=key, results=results)
+                .on_conflict_do_nothing(index_elements=["key"])
+            )
+    except Exception as e:
+        logging.warning(f"failed writing to the geocoding cache: {e}")
+
+
+def get_cached(key: str, fetch) -> List[dict]:
+    """
+    :returns: the results of the key from the in-process cache, the cache table or fetch(), in
+    that order. Failures of fetch() are raised and not cached.
+    """
+    results = get_local_results(key)
+    if results is None:
+        results = get_stored_results(key)
+        if results is None:
+            results = fetch()
+            store_results(key, results)
+        set_local_results(key, results)
+    return results
+
+
+def geocode(address: str, region: str = "il") -> List[dict]:
+    key = f"{GEOCODE}:{region}:{normalize_address(address)}"
+    return get_cached(key, lambda: get_backend().geocode(address, region))
+
+
+def reverse_geocode(latitude: float, longitude: float) -> List[dict]:
+    key = f"{REVERSE_GEOCODE}:{get_coordinates_key(latitude, longitude)}"
+    return get_cached(key, lambda: get_backend().reverse_geocode(latitude, longitude))
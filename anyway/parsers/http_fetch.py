@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator
+from urllib.parse import urlparse
+
+import requests
+
+FETCH_WORKERS = 8
+# concurrent requests to a single host, below the connection pool size of the session
+FETCH_PER_HOST = 4
+# seconds to connect and to read
+FETCH_TIMEOUT = (5, 30)
+FETCH_RETRIES = 3
+# seconds before the first retry, doubled on each retry
+FETCH_BACKOFF = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# shares the connections of the fetches, requests sessions can be used by several threads
+session = requests.Session()
+host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+host_semaphores_lock = threading.Lock()
+
+
+def get_host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with host_semaphores_lock:
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(FETCH_PER_HOST)
+        return host_semaphores[host]
+
+
+def fetch(url: str) -> str:
+    """
+    :returns: the text of the url. Connection errors, timeouts and the statuses of
+    RETRY_STATUSES are retried with an exponential backoff, other errors are raised.
+    """
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            with get_host_semaphore(url):
+                response = session.get(url, timeout=FETCH_TIMEOUT)
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response.text
+            error = requests.HTTPError(f"{response.status_code} for {url}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt < FETCH_RETRIES:
+            delay = FETCH_BACKOFF * 2**attempt
+            logging.warning(f"fetching {url} failed: {error}, retrying in {delay} seconds")
+            time.sleep(delay)
+    raise error
+
+
+def fetch_all(
+    urls: Iterable[str], fetch_url: Callable[[str], str] = fetch, workers: int = FETCH_WORKERS
+) -> Iterator[str]:
+    """:returns: the texts of the urls in their order, fetched by a pool of workers"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(fetch_url, urls)
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy import or_
-from datetime import datetime
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timedelta
 from anyway.models import (
     Base,
     RoadSegments,
@@ -11,14 +16,17 @@ from anyway.models import (
     InfographicsStreetDataCache,
     Streets,
     AccidentMarker,
+    AccidentMarkerView,
 )
-from typing import Dict, Iterable
+from typing import Dict, Iterable, List, Optional, Tuple
 from anyway.constants import CONST
 from anyway.backend_constants import BE_CONST
 from anyway.app_and_db import db
-from anyway.request_params import RequestParams
+from anyway.infographics_response_cache import invalidate_responses_cache
+from anyway.request_params import RequestParams, get_request_params_from_request_values
 import anyway.infographics_utils
 from anyway.widgets.widget import widgets_dict
+from anyway.widgets.widget_utils import get_query
 from anyway.utilities import chunked_generator
 import logging
 import json
@@ -32,6 +40,10 @@ NAME = "name"
 META = "meta"
 DATA = "data"
 ITEMS = "items"
+CACHE_INSERT_BATCH_SIZE = 4960
+CACHE_SWAP_NAME = "infographics_cache_swap"
+CACHE_SWAP_LOCK_TIMEOUT = "5s"
+CACHE_SWAP_ATTEMPTS = 5
 STREET_CACHE_TABLES = {CACHE: InfographicsStreetDataCache, TEMP: InfographicsStreetDataCacheTemp}
 ROAD_SEGMENT_CACHE_TABLES = {
     CACHE: InfographicsRoadSegmentsDataCache,
@@ -112,9 +124,25 @@ def get_infographics_data_from_cache_by_location(request_params: RequestParams)
 
 def update_cache_data(db_item, request_params: RequestParams, query) -> dict:
     cache_data = json.loads(db_item.get_data())
+    res, dirty = get_updated_widgets(cache_data[WIDGETS], request_params)
+    if dirty:
+        cache_data[WIDGETS] = res
+        j = json.dumps(cache_data, default=str)
+        db_item.set_data(j)
+        db.session.commit()
+    return cache_data
+
+
+def get_updated_widgets(
+    cached_widgets: List[dict], request_params: RequestParams
+) -> Tuple[List[dict], bool]:
+    """
+    :returns: the relevant widgets, generating the ones whose digest changed since they were
+    cached, and whether any widget was generated
+    """
     res = []
     dirty: bool = False
-    cache_widgets = {w[NAME]: w for w in cache_data[WIDGETS]}
+    cache_widgets = {w[NAME]: w for w in cached_widgets}
     for widget in widgets_dict.values():
         if widget.is_relevant(request_params):
             cache_widget = cache_widgets.get(widget.name, None)
@@ -128,12 +156,88 @@ def update_cache_data(db_item, request_params: RequestParams, query) -> dict:
                 logging.debug(f"Widget {widget.name}: generated new. In cache was:{cache_widget}")
             else:
                 res.append(cache_widget)
-    if dirty:
-        cache_data[WIDGETS] = res
-        j = json.dumps(cache_data, default=str)
-        db_item.set_data(j)
-        db.session.commit()
-    return cache_data
+    return res, dirty
+
+
+def location_has_accidents(request_params: RequestParams, start_time, end_time) -> bool:
+    query = get_query(AccidentMarkerView, request_params.location_info, start_time, end_time)
+    return db.session.query(query.exists()).scalar()
+
+
+def is_location_stale(cache_data: dict, request_params: RequestParams) -> bool:
+    """
+    Whether the location data changed since cache_data was built: the years it covers changed,
+    or the location had accidents after the last accident date it was built with
+    """
+    dates_comment = cache_data[META].get("dates_comment", {})
+    date_range = [request_params.start_time.year, request_params.end_time.year]
+    if dates_comment.get("date_range") != date_range or "last_update" not in dates_comment:
+        return True
+    last_update = datetime.fromisoformat(dates_comment["last_update"]).date()
+    if request_params.end_time <= last_update:
+        return False
+    return location_has_accidents(
+        request_params, last_update + timedelta(days=1), request_params.end_time
+    )
+
+
+def refresh_cache_data(key: Dict[str, int], data: Optional[str]) -> Optional[str]:
+    """
+    Refreshes the cached infographics data of key: the whole data is built again if the location
+    is stale, otherwise only the widgets whose digest changed are generated and patched in.
+    :returns: the refreshed data, or None if data is up to date
+    """
+    cache_data = json.loads(data) if data else {}
+    if not cache_data.get(WIDGETS) or META not in cache_data:
+        return create_cache_data(key)
+    request_params = get_request_params_from_request_values(dict(key))
+    if request_params is None:
+        return None
+    if is_location_stale(cache_data, request_params):
+        return create_cache_data(key)
+    widgets, dirty = get_updated_widgets(cache_data[WIDGETS], request_params)
+    dates_comment = anyway.infographics_utils.get_dates_comment(request_params)
+    if not dirty and cache_data[META].get("dates_comment") == dates_comment:
+        return None
+    cache_data[WIDGETS] = widgets
+    cache_data[META]["dates_comment"] = dates_comment
+    return json.dumps(cache_data, default=str)
+
+
+def get_swapped_names(table: Dict[str, Base]) -> List[Tuple[str, str, str]]:
+    """
+    :returns: (kind, cache name, temp name) of the cache table and its indexes, paired with the
+    temp table and its index on the same columns
+    """
+    cache_table, temp_table = table[CACHE].__table__, table[TEMP].__table__
+    temp_indexes = {
+        tuple(column.name for column in index.columns): index.name for index in temp_table.indexes
+    }
+    names = [
+        ("table", cache_table.name, temp_table.name),
+        ("index", f"{cache_table.name}_pkey", f"{temp_table.name}_pkey"),
+    ]
+    for index in sorted(cache_table.indexes, key=lambda index: index.name):
+        names.append(
+            ("index", index.name, temp_indexes[tuple(column.name for column in index.columns)])
+        )
+    return names
+
+
+def swap_temp_and_cache(conn, table: Dict[str, Base]):
+    """
+    Swaps the names of the temp and cache tables, and of their indexes, in the transaction of conn.
+    Readers of the cache only wait for the renames, and never see a partially filled table.
+    """
+    conn.execute(f"set local lock_timeout = '{CACHE_SWAP_LOCK_TIMEOUT}'")
+    conn.execute(
+        f"lock table {table[CACHE].__tablename__}, {table[TEMP].__tablename__} "
+        f"in access exclusive mode"
+    )
+    for kind, cache_name, temp_name in get_swapped_names(table):
+        conn.execute(f"alter {kind} {cache_name} rename to {CACHE_SWAP_NAME}")
+        conn.execute(f"alter {kind} {temp_name} rename to {cache_name}")
+        conn.execute(f"alter {kind} {CACHE_SWAP_NAME} rename to {temp_name}")
 
 
 def copy_temp_into_cache(table: Dict[str, Base]):
@@ -144,27 +248,27 @@ def copy_temp_into_cache(table: Dict[str, Base]):
         f"num items in cache: {num_items_cache}, temp:{num_items_temp}"
     )
     db.session.commit()
-    start = datetime.now()
-    with db.get_engine().begin() as conn:
-        conn.execute("lock table infographics_data_cache in exclusive mode")
-        logging.debug(f"in transaction, after lock")
-        conn.execute(f"delete from {table[CACHE].__tablename__}")
-        logging.debug(f"in transaction, after delete")
-        conn.execute(
-            f"insert into {table[CACHE].__tablename__} "
-            f"SELECT * from {table[TEMP].__tablename__}"
-        )
-        logging.debug(f"in transaction, after insert into")
-    logging.info(f"cache unavailable time: {str(datetime.now() - start)}")
-    num_items_cache = db.session.query(table[CACHE]).count()
-    num_items_temp = db.session.query(table[TEMP]).count()
-    logging.debug(f"num items in cache: {num_items_cache}, temp:{num_items_temp}")
+    for attempt in range(1, CACHE_SWAP_ATTEMPTS + 1):
+        start = datetime.now()
+        try:
+            with db.get_engine().begin() as conn:
+                swap_temp_and_cache(conn, table)
+            break
+        except OperationalError as e:
+            # a long reader holds the tables, so the swap gives up rather than queue readers
+            if attempt == CACHE_SWAP_ATTEMPTS:
+                raise
+            logging.warning(f"swap of {table[CACHE].__tablename__} failed, retrying: {e}")
+            time.sleep(attempt)
+    logging.info(f"cache swap time: {str(datetime.now() - start)}")
+    # the temp table holds the previous cache now
     db.session.execute(f"truncate table {table[TEMP].__tablename__}")
     db.session.commit()
     num_items_cache = db.session.query(table[CACHE]).count()
     num_items_temp = db.session.query(table[TEMP]).count()
     logging.debug(f"num items in cache: {num_items_cache}, temp:{num_items_temp}")
     db.session.commit()
+    invalidate_responses_cache()
 
 
 def get_streets() -> Iterable[Streets]:
@@ -189,25 +293,125 @@ def get_street_infographic_keys() -> Iterable[Dict[str, int]]:
                 }
 
 
-def build_street_cache_into_temp():
+def create_cache_data(key: Dict[str, int]) -> str:
+    return anyway.infographics_utils.create_infographics_data_for_location(key)
+
+
+def generate_cache_data(keys: Iterable[Dict[str, int]], workers: int = 1):
+    """
+    Yields (key, infographics data) of every key, in the order of keys.
+    With more than one worker, the data is created in a pool of processes, each with its own
+    db connections. The keys are submitted a few at a time, so they are streamed to the workers.
+    """
+    if workers <= 1:
+        for key in keys:
+            yield key, create_cache_data(key)
+        return
+    pending = deque()
+    # spawned workers don't inherit the db connections of this process
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        for key in keys:
+            pending.append((key, pool.submit(create_cache_data, key)))
+            if len(pending) >= 4 * workers:
+                key, future = pending.popleft()
+                yield key, future.result()
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+
+
+def build_cache_into_temp(
+    table: Base,
+    keys: Iterable[Dict[str, int]],
+    get_row,
+    workers: int = 1,
+    batch_size: int = CACHE_INSERT_BATCH_SIZE,
+):
+    """
+    Builds the infographics of every key into the temp cache table, inserting batch_size rows
+    at a time
+    :param get_row: builds the table row of a key and its infographics data
+    """
     start = datetime.now()
-    db.session.query(InfographicsStreetDataCacheTemp).delete()
+    db.session.query(table).delete()
     db.session.commit()
-    for chunk in chunked_generator(get_street_infographic_keys(), 4960):
+    items = 0
+    for chunk in chunked_generator(generate_cache_data(keys, workers), batch_size):
         db.get_engine().execute(
-            InfographicsStreetDataCacheTemp.__table__.insert(),
-            [
-                {
-                    "yishuv_symbol": d["yishuv_symbol"],
-                    "street": d["street1"],
-                    "years_ago": d["years_ago"],
-                    "data": anyway.infographics_utils.create_infographics_data_for_location(d),
-                }
-                for d in chunk
-            ],
+            table.__table__.insert(), [get_row(key, data) for key, data in chunk]
+        )
+        items += len(chunk)
+        seconds = (datetime.now() - start).total_seconds()
+        logging.info(
+            f"{table.__tablename__}: {items} items built, {items / seconds:.2f} items per second"
         )
     db.session.commit()
-    logging.info(f"cache rebuild took:{str(datetime.now() - start)}")
+    logging.info(f"cache rebuild took:{str(datetime.now() - start)}, {items} items")
+
+
+def refresh_cache(
+    table: Base,
+    keys: Iterable[Dict[str, int]],
+    get_row,
+    batch_size: int = CACHE_INSERT_BATCH_SIZE,
+):
+    """
+    Refreshes the cache table in place: rows are only written when refresh_cache_data changed
+    them, and missing keys are added
+    :param get_row: builds the table row of a key and its infographics data
+    """
+    start = datetime.now()
+    items, updated, added = 0, 0, 0
+    for key in keys:
+        row_key = {name: value for name, value in get_row(key, None).items() if name != "data"}
+        db_item = db.session.query(table).filter_by(**row_key).first()
+        data = refresh_cache_data(key, db_item.get_data() if db_item else None)
+        if data is not None:
+            if db_item is None:
+                db.session.add(table(**get_row(key, data)))
+                added += 1
+            else:
+                db_item.set_data(data)
+                updated += 1
+        items += 1
+        if items % batch_size == 0:
+            db.session.commit()
+            logging.info(f"{table.__tablename__}: {items} items checked, {updated + added} changed")
+    db.session.commit()
+    if updated or added:
+        invalidate_responses_cache()
+    logging.info(
+        f"cache refresh took:{str(datetime.now() - start)}, {items} items checked,"
+        f" {updated} updated, {added} added"
+    )
+
+
+def get_street_cache_row(key: Dict[str, int], data: Optional[str]) -> dict:
+    return {
+        "yishuv_symbol": key["yishuv_symbol"],
+        "street": key["street1"],
+        "years_ago": key["years_ago"],
+        "data": data,
+    }
+
+
+def get_road_segment_cache_row(key: Dict[str, int], data: Optional[str]) -> dict:
+    return {
+        "road_segment_id": key["road_segment_id"],
+        "years_ago": key["years_ago"],
+        "data": data,
+    }
+
+
+def build_street_cache_into_temp(workers: int = 1):
+    build_cache_into_temp(
+        InfographicsStreetDataCacheTemp,
+        get_street_infographic_keys(),
+        get_street_cache_row,
+        workers,
+    )
 
 
 def street_has_accidents(yishuv_symbol: int, street: int) -> bool:
@@ -236,32 +440,34 @@ def get_road_segment_infographic_keys() -> Iterable[Dict[str, int]]:
             yield {"road_segment_id": road_segment.segment_id, "years_ago": y, "lang": "en"}
 
 
-def build_road_segments_cache_into_temp():
-    start = datetime.now()
-    db.session.query(InfographicsRoadSegmentsDataCacheTemp).delete()
-    db.session.commit()
-    db.get_engine().execute(
-        InfographicsRoadSegmentsDataCacheTemp.__table__.insert(),  # pylint: disable=no-member
-        [
-            {
-                "road_segment_id": d["road_segment_id"],
-                "years_ago": d["years_ago"],
-                "data": anyway.infographics_utils.create_infographics_data_for_location(d),
-            }
-            for d in get_road_segment_infographic_keys()
-        ],
+def build_road_segments_cache_into_temp(workers: int = 1):
+    build_cache_into_temp(
+        InfographicsRoadSegmentsDataCacheTemp,
+        get_road_segment_infographic_keys(),
+        get_road_segment_cache_row,
+        workers,
     )
-    db.session.commit()
-    logging.info(f"cache rebuild took:{str(datetime.now() - start)}")
 
 
-def main_for_road_segments():
+def main_for_road_segments(workers: int = 1, incremental: bool = False):
     logging.info("Refreshing road segments infographics cache...")
-    build_road_segments_cache_into_temp()
-    copy_temp_into_cache(ROAD_SEGMENT_CACHE_TABLES)
+    if incremental:
+        refresh_cache(
+            InfographicsRoadSegmentsDataCache,
+            get_road_segment_infographic_keys(),
+            get_road_segment_cache_row,
+        )
+    else:
+        build_road_segments_cache_into_temp(workers)
+        copy_temp_into_cache(ROAD_SEGMENT_CACHE_TABLES)
     logging.info("Refreshing road segments infographics cache cache Done")
 
 
-def main_for_street():
-    build_street_cache_into_temp()
-    copy_temp_into_cache(STREET_CACHE_TABLES)
+def main_for_street(workers: int = 1, incremental: bool = False):
+    if incremental:
+        refresh_cache(
+            InfographicsStreetDataCache, get_street_infographic_keys(), get_street_cache_row
+        )
+    else:
+        build_street_cache_into_temp(workers)
+        copy_temp_into_cache(STREET_CACHE_TABLES)
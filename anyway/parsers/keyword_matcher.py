@@ -0,0 +1,43 @@
+import re
+from typing import Dict, Iterable, Set
+
+
+class KeywordMatcher(object):
+    """
+    Finds the keywords of several groups in a text in one pass of a compiled regex, instead of a
+    substring search per keyword. The regex is a lookahead of all the keywords, longest first, so
+    it finds the longest keyword starting at each position of the text. The keywords that are
+    prefixes of it start at the same position, they are precomputed for each keyword.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups = {group: list(keywords) for group, keywords in groups.items()}
+        keywords = sorted(
+            {keyword for keywords in self.groups.values() for keyword in keywords},
+            key=lambda keyword: (-len(keyword), keyword),
+        )
+        self.pattern = re.compile(
+            "(?=({}))".format("|".join(re.escape(keyword) for keyword in keywords))
+        )
+        # keyword -> the keywords it starts with, itself included
+        self.prefixes = {
+            keyword: [prefix for prefix in keywords if keyword.startswith(prefix)]
+            for keyword in keywords
+        }
+        self.keyword_groups = {
+            keyword: {group for group, words in self.groups.items() if keyword in words}
+            for keyword in keywords
+        }
+
+    def find(self, text: str) -> Dict[str, int]:
+        """:returns: the keywords in the text, with the index of their first occurrence"""
+        res = {}
+        for match in self.pattern.finditer(text):
+            for keyword in self.prefixes[match.group(1)]:
+                if keyword not in res:
+                    res[keyword] = match.start()
+        return res
+
+    def find_groups(self, text: str) -> Set[str]:
+        """:returns: the groups that have a keyword in the text"""
+        return {group for keyword in self.find(text) for group in self.keyword_groups[keyword]}
@@ -2,13 +2,14 @@ import logging
 import re
 import math
 import geohash  # python-geohash package
-import googlemaps
 import numpy as np
 from geographiclib.geodesic import Geodesic
 from anyway.backend_constants import BE_CONST
 from anyway.models import NewsFlash
 from anyway.parsers.resolution_fields import ResolutionFields as RF
-from anyway import secrets
+from anyway.parsers.keyword_matcher import KeywordMatcher
+from anyway.parsers.locations_index import get_locations_index
+from anyway.parsers import geocoding
 from anyway.models import AccidentMarkerView, RoadSegments
 from sqlalchemy import not_
 import pandas as pd
@@ -188,44 +189,12 @@ def get_db_matching_location(db, latitude, longitude, resolution, road_no=None):
     :return: a dict containing all the geo fields stated in
     resolution dict, with values filled according to resolution
     """
-    # READ MARKERS FROM DB
-    geod = Geodesic.WGS84
     relevant_fields = RF.get_possible_fields(resolution)
-    markers = db.get_markers_for_location_extraction()
-    markers["geohash"] = markers.apply(
-        lambda x: geohash.encode(x["latitude"], x["longitude"], precision=4), axis=1
-    )
-    markers_orig = markers.copy()
+    index = get_locations_index(db)
     if resolution != "אחר":
-        if (
-            road_no is not None
-            and road_no > 0
-            and ("road1" in relevant_fields or "road2" in relevant_fields)
-        ):
-            markers = markers.loc[(markers["road1"] == road_no) | (markers["road2"] == road_no)]
-        for field in relevant_fields:
-            if field == "road1":
-                markers = markers.loc[markers[field].notnull()]
-                markers = markers.loc[markers[field] > 0]
-            elif field in ["region_hebrew", "district_hebrew", "yishuv_name", "street1_hebrew"]:
-                markers = markers.loc[markers[field].notnull()]
-                markers = markers.loc[markers[field] != ""]
-    if markers.count()[0] == 0:
-        markers = markers_orig
-
-    # FILTER BY GEOHASH
-    curr_geohash = geohash.encode(latitude, longitude, precision=4)
-    if markers.loc[markers["geohash"] == curr_geohash].count()[0] > 0:
-        markers = markers.loc[markers["geohash"] == curr_geohash].copy()
-
-    # CREATE DISTANCE FIELD
-    markers["dist_point"] = markers.apply(
-        lambda x: geod.Inverse(latitude, longitude, x["latitude"], x["longitude"])["s12"], axis=1
-    ).replace({np.nan: None})
-
-    most_fit_loc = (
-        markers.loc[markers["dist_point"] == markers["dist_point"].min()].iloc[0].to_dict()
-    )
+        most_fit_loc = index.get_matching_location(latitude, longitude, relevant_fields, road_no)
+    else:
+        most_fit_loc = index.get_nearest(latitude, longitude)
 
     final_loc = {}
     for field in relevant_fields:
@@ -280,8 +249,7 @@ def reverse_geocode_extract(latitude, longitude):
     city = None
     district = None
     try:
-        gmaps = googlemaps.Client(key=secrets.get("GOOGLE_MAPS_KEY"))
-        geocode_result = gmaps.reverse_geocode((latitude, longitude))
+        geocode_result = geocoding.reverse_geocode(latitude, longitude)
 
         # if we got no results, move to next iteration of location string
         if not geocode_result:
@@ -341,8 +309,7 @@ def geocode_extract(location):
                 logging.debug(f"Skipping empty location string:{candidate_location_string}.")
                 continue
             logging.debug(f'using location string: "{candidate_location_string}"')
-            gmaps = googlemaps.Client(key=secrets.get("GOOGLE_MAPS_KEY"))
-            geocode_result = gmaps.geocode(candidate_location_string, region="il")
+            geocode_result = geocoding.geocode(candidate_location_string, region="il")
 
             # if we got no results, move to next iteration of location string
             if not geocode_result:
@@ -391,6 +358,66 @@ def geocode_extract(location):
     return None
 
 
+LOCATION_FORBID_WORDS = ["תושב"]
+HOSPITAL_WORDS = ["בבית החולים", "בית חולים", "בית החולים", "מרכז רפואי"]
+HOSPITAL_NAMES = [
+    "שיבא",
+    "וולפסון",
+    "תל השומר",
+    "סוראסקי",
+    "הלל יפה",
+    'רמב"ם',
+    "רמבם",
+    "בני ציון",
+    "רוטשילד",
+    "גליל מערבי",
+    "זיו",
+    "פוריה",
+    "ברזילי",
+    "אסף הרופא",
+    "סורוקה",
+    "רבין",
+    "בלינסון",
+    "גולדה",
+    "כרמל",
+    "עמק",
+    "מאיר",
+    "קפלן",
+    "יוספטל",
+    "הדסה",
+    "שערי צדק",
+    "צאנז",
+    "לניאדו",
+    "אסותא",
+    "מעיני הישועה",
+    "מדיקל סנטר",
+    "איטלקי",
+    "המשפחה הקדושה",
+]
+LOCATION_TOKENS = [
+    "כביש",
+    "שדרות",
+    "רחוב",
+    "מחלף",
+    "צומת",
+    "יישוב",
+    "מושב",
+    "קיבוץ",
+    "התנחלות",
+    "שכונת",
+    "בדרך",
+]
+NEAR_TOKENS = ["סמוך ל", "ליד ה"]  # maybe add: "ליד "
+
+location_text_matcher = KeywordMatcher(
+    {
+        "forbid": LOCATION_FORBID_WORDS + HOSPITAL_WORDS,
+        "location": LOCATION_TOKENS,
+        "near": NEAR_TOKENS,
+    }
+)
+
+
 def extract_location_text(text):
     """
     filters the text so it will be easier to find corresponding geolocation, based on manual chosen filters.
@@ -402,47 +429,13 @@ def extract_location_text(text):
     filter_ind = float("inf")
     if text.find(".") != -1:
         text = text[: text.find(".")]
+    # the forbidden words and the location tokens are found in one pass over the text, it is
+    # passed again only if removing forbidden words changed it
+    keywords = location_text_matcher.find(text)
     try:
         if text.find(".") != -1:
             text = text[: text.find(".")]
-        forbid_words = ["תושב"]
-        hospital_words = ["בבית החולים", "בית חולים", "בית החולים", "מרכז רפואי"]
-        hospital_names = [
-            "שיבא",
-            "וולפסון",
-            "תל השומר",
-            "סוראסקי",
-            "הלל יפה",
-            'רמב"ם',
-            "רמבם",
-            "בני ציון",
-            "רוטשילד",
-            "גליל מערבי",
-            "זיו",
-            "פוריה",
-            "ברזילי",
-            "אסף הרופא",
-            "סורוקה",
-            "רבין",
-            "בלינסון",
-            "גולדה",
-            "כרמל",
-            "עמק",
-            "מאיר",
-            "קפלן",
-            "יוספטל",
-            "הדסה",
-            "שערי צדק",
-            "צאנז",
-            "לניאדו",
-            "אסותא",
-            "מעיני הישועה",
-            "מדיקל סנטר",
-            "איטלקי",
-            "המשפחה הקדושה",
-        ]
-        forbid_words.extend(hospital_words)
-        for forbid_word in forbid_words:
+        for forbid_word in LOCATION_FORBID_WORDS + HOSPITAL_WORDS:
             found_hospital = False
             removed_punc = False
             if forbid_word in text:
@@ -459,8 +452,8 @@ def extract_location_text(text):
                             text = text[:punc_before_ind] + " " + text[(punc_after_ind + 1) :]
                         removed_punc = True
                         break
-                if (not removed_punc) and (forbid_word in hospital_words):
-                    for hospital_name in hospital_names:
+                if (not removed_punc) and (forbid_word in HOSPITAL_WORDS):
+                    for hospital_name in HOSPITAL_NAMES:
                         hospital_ind = text.find(hospital_name)
                         if (
                             hospital_ind == forbid_ind + len(forbid_word) + 1
@@ -481,34 +474,20 @@ def extract_location_text(text):
     except Exception as _:
         logging.exception("could not filter text {0}".format(text))
 
-    loc_tokens = [
-        "כביש",
-        "שדרות",
-        "רחוב",
-        "מחלף",
-        "צומת",
-        "יישוב",
-        "מושב",
-        "קיבוץ",
-        "התנחלות",
-        "שכונת",
-        "בדרך",
-    ]
-    for token in loc_tokens:
-        i = text.find(token)
-        if i >= 0:
-            filter_ind = min(filter_ind, i)
+    if any(word in keywords for word in LOCATION_FORBID_WORDS + HOSPITAL_WORDS):
+        keywords = location_text_matcher.find(text)
+    for token in LOCATION_TOKENS:
+        if token in keywords:
+            filter_ind = min(filter_ind, keywords[token])
 
-    near_tokens = ["סמוך ל", "ליד ה"]  # maybe add: "ליד "
-    for token in near_tokens:
-        i = text.find(token)
-        if i >= 0:
-            filter_ind = min(filter_ind, i + len(token))
+    for token in NEAR_TOKENS:
+        if token in keywords:
+            filter_ind = min(filter_ind, keywords[token] + len(token))
 
     if filter_ind != float("inf"):
         text = text[filter_ind:]
 
-    for token in near_tokens:
+    for token in NEAR_TOKENS:
         i = text.find(token)
         if i >= 0:
             text = text[:i] + token + text[i + len(token) :]
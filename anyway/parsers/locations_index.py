@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import geohash  # python-geohash package
+import numpy as np
+import pandas as pd
+from geographiclib.geodesic import Geodesic
+
+GEOHASH_PRECISION = 4
+EARTH_RADIUS_METERS = 6371008.8
+# the haversine distance is within 0.6% of the WGS84 geodesic distance, so every location whose
+# haversine distance is within this margin of the nearest one is measured exactly
+HAVERSINE_MARGIN = 0.01
+TEXT_FIELDS = ["region_hebrew", "district_hebrew", "yishuv_name", "street1_hebrew"]
+
+
+class LocationsIndex:
+    """
+    The locations of cbs_locations bucketed by their geohash cell, with their radian coordinates
+    for vectorized haversine distances. Finds the same location get_db_matching_location finds by
+    scanning the whole table: the nearest one by geodesic distance, among the locations of the
+    point's cell when the cell has any.
+    """
+
+    def __init__(self, markers: pd.DataFrame):
+        self.markers = markers.reset_index(drop=True)
+        self.latitude = np.radians(self.markers["latitude"].to_numpy(dtype=float))
+        self.longitude = np.radians(self.markers["longitude"].to_numpy(dtype=float))
+        cells = [
+            geohash.encode(lat, lon, precision=GEOHASH_PRECISION)
+            for lat, lon in zip(self.markers["latitude"], self.markers["longitude"])
+        ]
+        # geohash cell -> sorted positions of its locations
+        self.cells: Dict[str, np.ndarray] = self.markers.groupby(cells, sort=False).indices
+        self.road1 = self.markers["road1"].to_numpy(dtype=float)
+        self.road2 = self.markers["road2"].to_numpy(dtype=float)
+        # relevant fields -> mask of the locations that have all of them
+        self.fields_masks: Dict[tuple, np.ndarray] = {}
+
+    def get_fields_mask(self, relevant_fields: List[str]) -> np.ndarray:
+        key = tuple(relevant_fields)
+        if key not in self.fields_masks:
+            mask = np.ones(len(self.markers), dtype=bool)
+            for field in relevant_fields:
+                if field == "road1":
+                    values = self.markers[field]
+                    mask &= (values.notnull() & (values > 0)).to_numpy()
+                elif field in TEXT_FIELDS:
+                    values = self.markers[field]
+                    mask &= (values.notnull() & (values != "")).to_numpy()
+            self.fields_masks[key] = mask
+        return self.fields_masks[key]
+
+    def get_haversine_distances(self, latitude, longitude, rows: np.ndarray) -> np.ndarray:
+        lat, lon = np.radians(latitude), np.radians(longitude)
+        a = (
+            np.sin((self.latitude[rows] - lat) / 2) ** 2
+            + np.cos(lat)
+            * np.cos(self.latitude[rows])
+            * np.sin((self.longitude[rows] - lon) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+    def get_nearest(self, latitude, longitude, mask: Optional[np.ndarray] = None) -> dict:
+        """
+        :param mask: the locations to choose from, all the locations if none of them is in it
+        :returns: the fields of the nearest location
+        """
+        if mask is None or not mask.any():
+            mask = np.ones(len(self.markers), dtype=bool)
+        rows = self.cells.get(geohash.encode(latitude, longitude, precision=GEOHASH_PRECISION))
+        if rows is not None:
+            rows = rows[mask[rows]]
+        if rows is None or len(rows) == 0:
+            rows = np.flatnonzero(mask)
+        distances = self.get_haversine_distances(latitude, longitude, rows)
+        candidates = rows[distances <= distances.min() * (1 + HAVERSINE_MARGIN) + 1]
+        geod = Geodesic.WGS84
+        exact = [
+            geod.Inverse(
+                latitude, longitude, self.markers.at[i, "latitude"], self.markers.at[i, "longitude"]
+            )["s12"]
+            for i in candidates
+        ]
+        # the first of the nearest locations, as the table scan picks
+        return self.markers.iloc[candidates[int(np.argmin(exact))]].to_dict()
+
+    def get_matching_location(self, latitude, longitude, relevant_fields: List[str], road_no=None):
+        mask = self.get_fields_mask(relevant_fields)
+        if (
+            road_no is not None
+            and road_no > 0
+            and ("road1" in relevant_fields or "road2" in relevant_fields)
+        ):
+            mask = mask & ((self.road1 == road_no) | (self.road2 == road_no))
+        return self.get_nearest(latitude, longitude, mask)
+
+
+locations_index: Optional[LocationsIndex] = None
+# the news flashes are processed by several workers, the index is built by one of them
+locations_index_lock = threading.Lock()
+
+
+def get_locations_index(db) -> LocationsIndex:
+    """:param db: the news flash db adapter, the index is loaded on first use"""
+    global locations_index
+    with locations_index_lock:
+        if locations_index is None:
+            start = time.time()
+            locations_index = LocationsIndex(db.get_markers_for_location_extraction())
+            logging.info(
+                f"built the index of {len(locations_index.markers)} cbs locations "
+                f"in {time.time() - start:.2f} seconds"
+            )
+        return locations_index
+
+
+def invalidate_locations_index():
+    """The index is loaded again on its next use, after cbs_locations was recreated"""
+    global locations_index
+    locations_index = None
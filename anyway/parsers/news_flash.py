@@ -1,7 +1,9 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
+from anyway.models import NewsFlash
 from anyway.parsers import twitter, rss_sites
 from anyway.parsers.news_flash_db_adapter import init_db
 from anyway.parsers.news_flash_classifiers import (
@@ -10,9 +12,40 @@ from anyway.parsers.news_flash_classifiers import (
     classify_organization,
 )
 from anyway.parsers.location_extraction import extract_geo_features
+from anyway.utilities import chunks, chunked_generator
 
 # FIX: classifier should be chosen by source (screen name), so `twitter` should be `mda`
 news_flash_classifiers = {"ynet": classify_rss, "twitter": classify_tweets, "walla": classify_rss}
+NEWSFLASH_BATCH_SIZE = 500
+# the location extraction mostly waits for the geocoding api and the db
+NEWSFLASH_WORKERS = 8
+
+
+def process_newsflashes(db, newsflashes, process) -> None:
+    """
+    Runs process on each of the news flashes by a pool of workers. The workers query the db
+    with sessions of their own, the news flashes are stored by the calling thread.
+    """
+
+    def run(newsflash):
+        try:
+            process(newsflash)
+        finally:
+            db.remove_session()
+
+    with ThreadPoolExecutor(max_workers=NEWSFLASH_WORKERS) as pool:
+        list(pool.map(run, newsflashes))
+
+
+def ingest_newsflashes(db, newsflashes, process) -> None:
+    """
+    Stores the new news flashes a batch at a time: the stored ones are dropped in one query,
+    the rest are processed concurrently and inserted in one statement
+    """
+    for batch in chunked_generator(newsflashes, NEWSFLASH_BATCH_SIZE):
+        batch = db.filter_new_newsflashes(batch)
+        process_newsflashes(db, batch, process)
+        db.insert_new_newsflashes(batch)
 
 
 def update_all_in_db(source=None, newsflash_id=None, use_existing_coordinates_only=False):
@@ -28,7 +61,8 @@ def update_all_in_db(source=None, newsflash_id=None, use_existing_coordinates_on
         newsflash_items = db.select_newsflash_where_source(source)
     else:
         newsflash_items = db.get_all_newsflash()
-    for i, newsflash in enumerate(newsflash_items):
+
+    def update(newsflash):
         logging.debug(f"Updating news-flash:{newsflash.id}")
         if not use_existing_coordinates_only:
             classify = news_flash_classifiers[newsflash.source]
@@ -41,16 +75,26 @@ def update_all_in_db(source=None, newsflash_id=None, use_existing_coordinates_on
                 use_existing_coordinates_only=use_existing_coordinates_only,
             )
             newsflash.set_critical()
-        if i % 1000 == 0:
-            db.commit()
-    db.commit()
+
+    # a batch is loaded after the commit of the previous one expired its news flashes, so the
+    # workers don't load them by the session of this thread
+    ids = [nid for (nid,) in newsflash_items.with_entities(NewsFlash.id)]
+    for batch_ids in chunks(ids, NEWSFLASH_BATCH_SIZE):
+        batch = db.get_newsflashes_by_ids(batch_ids)
+        process_newsflashes(db, batch, update)
+        db.commit()
+
+
+RSS_SITES = ["ynet", "walla"]
 
 
 def scrape_extract_store_rss(site_name, db):
     latest_date = db.get_latest_date_of_source(site_name)
-    for newsflash in rss_sites.scrape(site_name):
-        if newsflash.date <= latest_date:
-            break
+    extract_store_rss(site_name, db, rss_sites.scrape(site_name, latest_date=latest_date))
+
+
+def extract_store_rss(site_name, db, newsflashes):
+    def extract(newsflash):
         # TODO: pass both title and description, leaving this choice to the classifier
         newsflash.accident = classify_rss(newsflash.title)
         newsflash.organization = classify_organization(site_name)
@@ -58,21 +102,27 @@ def scrape_extract_store_rss(site_name, db):
             # FIX: No accident-accurate date extracted
             extract_geo_features(db=db, newsflash=newsflash, use_existing_coordinates_only=False)
             newsflash.set_critical()
-        db.insert_new_newsflash(newsflash)
+
+    ingest_newsflashes(db, newsflashes, extract)
 
 
 def scrape_extract_store_twitter(screen_name, db):
     latest_date = db.get_latest_date_of_source("twitter")
-    for newsflash in twitter.scrape(screen_name, db.get_latest_tweet_id()):
-        if newsflash.date <= latest_date:
-            # We can break if we're guaranteed the order is descending
-            continue
+
+    def extract(newsflash):
         newsflash.accident = classify_tweets(newsflash.description)
         newsflash.organization = classify_organization("twitter")
         if newsflash.accident:
             extract_geo_features(db=db, newsflash=newsflash, use_existing_coordinates_only=False)
             newsflash.set_critical()
-        db.insert_new_newsflash(newsflash)
+
+    newsflashes = (
+        newsflash
+        for newsflash in twitter.scrape(screen_name, db.get_latest_tweet_id())
+        # We can break if we're guaranteed the order is descending
+        if newsflash.date > latest_date
+    )
+    ingest_newsflashes(db, newsflashes, extract)
 
 
 def scrape_all():
@@ -81,6 +131,20 @@ def scrape_all():
     """
     sys.path.append(os.path.dirname(os.path.realpath(__file__)))
     db = init_db()
-    scrape_extract_store_rss("ynet", db)
-    scrape_extract_store_rss("walla", db)
+    latest_dates = {site_name: db.get_latest_date_of_source(site_name) for site_name in RSS_SITES}
+
+    def scrape_site(site_name):
+        return list(rss_sites.scrape(site_name, latest_date=latest_dates[site_name]))
+
+    # the sites are scraped concurrently, and stored by this thread that owns the db session
+    with ThreadPoolExecutor(max_workers=len(RSS_SITES)) as pool:
+        scraped = {site_name: pool.submit(scrape_site, site_name) for site_name in RSS_SITES}
+        for site_name in RSS_SITES:
+            try:
+                newsflashes = scraped[site_name].result()
+            except Exception:
+                # the other sites are still stored
+                logging.exception(f"scraping {site_name} failed")
+                continue
+            extract_store_rss(site_name, db, newsflashes)
     # scrape_extract_store_twitter("mda_israel", db)
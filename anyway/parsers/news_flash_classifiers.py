@@ -1,21 +1,26 @@
+from anyway.parsers.keyword_matcher import KeywordMatcher
+
+TWEET_PERSON_WORDS = ["הולך רגל", "הולכת רגל", "נהג", "אדם"]
+TWEET_VEHICLE_WORDS = ["רכב", "מכונית", "אופנוע", "ג'יפ", "טרקטור", "משאית", "אופניים", "קורקינט"]
+TWEET_CAR_ACCIDENT_WORDS = ["תאונת דרכים", "ת.ד"]
+
+tweets_matcher = KeywordMatcher(
+    {
+        "person": TWEET_PERSON_WORDS,
+        "vehicle": TWEET_VEHICLE_WORDS,
+        "car_accident": TWEET_CAR_ACCIDENT_WORDS,
+    }
+)
+
+
 def tweet_with_accident_vehicle_and_person(text):
     """
     check if tweet contains words indicating an accident between person and vehicle
     :param text: tweet text
     :return: boolean, true if tweet contains words, false for others
     """
-    if ("הולך רגל" in text or "הולכת רגל" in text or "נהג" in text or "אדם" in text) and (
-        "רכב" in text
-        or "מכונית" in text
-        or "אופנוע" in text
-        or "ג'יפ" in text
-        or "טרקטור" in text
-        or "משאית" in text
-        or "אופניים" in text
-        or "קורקינט" in text
-    ):
-        return True
-    return False
+    groups = tweets_matcher.find_groups(text)
+    return "person" in groups and "vehicle" in groups
 
 
 def tweet_with_car_accident(text):
@@ -24,9 +29,7 @@ def tweet_with_car_accident(text):
     :param text: tweet text
     :return: boolean, true if tweet contains words, false for others
     """
-    if "תאונת דרכים" in text or "ת.ד" in text:
-        return True
-    return False
+    return "car_accident" in tweets_matcher.find_groups(text)
 
 
 def tweet_with_vehicles(text):
@@ -35,18 +38,7 @@ def tweet_with_vehicles(text):
     :param text: tweet text
     :return: boolean, true if tweet contains vehicle, false for others
     """
-    if (
-        "רכב" in text
-        or "מכונית" in text
-        or "אופנוע" in text
-        or "ג'יפ" in text
-        or "טרקטור" in text
-        or "משאית" in text
-        or "אופניים" in text
-        or "קורקינט" in text
-    ):
-        return True
-    return False
+    return "vehicle" in tweets_matcher.find_groups(text)
 
 
 def classify_tweets(text):
@@ -55,10 +47,14 @@ def classify_tweets(text):
     :param text: tweet text
     :return: boolean, true if tweet is about car accident, false for others
     """
-    return text.startswith("בשעה") and (
-        tweet_with_accident_vehicle_and_person(text)
-        or tweet_with_car_accident(text)
-        or tweet_with_vehicles(text)
+    if not text.startswith("בשעה"):
+        return False
+    # the words of all the checks are found in one pass over the tweet
+    groups = tweets_matcher.find_groups(text)
+    return (
+        ("person" in groups and "vehicle" in groups)
+        or "car_accident" in groups
+        or "vehicle" in groups
     )
 
 
@@ -67,106 +63,121 @@ def classify_organization(source):
     return source_to_organization_mapping.get(source, source)
 
 
+RSS_ACCIDENT_WORDS = ["תאונ", " דרסה ", " דרס ", " נדרס ", " נדרסה "]
+RSS_WORKING_ACCIDENTS_WORDS = ["תאונת עבודה", "תאונות עבודה"]
+RSS_FOLLOWUP_ACCIDENTS_WORDS = [
+    "התאונ",
+    "תאונת ה",
+    "פורסם",
+    "הותר לפרסום",
+    "ההרוג",
+    "הפצוע",
+    "מאסר",
+    "נקבע מותו של ה",
+    "נקבע מותו של נהג ה",
+    "נקבע מותה של ה",
+    "נקבע מותה של נהגת ה",
+    "החשד",
+    "חשוד",
+    "רוכב ה",
+    "הורשע",
+    "אשם",
+    "אישום",
+    "מנוחות",
+    "נעצרו",
+    ': "',
+    "התאונה",
+]
+RSS_INVOLVED_WORDS = [
+    "רכב",
+    "מכונית",
+    "מכוניות",
+    "אוטובוס",
+    "ג'יפ",
+    "משאית",
+    "משאיות",
+    "קטנוע",
+    "טרקטור",
+    "אופנוע",
+    "אופניים",
+    "קורקינט",
+    "הולך רגל",
+    "הולכת רגל",
+    "הולכי רגל",
+]
+RSS_HURT_WORDS = [
+    "פגע",
+    "פגיע",
+    "פגוע",
+    "הריג",
+    "הרוג",
+    "נהרג",
+    "פצע",
+    "פציע",
+    "פצוע",
+    "התנגש",
+    "התהפך",
+    "התהפכ",
+    "החליק",
+    "החלק",
+]
+RSS_SHOOTING_WORDS = [
+    " ירי ",
+    " ירייה ",
+    " יריות ",
+    'בקת"ב',
+    " מירי ",
+    "תופת",
+    "פיצוץ",
+    "נדקר",
+    "הושלך",
+    "הושלכו",
+    "נרגם",
+    "רצח",
+    "יידוי",
+    "תבערה",
+    "רקטות",
+    "רקטה",
+    " טיל ",
+    " נורתה ",
+    "פיגוע",
+    "נעצר",
+    "מטען חבלה",
+    "פגיעה ישירה",
+]
+RSS_SHOOTING_STARTSWITH = (" ירי", " ירייה", " יריות")
+RSS_AIRPLANE_WORDS = ["מטוס", "מסוק"]
+
+rss_matcher = KeywordMatcher(
+    {
+        "accident": RSS_ACCIDENT_WORDS,
+        "working_accident": RSS_WORKING_ACCIDENTS_WORDS,
+        "followup_accident": RSS_FOLLOWUP_ACCIDENTS_WORDS,
+        "involved": RSS_INVOLVED_WORDS,
+        "hurt": RSS_HURT_WORDS,
+        "shooting": RSS_SHOOTING_WORDS,
+        "airplane": RSS_AIRPLANE_WORDS,
+        "israeli": ["ישראלי"],
+    }
+)
+
+
 def classify_rss(text):
     """
     classify ynet news flash for news flash about car accidents and others
     :param text: news flash text
     :return: boolean, true if news flash is about car accident, false for others
     """
-    accident_words = ["תאונ", " דרסה ", " דרס ", " נדרס ", " נדרסה "]
-    working_accidents_words = ["תאונת עבודה", "תאונות עבודה"]
-    followup_accidents_words = [
-        "התאונ",
-        "תאונת ה",
-        "פורסם",
-        "הותר לפרסום",
-        "ההרוג",
-        "הפצוע",
-        "מאסר",
-        "נקבע מותו של ה",
-        "נקבע מותו של נהג ה",
-        "נקבע מותה של ה",
-        "נקבע מותה של נהגת ה",
-        "החשד",
-        "חשוד",
-        "רוכב ה",
-        "הורשע",
-        "אשם",
-        "אישום",
-        "מנוחות",
-        "נעצרו",
-        ': "',
-        "התאונה",
-    ]
-    involved_words = [
-        "רכב",
-        "מכונית",
-        "מכוניות",
-        "אוטובוס",
-        "ג'יפ",
-        "משאית",
-        "משאיות",
-        "קטנוע",
-        "טרקטור",
-        "אופנוע",
-        "אופניים",
-        "קורקינט",
-        "הולך רגל",
-        "הולכת רגל",
-        "הולכי רגל",
-    ]
-    hurt_words = [
-        "פגע",
-        "פגיע",
-        "פגוע",
-        "הריג",
-        "הרוג",
-        "נהרג",
-        "פצע",
-        "פציע",
-        "פצוע",
-        "התנגש",
-        "התהפך",
-        "התהפכ",
-        "החליק",
-        "החלק",
-    ]
-    shooting_words = [
-        " ירי ",
-        " ירייה ",
-        " יריות ",
-        'בקת"ב',
-        " מירי ",
-        "תופת",
-        "פיצוץ",
-        "נדקר",
-        "הושלך",
-        "הושלכו",
-        "נרגם",
-        "רצח",
-        "יידוי",
-        "תבערה",
-        "רקטות",
-        "רקטה",
-        " טיל ",
-        " נורתה ",
-        "פיגוע",
-        "נעצר",
-        "מטען חבלה",
-        "פגיעה ישירה",
-    ]
-    shooting_startswith = [" ירי", " ירייה", " יריות"]
-
-    abroad = text.split()[0].endswith(":") or "ישראלי" in text
-    explicit_accident = any([val in text for val in accident_words])
-    not_work_accident = all([val not in text for val in working_accidents_words])
-    not_followup_accident = all([val not in text for val in followup_accidents_words])
-    involved = any([val in text for val in involved_words])
-    hurt = any([val in text for val in hurt_words])
-    no_shooting = all([val not in text for val in shooting_words]) and all(
-        [not text.startswith(val) for val in shooting_startswith]
-    )
-    airplane = any(val in text for val in ["מטוס", "מסוק"])
+    # the words of all the checks are found in one pass over the news flash
+    groups = rss_matcher.find_groups(text)
+    abroad = text.split()[0].endswith(":") or "israeli" in groups
+    explicit_accident = "accident" in groups
+    not_work_accident = "working_accident" not in groups
+    not_followup_accident = "followup_accident" not in groups
+    involved = "involved" in groups
+    hurt = "hurt" in groups
+    no_shooting = "shooting" not in groups and not text.startswith(RSS_SHOOTING_STARTSWITH)
+    airplane = "airplane" in groups
 
     return (
         not abroad
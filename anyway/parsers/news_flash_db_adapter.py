@@ -1,9 +1,11 @@
 import datetime
 import os
 import logging
+from typing import List
 import pandas as pd
 import numpy as np
-from sqlalchemy import desc
+from sqlalchemy import desc, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from flask_sqlalchemy import SQLAlchemy
 from anyway.parsers import timezones
 from anyway.models import NewsFlash
@@ -32,6 +34,10 @@ class DBAdapter:
     def commit(self, *args, **kwargs):
         return self.db.session.commit(*args, **kwargs)
 
+    def remove_session(self):
+        """Closes the session of the current thread, the sessions are per thread"""
+        self.db.session.remove()
+
     def get_markers_for_location_extraction(self):
         query_res = self.execute(
             """SELECT * FROM cbs_locations"""
@@ -62,22 +68,92 @@ class DBAdapter:
         else:
             logging.debug("newsflash does not have location, not publishing")
 
-    def insert_new_newsflash(self, newsflash: NewsFlash) -> None:
-        logging.info("Adding newsflash, is accident: {}, date: {}"
-                     .format(newsflash.accident, newsflash.date))
-        self.__fill_na(newsflash)
-        self.db.session.add(newsflash)
-        self.db.session.commit()
-        if os.environ.get("FLASK_ENV") == "production" and newsflash.accident:
-            try:
-                DBAdapter.publish_notifications(newsflash)
-            except Exception as e:
-                logging.error("publish notifications failed")
-                logging.error(e)
+    def filter_new_newsflashes(self, newsflashes: List[NewsFlash]) -> List[NewsFlash]:
+        """
+        :returns: the news flashes whose (source, link) is not stored yet, checked in one query,
+        without repeating a (source, link)
+        """
+        keys = {(newsflash.source, newsflash.link) for newsflash in newsflashes}
+        existing = set()
+        if keys:
+            existing = set(
+                self.db.session.query(NewsFlash.source, NewsFlash.link)
+                .filter(tuple_(NewsFlash.source, NewsFlash.link).in_(keys))
+                .all()
+            )
+        res = []
+        for newsflash in newsflashes:
+            key = (newsflash.source, newsflash.link)
+            if key not in existing:
+                res.append(newsflash)
+                if newsflash.link is not None:
+                    existing.add(key)
+        return res
+
+    def insert_new_newsflashes(self, newsflashes: List[NewsFlash]) -> List[NewsFlash]:
+        """
+        Inserts the news flashes in one INSERT ... ON CONFLICT DO NOTHING on the unique
+        (source, link) index, so news flashes stored meanwhile are skipped. The returned ids are
+        matched by (source, link), so the news flashes without a link, which is not unique, are
+        added by the session instead.
+        :returns: the inserted news flashes, with their ids
+        """
+        if not newsflashes:
+            return []
+        for newsflash in newsflashes:
+            self.__fill_na(newsflash)
+        with_link = [newsflash for newsflash in newsflashes if newsflash.link is not None]
+        ids = self.__insert_on_conflict_do_nothing(with_link) if with_link else {}
+        self.db.session.add_all([newsflash for newsflash in newsflashes if newsflash.link is None])
+        self.commit()
+        inserted = []
+        for newsflash in newsflashes:
+            if newsflash.link is not None:
+                nid = ids.pop((newsflash.source, newsflash.link), None)
+                if nid is None:
+                    continue
+                newsflash.id = nid
+            inserted.append(newsflash)
+        logging.info("Added {} newsflashes, {} accidents"
+                     .format(len(inserted), sum(bool(n.accident) for n in inserted)))
+        if os.environ.get("FLASK_ENV") == "production":
+            for newsflash in inserted:
+                if not newsflash.accident:
+                    continue
+                try:
+                    DBAdapter.publish_notifications(newsflash)
+                except Exception as e:
+                    logging.error("publish notifications failed")
+                    logging.error(e)
+        return inserted
+
+    def __insert_on_conflict_do_nothing(self, newsflashes: List[NewsFlash]) -> dict:
+        """:returns: (source, link) -> id of the inserted news flashes"""
+        table = NewsFlash.__table__
+        columns = [column for column in table.columns if column.key != "id"]
+        rows = []
+        for newsflash in newsflashes:
+            row = {}
+            for column in columns:
+                value = getattr(newsflash, column.key)
+                if value is None and column.server_default is not None:
+                    value = literal_column("DEFAULT")
+                row[column.key] = value
+            rows.append(row)
+        query = (
+            insert(table)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["source", "link"])
+            .returning(table.c.id, table.c.source, table.c.link)
+        )
+        return {(source, link): nid for nid, source, link in self.execute(query)}
 
     def get_newsflash_by_id(self, nid):
         return self.db.session.query(NewsFlash).filter(NewsFlash.id == nid)
 
+    def get_newsflashes_by_ids(self, ids) -> List[NewsFlash]:
+        return self.db.session.query(NewsFlash).filter(NewsFlash.id.in_(ids)).all()
+
     def select_newsflash_where_source(self, source):
         return self.db.session.query(NewsFlash).filter(NewsFlash.source == source)
 
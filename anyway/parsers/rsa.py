@@ -6,6 +6,7 @@ from anyway.parsers.utils import batch_iterator
 from anyway.backend_constants import BE_CONST
 from anyway.models import AccidentMarker
 from anyway.app_and_db import db
+from anyway.clusters_calculator import build_cluster_pyramid
 
 
 def _iter_rows(filename):
@@ -81,3 +82,5 @@ def parse(filename):
                            WHERE geom IS NULL;"
     )
     db.session.commit()
+    # the clusters of the rsa markers are served from the pyramid
+    build_cluster_pyramid(provider_code=BE_CONST.RSA_PROVIDER_CODE)
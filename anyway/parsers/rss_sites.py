@@ -1,8 +1,12 @@
-import requests
 from bs4 import BeautifulSoup
 import feedparser
 import json
-from anyway.parsers import timezones
+import logging
+import requests
+from anyway.parsers import http_fetch, timezones
+
+# the statuses of items that are gone for good, these are skipped rather than fetched again
+GONE_STATUSES = {404, 410}
 
 
 def get_author_from_walla_html_soup(html_soup):
@@ -56,23 +60,66 @@ sites_config = {
 
 
 def _fetch(url: str) -> str:
-    return requests.get(url).text
+    return http_fetch.fetch(url)
 
 
-def scrape_raw(site_name: str, *, rss_source=None, fetch_html=_fetch):
+def scrape_raw(site_name: str, *, rss_source=None, fetch_html=_fetch, latest_date=None):
+    """
+    The html of the items is fetched concurrently, see http_fetch.fetch_all. Items that are gone,
+    see GONE_STATUSES, are skipped. When fetching an item fails otherwise, it and the items newer
+    than it are not returned, so the next scrape from the latest stored date fetches them again.
+    :param latest_date: the feed is ordered from its newest item, the items from latest_date on
+    are not fetched
+    """
     config = sites_config[site_name]
     if rss_source is None:
         rss_source = config["rss"]
+    if rss_source.startswith(("http://", "https://")):
+        rss_source = _fetch(rss_source)
     rss_dict = feedparser.parse(rss_source)
     if rss_dict.get("bozo_exception"):
         raise rss_dict["bozo_exception"]
 
+    items = []
     for item_rss in rss_dict["items"]:
-        html_text = fetch_html(item_rss["link"])
+        date = timezones.from_rss(item_rss["published_parsed"])
+        if latest_date is not None and date <= latest_date:
+            break
+        items.append((item_rss, date))
+
+    def fetch_item_html(url):
+        """:returns: the html of the item, None when it is gone, or the error fetching it"""
+        try:
+            return fetch_html(url)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code in GONE_STATUSES:
+                logging.warning(f"skipping the {site_name} item {url}, it is gone: {e}")
+                return None
+            return e
+        except requests.RequestException as e:
+            return e
+
+    links = [item_rss["link"] for item_rss, _ in items]
+    html_texts = list(http_fetch.fetch_all(links, fetch_item_html))
+    failed = [i for i, html_text in enumerate(html_texts) if isinstance(html_text, Exception)]
+    if failed:
+        # the feed is ordered from its newest item, the items before the oldest failed item are
+        # newer than it
+        oldest_failed = failed[-1]
+        logging.warning(
+            f"fetching the {site_name} item {links[oldest_failed]} failed:"
+            f" {html_texts[oldest_failed]}, it and the {oldest_failed} newer items are left"
+            f" for the next scrape"
+        )
+        items = items[oldest_failed + 1 :]
+        html_texts = html_texts[oldest_failed + 1 :]
+    for (item_rss, date), html_text in zip(items, html_texts):
+        if html_text is None:
+            continue
         author, description = config["parser"](item_rss, BeautifulSoup(html_text, "lxml"))
         yield {
             "link": item_rss["link"],
-            "date": timezones.from_rss(item_rss["published_parsed"]),
+            "date": date,
             "source": site_name,
             "author": author,
             "title": item_rss["title"],
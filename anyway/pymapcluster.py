@@ -1,5 +1,7 @@
 ##
-from math import cos, sin, atan2, sqrt
+from math import cos, sin, atan2, sqrt, radians, degrees
+
+import numpy as np
 
 from anyway import globalmaptiles as globaltiles
 
@@ -19,8 +21,8 @@ def center_geolocation(geolocations):
     z = 0
 
     for lat, lon in geolocations:
-        lat = float(lat)
-        lon = float(lon)
+        lat = radians(float(lat))
+        lon = radians(float(lon))
         x += cos(lat) * cos(lon)
         y += cos(lat) * sin(lon)
         z += sin(lat)
@@ -29,7 +31,7 @@ def center_geolocation(geolocations):
     y = float(y / len(geolocations))
     z = float(z / len(geolocations))
 
-    return (atan2(y, x), atan2(z, sqrt(x * x + y * y)))
+    return (degrees(atan2(z, sqrt(x * x + y * y))), degrees(atan2(y, x)))
 
 
 def latlng_to_zoompixels(mercator, lat, lng, zoom):
@@ -38,12 +40,24 @@ def latlng_to_zoompixels(mercator, lat, lng, zoom):
     return pix
 
 
+def latlngs_to_zoompixels(mercator, lats, lngs, zoom):
+    """
+    Vectorized version of latlng_to_zoompixels over numpy arrays of lat/lng
+    """
+    mx = lngs * mercator.originShift / 180.0
+    my = np.log(np.tan((90 + lats) * np.pi / 360.0)) / (np.pi / 180.0)
+    my = my * mercator.originShift / 180.0
+    res = mercator.Resolution(zoom)
+    return (mx + mercator.originShift) / res, (my + mercator.originShift) / res
+
+
 def in_cluster(center, radius, point):
     return sqrt((point[0] - center[0]) ** 2 + (point[1] - center[1]) ** 2) <= radius
 
 
 def cluster_markers(mercator, latlngs, zoom, gridsize=50):
     """
+    Greedy clustering, kept as a reference implementation for grid_cluster_markers.
     Args:
         mercator: instance of GlobalMercator()
         latlngs: list of (lat,lng) tuple
@@ -74,7 +88,6 @@ def cluster_markers(mercator, latlngs, zoom, gridsize=50):
                 break
         if not assigned:
             # Create new cluster for point
-            # TODO center_geolocation the center!
             centers.append(i)
             sizes.append(1)
             clusters.append(len(centers) - 1)
@@ -82,6 +95,79 @@ def cluster_markers(mercator, latlngs, zoom, gridsize=50):
     return centers, clusters, sizes
 
 
+def grid_cell_coordinates(mercator, lats, lngs, zoom, gridsize=50):
+    """
+    Assigns every lat/lng to a square cell of gridsize pixels in the given zoom level.
+    Cells are aligned to the global pixel grid, so a point always falls in the same cell
+    regardless of the bounding box it was queried with.
+    Returns:
+        cell_x, cell_y: numpy arrays of int64 cell coordinates, same length as lats
+    """
+    px, py = latlngs_to_zoompixels(mercator, lats, lngs, zoom)
+    return np.floor(px / gridsize).astype(np.int64), np.floor(py / gridsize).astype(np.int64)
+
+
+def grid_cell_latlng_bounds(mercator, cell_x, cell_y, zoom, gridsize=50):
+    """
+    Returns:
+        sw_lat, sw_lng, ne_lat, ne_lng of a cell of grid_cell_coordinates
+    """
+    sw_lat, sw_lng = mercator.MetersToLatLon(
+        *mercator.PixelsToMeters(cell_x * gridsize, cell_y * gridsize, zoom)
+    )
+    ne_lat, ne_lng = mercator.MetersToLatLon(
+        *mercator.PixelsToMeters((cell_x + 1) * gridsize, (cell_y + 1) * gridsize, zoom)
+    )
+    return sw_lat, sw_lng, ne_lat, ne_lng
+
+
+def grid_cells(mercator, lats, lngs, zoom, gridsize=50):
+    """
+    Returns:
+        numpy array of int64 keys of the cells of grid_cell_coordinates, same length as lats
+    """
+    cell_x, cell_y = grid_cell_coordinates(mercator, lats, lngs, zoom, gridsize)
+    cells_per_axis = int(np.ceil(mercator.tileSize * 2**zoom / gridsize)) + 1
+    return cell_x * cells_per_axis + cell_y
+
+
+def latlngs_to_cartesian(lats, lngs):
+    lats = np.radians(lats)
+    lngs = np.radians(lngs)
+    return np.cos(lats) * np.cos(lngs), np.cos(lats) * np.sin(lngs), np.sin(lats)
+
+
+def cartesian_to_latlngs(x, y, z):
+    return np.degrees(np.arctan2(z, np.sqrt(x * x + y * y))), np.degrees(np.arctan2(y, x))
+
+
+def grid_cluster_markers(mercator, lats, lngs, zoom, gridsize=50):
+    """
+    Clusters markers by grid cell, projecting all points in a single vectorized pass.
+    Args:
+        mercator: instance of GlobalMercator()
+        lats: numpy array of latitudes
+        lngs: numpy array of longitudes
+        zoom: current zoom level
+        gridsize: cluster cell size (in pixels in current zoom level)
+    Returns:
+        center_lats, center_lngs: centroid (as in center_geolocation) of every cluster
+        sizes: number of markers in every cluster
+    """
+    if len(lats) == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    cells = grid_cells(mercator, lats, lngs, zoom, gridsize)
+    _, clusters = np.unique(cells, return_inverse=True)
+    sizes = np.bincount(clusters)
+    x, y, z = latlngs_to_cartesian(lats, lngs)
+    center_lats, center_lngs = cartesian_to_latlngs(
+        np.bincount(clusters, weights=x) / sizes,
+        np.bincount(clusters, weights=y) / sizes,
+        np.bincount(clusters, weights=z) / sizes,
+    )
+    return center_lats, center_lngs, sizes
+
+
 def create_clusters_centers(markers, zoom, radius):
     mercator = globaltiles.GlobalMercator()
     centers, clusters, sizes = cluster_markers(mercator, markers, zoom, radius)
@@ -104,14 +190,20 @@ def get_cluster_size(index, clusters):
     return Counter(clusters)[index]
 
 
-def calculate_clusters(markers, zoom, radius=50):
-    centers, _, sizes = create_clusters_centers(markers, zoom, radius)
-    json_clusts = []
+def markers_to_latlngs(markers):
+    lats = np.fromiter((marker.latitude for marker in markers), dtype=float, count=len(markers))
+    lngs = np.fromiter((marker.longitude for marker in markers), dtype=float, count=len(markers))
+    return lats, lngs
 
-    for i, point in enumerate(centers):
-        json_clusts.append(get_cluster_json(point, sizes[i]))
 
-    return json_clusts
+def calculate_clusters(markers, zoom, radius=50):
+    mercator = globaltiles.GlobalMercator()
+    lats, lngs = markers_to_latlngs(markers)
+    center_lats, center_lngs, sizes = grid_cluster_markers(mercator, lats, lngs, zoom, radius)
+    return [
+        {"longitude": float(lng), "latitude": float(lat), "size": int(size)}
+        for lat, lng, size in zip(center_lats, center_lngs, sizes)
+    ]
 
 
 ##
@@ -0,0 +1,73 @@
+"""
+Benchmark the grid clustering engine used by /clusters against the greedy reference implementation.
+Markers are synthetic and uniformly spread over Israel's bounding box, so no DB is needed.
+To run:
+python -m anyway.scripts.benchmark_clusters [flags]
+
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from anyway.pymapcluster import calculate_clusters, create_clusters_centers
+
+SyntheticMarker = namedtuple("SyntheticMarker", ["latitude", "longitude"])
+
+ISRAEL_MIN_LAT = 29.5
+ISRAEL_MAX_LAT = 33.3
+ISRAEL_MIN_LNG = 34.2
+ISRAEL_MAX_LNG = 35.9
+DEFAULT_SIZES = [100000, 500000, 1000000]
+DEFAULT_ZOOMS = [8, 9, 10, 11]
+# the greedy implementation is O(n*k), above this size it takes hours
+DEFAULT_GREEDY_MAX_SIZE = 100000
+
+
+def create_synthetic_markers(size, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(ISRAEL_MIN_LAT, ISRAEL_MAX_LAT, size)
+    lngs = rng.uniform(ISRAEL_MIN_LNG, ISRAEL_MAX_LNG, size)
+    return [SyntheticMarker(lat, lng) for lat, lng in zip(lats.tolist(), lngs.tolist())]
+
+
+def time_call(func, *args):
+    start_time = time.time()
+    result = func(*args)
+    return time.time() - start_time, result
+
+
+def greedy_clusters(markers, zoom):
+    return create_clusters_centers(markers, zoom, 50)[0]
+
+
+def main(sizes, zooms, greedy_max_size):
+    print("size\tzoom\tgrid_seconds\tgrid_clusters\tgreedy_seconds\tgreedy_clusters")
+    for size in sizes:
+        markers = create_synthetic_markers(size)
+        for zoom in zooms:
+            grid_seconds, grid_result = time_call(calculate_clusters, markers, zoom)
+            if size <= greedy_max_size:
+                greedy_seconds, greedy_result = time_call(greedy_clusters, markers, zoom)
+                greedy_columns = f"{greedy_seconds:.3f}\t{len(greedy_result)}"
+            else:
+                greedy_columns = "skipped\t-"
+            print(f"{size}\t{zoom}\t{grid_seconds:.3f}\t{len(grid_result)}\t{greedy_columns}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="number of synthetic markers"
+    )
+    parser.add_argument("--zooms", nargs="+", type=int, default=DEFAULT_ZOOMS, help="zoom levels")
+    parser.add_argument(
+        "--greedy_max_size",
+        type=int,
+        default=DEFAULT_GREEDY_MAX_SIZE,
+        help="skip the greedy implementation above this number of markers",
+    )
+    args = parser.parse_args()
+    main(sizes=args.sizes, zooms=args.zooms, greedy_max_size=args.greedy_max_size)
@@ -1,4 +1,5 @@
 import argparse
+import csv
 import logging
 import math
 import os
@@ -9,9 +10,8 @@ import typing
 from csv import DictReader
 from datetime import datetime
 from functools import partial
+from io import StringIO
 from urllib.parse import urlparse
-from sqlalchemy import func, or_
-from sqlalchemy.sql import select
 
 import phonenumbers
 from dateutil.relativedelta import relativedelta
@@ -173,19 +173,6 @@ def row_to_dict(row):
     return row._asdict()
 
 
-def fetch_first_and_every_nth_value_for_column(conn, column_to_fetch, n):
-    sub_query = select([])\
-        .column(column_to_fetch)\
-        .column(func.row_number().over(order_by=column_to_fetch).label("row_number"))\
-        .alias()
-    select_query = select([sub_query]) \
-        .where(or_(func.mod(sub_query.c.row_number, n) == 0,
-                   sub_query.c.row_number == 1))
-    ids_and_row_numbers = conn.execute(select_query).fetchall()
-    ids = [id_and_row_number[0] for id_and_row_number in ids_and_row_numbers]
-    return ids
-
-
 def truncate_tables(db, tables):
     logging.info("Deleting tables: " + ", ".join(table.__name__ for table in tables))
     for table in tables:
@@ -199,22 +186,94 @@ def delete_all_rows_from_table(conn, table):
     conn.execute("DELETE FROM " + table_name)
 
 
-def split_query_to_chunks_by_column(base_select, column_to_chunk_by, chunk_size, conn):
-    column_values = fetch_first_and_every_nth_value_for_column(conn, column_to_chunk_by, chunk_size)
-    logging.debug("after fetching every nth column")
-    for index in range(len(column_values)):
-        select = base_select.where(column_to_chunk_by >= column_values[index])
-        if index + 1 < len(column_values):
-            select = select.where(column_to_chunk_by < column_values[index + 1])
-        chunk = conn.execute(select).fetchall()
-        logging.debug("after running query on chunk")
-        yield [dict(row.items()) for row in chunk]
-    logging.debug("after running query on all chunks")
+def get_next_value_for_column(conn, base_select, column, after=None, offset=0):
+    """
+    :returns: the value of column in base_select that comes offset rows after the first value
+    greater than after (or the first value, if after is None), or None if there is no such row
+    """
+    select = base_select.with_only_columns([column]).order_by(column).offset(offset).limit(1)
+    if after is not None:
+        select = select.where(column > after)
+    return conn.execute(select).scalar()
+
+
+def split_query_to_ranges_by_column(base_select, column_to_chunk_by, chunk_size, conn):
+    """
+    Yields base_select restricted to consecutive ranges of column_to_chunk_by, each of about
+    chunk_size rows. The range boundaries are found one by one with keyset pagination on the
+    column, so the column should be indexed.
+    """
+    start = get_next_value_for_column(conn, base_select, column_to_chunk_by)
+    while start is not None:
+        # rows with the start value all go to the range, so the end is always greater than start
+        end = get_next_value_for_column(
+            conn, base_select, column_to_chunk_by, after=start, offset=chunk_size - 1
+        )
+        select = base_select.where(column_to_chunk_by >= start)
+        if end is not None:
+            select = select.where(column_to_chunk_by < end)
+        yield select
+        start = end
+
+
+def run_query_and_insert_to_table_in_chunks(
+    query, table_inserted_to, column_to_chunk_by, chunk_size, conn
+):
+    """
+    Inserts the rows of query to table_inserted_to with INSERT ... SELECT on ranges of
+    column_to_chunk_by, so the rows are copied within the db.
+    The labels of the query columns are the columns of table_inserted_to they are inserted to.
+    """
+    columns = [column.key for column in query.columns]
+    inserted = 0
+    for select in split_query_to_ranges_by_column(query, column_to_chunk_by, chunk_size, conn):
+        result = conn.execute(table_inserted_to.__table__.insert().from_select(columns, select))
+        inserted += result.rowcount
+        logging.debug(f"inserted {inserted} rows to {table_inserted_to.__tablename__}")
+    return inserted
+
 
+COPY_NULL = "\\N"
 
-def run_query_and_insert_to_table_in_chunks(query, table_inserted_to, column_to_chunk_by, chunk_size, conn):
-    for chunk in split_query_to_chunks_by_column(query, column_to_chunk_by, chunk_size, conn):
-        conn.execute(table_inserted_to.__table__.insert(), chunk)
+
+def get_copy_value(value):
+    """
+    The text of value in the copy data. Whole floats are written as integers, COPY doesn't accept
+    "6.0" for an integer column
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def get_copy_data(rows, columns):
+    """
+    :returns: rows (dicts) as the csv data of copy_data_to_table
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([get_copy_value(row.get(column)) for column in columns])
+    return buffer.getvalue()
+
+
+def copy_data_to_table(conn, table, columns, data):
+    """
+    Loads csv data of get_copy_data into table with COPY FROM STDIN, as part of the transaction
+    of conn.
+    """
+    copy_sql = "COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{null}')".format(
+        table=table.__tablename__,
+        columns=", ".join('"{}"'.format(column) for column in columns),
+        null=COPY_NULL,
+    )
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(copy_sql, StringIO(data))
+    finally:
+        cursor.close()
 
 
 def valid_date(date_string):
@@ -271,6 +330,21 @@ def chunked_generator(input_generator, chunk_size):
         yield chunk
 
 
+def fetch_rows_in_chunks(query, chunk_size: int):
+    """Fetches the rows of the query with a server side cursor, chunk_size rows at a time"""
+    result = (
+        query.session.connection().execution_options(stream_results=True).execute(query.statement)
+    )
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        result.close()
+
+
 def parse_age_from_range(age_range: int) -> typing.Optional[typing.Tuple[int, int]]:
     # Convert from 'age_group' field in the table 'involved_markers_hebrew' to age range numbers
     ret_age_code_to_age_range = {
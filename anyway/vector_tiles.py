@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func, literal_column, select
+
+from anyway import globalmaptiles as globaltiles
+from anyway.app_and_db import db
+from anyway.models import AccidentMarker
+
+MVT_MIMETYPE = "application/vnd.mapbox-vector-tile"
+MARKERS_LAYER_NAME = "markers"
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_CACHE_MAX_SIZE = 2048
+TILE_CACHE_TTL_SECONDS = 60 * 60
+# the zoom levels of the served tiles, as of the map
+TILE_MIN_ZOOM = 0
+TILE_MAX_ZOOM = 22
+# the tile itself determines these, so they are not part of the filter hash
+TILE_ARGS = ("ne_lat", "ne_lng", "sw_lat", "sw_lng", "zoom", "page", "per_page")
+
+# tile key -> (creation time, tile bytes)
+tiles_cache = OrderedDict()
+
+
+def is_valid_tile(z, x, y):
+    return TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def get_tile_latlng_bounds(z, x, y):
+    """
+    :returns: sw_lat, sw_lng, ne_lat, ne_lng of an XYZ (google) tile
+    """
+    mercator = globaltiles.GlobalMercator()
+    tms_y = (2**z - 1) - y
+    return mercator.TileLatLonBounds(x, tms_y, z)
+
+
+def get_tile_meters_bounds(z, x, y):
+    mercator = globaltiles.GlobalMercator()
+    tms_y = (2**z - 1) - y
+    return mercator.TileBounds(x, tms_y, z)
+
+
+def get_filter_hash(kwargs):
+    filters = {arg: value for arg, value in kwargs.items() if arg not in TILE_ARGS}
+    filters_str = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha1(filters_str.encode("utf-8")).hexdigest()
+
+
+def get_cached_tile(key):
+    cached = tiles_cache.get(key)
+    if cached is None:
+        return None
+    created, tile = cached
+    if time.time() - created > TILE_CACHE_TTL_SECONDS:
+        del tiles_cache[key]
+        return None
+    tiles_cache.move_to_end(key)
+    return tile
+
+
+def set_cached_tile(key, tile):
+    tiles_cache[key] = (time.time(), tile)
+    tiles_cache.move_to_end(key)
+    while len(tiles_cache) > TILE_CACHE_MAX_SIZE:
+        tiles_cache.popitem(last=False)
+
+
+def get_markers_tile_query(z, x, y, kwargs):
+    minx, miny, maxx, maxy = get_tile_meters_bounds(z, x, y)
+    query_entities = [
+        AccidentMarker.id.label("id"),
+        AccidentMarker.provider_code.label("provider_code"),
+        AccidentMarker.accident_year.label("accident_year"),
+        AccidentMarker.accident_severity.label("accident_severity"),
+        AccidentMarker.location_accuracy.label("location_accuracy"),
+        func.to_char(AccidentMarker.created, 'YYYY-MM-DD"T"HH24:MI:SS').label("created"),
+        func.ST_AsMVTGeom(
+            func.ST_Transform(AccidentMarker.geom, 3857),
+            func.ST_MakeEnvelope(minx, miny, maxx, maxy, 3857),
+            TILE_EXTENT,
+            TILE_BUFFER,
+            True,
+        ).label("geom"),
+    ]
+    result = AccidentMarker.bounding_box_query(
+        is_thin=False, query_entities=query_entities, **kwargs
+    )
+    # some filters short-circuit to an empty query of whole markers, so the entities are reapplied
+    markers = result.accident_markers.with_entities(*query_entities).order_by(None)
+    rsa_markers = result.rsa_markers.with_entities(*query_entities).order_by(None)
+    tile_rows = markers.union_all(rsa_markers).subquery("tile")
+    return select(
+        [func.ST_AsMVT(literal_column("tile"), MARKERS_LAYER_NAME, TILE_EXTENT, "geom")]
+    ).select_from(tile_rows)
+
+
+def get_markers_tile(z, x, y, **kwargs):
+    """
+    Mapbox Vector Tile of the markers in tile z/x/y, filtered like /markers.
+    kwargs are the filters of flask_app.get_kwargs, the bounding box is taken from the tile.
+    """
+    key = (z, x, y, get_filter_hash(kwargs))
+    tile = get_cached_tile(key)
+    if tile is not None:
+        return tile
+    sw_lat, sw_lng, ne_lat, ne_lng = get_tile_latlng_bounds(z, x, y)
+    kwargs.update(
+        {
+            "sw_lat": sw_lat,
+            "sw_lng": sw_lng,
+            "ne_lat": ne_lat,
+            "ne_lng": ne_lng,
+            "zoom": z,
+            "page": 0,
+            "per_page": 0,
+        }
+    )
+    start_time = time.time()
+    tile = db.session.execute(get_markers_tile_query(z, x, y, kwargs)).scalar()
+    tile = bytes(tile) if tile is not None else b""
+    logging.debug("building tile %d/%d/%d took %f seconds" % (z, x, y, time.time() - start_time))
+    set_cached_tile(key, tile)
+    return tile
@@ -1,18 +1,18 @@
 # pylint: disable=no-name-in-module
 # pylint: disable=no-self-argument
 
+import csv
 import datetime
 import json
 import logging
-import pandas as pd
 import os
 
 from typing import List, Optional, Tuple, Any
 from http import HTTPStatus
 from collections import OrderedDict
 
-from flask import request, Response, make_response, jsonify
-from sqlalchemy import and_, not_, or_
+from flask import request, Response, make_response, jsonify, stream_with_context
+from sqlalchemy import and_, func, not_, or_, select, tuple_
 
 from anyway.app_and_db import db
 from anyway.backend_constants import (
@@ -22,6 +22,7 @@ from anyway.backend_constants import (
 )
 from anyway.models import NewsFlash, LocationVerificationHistory
 from anyway.infographics_utils import is_news_flash_resolution_supported
+from anyway.infographics_response_cache import invalidate_responses_cache
 from anyway.request_params import get_request_params_from_request_values
 from pydantic import BaseModel, ValidationError, validator
 
@@ -30,10 +31,12 @@ from anyway.views.user_system.user_functions import get_current_user
 from anyway.error_code_and_strings import Errors as Es
 from anyway.parsers.resolution_fields import ResolutionFields as RF
 from anyway.models import AccidentMarkerView, InvolvedView
-from anyway.widgets.widget_utils import get_accidents_stats
+from anyway.widgets.widget_utils import get_query, get_stats_filters
 from anyway.parsers.location_extraction import get_road_segment_name_and_number
 from anyway.telegram_accident_notifications import publish_telegram_notification_on_location_verified
-from io import BytesIO
+from anyway.utilities import fetch_rows_in_chunks
+from io import StringIO
+from tempfile import TemporaryFile
 
 DEFAULT_OFFSET_REQ_PARAMETER = 0
 DEFAULT_LIMIT_REQ_PARAMETER = 100
@@ -44,6 +47,15 @@ NEWS_FLASH_ID = "newsFlashId"
 ID = "id"
 LIMIT = "limit"
 OFFSET = "offset"
+DOWNLOAD_DATA_CHUNK_SIZE = 1000
+# the column the injury severities counts of /api/download-data are inserted before
+DOWNLOAD_DATA_SEVERITIES_BEFORE = "מהירות מותרת"
+DOWNLOAD_DATA_SEVERITIES_NAMES = {
+    "פצוע קל": "פצוע/ה קל",
+    "פצוע בינוני": "פצוע/ה בינוני",
+    "פצוע קשה": "פצוע/ה קשה",
+    "הרוג": "הרוג/ה",
+}
 
 
 class NewsFlashQuery(BaseModel):
@@ -375,6 +387,9 @@ def update_news_flash_qualifying(id):
             new_location=new_location,
             new_qualification=new_location_qualifiction,
         )
+        if new_location != old_location:
+            # the cached infographics of the news flash are of its previous location
+            invalidate_responses_cache()
         VERIFIED_QUALIFICATIONS = [NewsflashLocationQualification.MANUAL.value,
                                    NewsflashLocationQualification.VERIFIED.value]
         if os.environ.get("FLASK_ENV") == "production" and \
@@ -384,10 +399,7 @@ def update_news_flash_qualifying(id):
         return Response(status=HTTPStatus.OK)
 
 
-def get_downloaded_data(format, years_ago):
-    request_params = get_request_params_from_request_values(request.values)
-    end_time = datetime.datetime.now()
-    start_time = end_time - datetime.timedelta(days=years_ago*365)
+def get_download_data_columns() -> OrderedDict:
     columns = OrderedDict()
 
     columns[AccidentMarkerView.id] = 'מס תאונה'
@@ -439,55 +451,134 @@ def get_downloaded_data(format, years_ago):
     columns[AccidentMarkerView.latitude] = 'קו רוחב'
     columns[AccidentMarkerView.x] = 'X קואורדינטה'
     columns[AccidentMarkerView.y] = 'Y קואורדינטה'
-
-    related_accidents = get_accidents_stats(
-        table_obj=AccidentMarkerView,
-        columns=columns.keys(),
-        filters=request_params.location_info,
-        start_time=start_time,
-        end_time=end_time
+    return columns
+
+
+def get_download_data_query(location_info, start_time, end_time):
+    """
+    The query of the accidents of /api/download-data, with a column of the count of involved of each
+    injury severity the accidents have, after the column of the accident severity
+    :returns: the query and its output column names
+    """
+    columns = get_download_data_columns()
+    accidents_query = get_query(
+        AccidentMarkerView, get_stats_filters(location_info, None), start_time, end_time
+    )
+    accident_keys = accidents_query.with_entities(
+        AccidentMarkerView.provider_code, AccidentMarkerView.id
+    ).subquery()
+    involved_filter = tuple_(InvolvedView.provider_code, InvolvedView.accident_id).in_(
+        select([accident_keys.c.provider_code, accident_keys.c.id])
+    )
+    severities_hebrew = [
+        severity
+        for severity, in db.session.query(InvolvedView.injury_severity_hebrew)
+        .filter(involved_filter, InvolvedView.injury_severity_hebrew.isnot(None))
+        .group_by(InvolvedView.injury_severity_hebrew)
+        .order_by(func.min(InvolvedView.injury_severity))
+    ]
+    severity_counts = (
+        db.session.query(
+            InvolvedView.provider_code,
+            InvolvedView.accident_id,
+            *[
+                func.nullif(
+                    func.count().filter(InvolvedView.injury_severity_hebrew == severity), 0
+                ).label(f"severity_{i}")
+                for i, severity in enumerate(severities_hebrew)
+            ],
+        )
+        .filter(involved_filter)
+        .group_by(InvolvedView.provider_code, InvolvedView.accident_id)
+        .subquery()
     )
-    accident_ids = list(related_accidents['id'].values())
-    accident_severities = get_accidents_stats(
-        table_obj=InvolvedView,
-        group_by=("accident_id", "injury_severity_hebrew"),
-        count="injury_severity_hebrew",
-        filters={"accident_id": accident_ids}
+    index_to_insert_severities = list(columns.values()).index(DOWNLOAD_DATA_SEVERITIES_BEFORE)
+    accident_columns = list(columns.keys())
+    query_columns = (
+        accident_columns[:index_to_insert_severities]
+        + [severity_counts.c[f"severity_{i}"] for i in range(len(severities_hebrew))]
+        + accident_columns[index_to_insert_severities:]
     )
+    column_names = list(columns.values())
+    output_column_names = (
+        column_names[:index_to_insert_severities]
+        + [DOWNLOAD_DATA_SEVERITIES_NAMES.get(s, s) for s in severities_hebrew]
+        + column_names[index_to_insert_severities:]
+    )
+    query = accidents_query.outerjoin(
+        severity_counts,
+        and_(
+            severity_counts.c.provider_code == AccidentMarkerView.provider_code,
+            severity_counts.c.accident_id == AccidentMarkerView.id,
+        ),
+    ).with_entities(*query_columns)
+    return query, output_column_names
+
+
+def generate_csv(column_names: List[str], rows_chunks):
+    """
+    Yields the csv of the rows, a chunk at a time. The first column is the number of the row.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([""] + column_names)
+    row_number = 0
+    for rows in rows_chunks:
+        for row in rows:
+            writer.writerow([row_number, *row])
+            row_number += 1
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_xlsx(column_names: List[str], rows_chunks, chunk_size: int = 1024 * 1024):
+    """
+    Writes the rows to a write only workbook, that keeps only the current row in memory, and
+    yields the saved file a chunk at a time. The first column is the number of the row.
+    """
+    # imported here like pandas.to_excel did, as it is only needed for xlsx downloads
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([None] + column_names)
+    row_number = 0
+    for rows in rows_chunks:
+        for row in rows:
+            sheet.append([row_number, *row])
+            row_number += 1
+    with TemporaryFile() as xlsx_file:
+        workbook.save(xlsx_file)
+        xlsx_file.seek(0)
+        while True:
+            data = xlsx_file.read(chunk_size)
+            if not data:
+                break
+            yield data
 
-    severities_hebrew = set()
-    for i, accident_id in enumerate(accident_ids):
-        for severity_hebrew, severity_count in accident_severities[accident_id].items():
-            if severity_hebrew is None:
-                continue
-            severities_hebrew.add(severity_hebrew)
-            if severity_hebrew not in related_accidents:
-                related_accidents[severity_hebrew] = {}
-            related_accidents[severity_hebrew][i] = severity_count
-
-    json_data = json.dumps(related_accidents, default=str)
-    buffer = BytesIO()
-    df = pd.read_json(json_data)
-    df.rename(columns={key.name.replace('_hebrew', ''): value for key, value in columns.items()}, inplace=True)
-
-    index_to_insert_severities = list(columns.values()).index('מהירות מותרת')
-    output_column_names = list(columns.values())[:index_to_insert_severities] + list(severities_hebrew) + list(columns.values())[index_to_insert_severities:]
-    df = df[output_column_names]
-    df.rename(columns={'פצוע קל': 'פצוע/ה קל', 'פצוע בינוני': 'פצוע/ה בינוני', 'פצוע קשה': 'פצוע/ה קשה', 'הרוג': 'הרוג/ה'}, inplace=True)
 
+def get_downloaded_data(format, years_ago):
+    request_params = get_request_params_from_request_values(request.values)
+    end_time = datetime.datetime.now()
+    start_time = end_time - datetime.timedelta(days=years_ago*365)
+    query, column_names = get_download_data_query(
+        request_params.location_info, start_time, end_time
+    )
     if format == 'csv':
-        df.to_csv(buffer, encoding="utf-8")
+        data = generate_csv(column_names, fetch_rows_in_chunks(query, DOWNLOAD_DATA_CHUNK_SIZE))
         mimetype ='text/csv'
         file_type = 'csv'
     elif format == 'xlsx':
-        df.to_excel(buffer, encoding="utf-8")
+        data = generate_xlsx(column_names, fetch_rows_in_chunks(query, DOWNLOAD_DATA_CHUNK_SIZE))
         mimetype='application/vnd.ms-excel'
         file_type = 'xlsx'
     else:
         raise Exception(f'File format not supported for downloading : {format}')
 
     headers = { 'Content-Disposition': f'attachment; filename=anyway_download_{datetime.datetime.now().strftime("%d_%m_%Y_%H_%M_%S")}.{file_type}' }
-    return Response(buffer.getvalue(), mimetype=mimetype, headers=headers)
+    return Response(stream_with_context(data), mimetype=mimetype, headers=headers)
 
 
 def search_newsflashes_by_resolution(session, resolutions, include_resolutions, limit=None):
@@ -1,7 +1,8 @@
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Iterator, Optional, Tuple, Any
 from collections import namedtuple
+from functools import lru_cache
+import json
 import math
-import pandas as pd
 from sqlalchemy.orm import aliased
 from sqlalchemy import and_, or_
 from sqlalchemy.schema import Column
@@ -27,6 +28,7 @@ from anyway.models import (
     Streets,
 )
 from anyway.app_and_db import db
+from anyway.utilities import fetch_rows_in_chunks
 from anyway.views.safety_data import sd_utils as sdu
 
 
@@ -69,14 +71,21 @@ class InvolvedQuery:
     vehicle_type_to_str[24] = VehicleTypeHebrew("משאית", "משא 3.6 עד 9.9 טון")
     vehicle_type_to_str[25] = VehicleTypeHebrew("משאית", "משא 10.0 עד 12.0 טון")
     PAGE_NUMBER_DEFAULT = 0
-    PAGE_SIZE_DEFAULT = 8192
+    # the rows are encoded while they are fetched, so a page is not held in memory
+    PAGE_SIZE_DEFAULT = 65536
+    ROWS_CHUNK_SIZE = 2000
+    json_encoder = json.JSONEncoder(default=str)
 
     def __init__(self):
         self.S1: Streets = aliased(Streets)
         self.S2: Streets = aliased(Streets)
         self.fill_text_tables()
 
-    def get_data(self):
+    def get_data(self) -> Iterator[str]:
+        """
+        :returns: the json of the response in chunks. The params are checked before returning,
+        the rows are fetched with a server side cursor while the chunks are consumed.
+        """
         vals = sdu.get_params()
         query = self.get_base_query()
         query, p_num, p_size, count = ParamFilterExp.add_params_filter(
@@ -84,18 +93,23 @@ class InvolvedQuery:
         )
         if count:
             num_items = query.count()
-            return {"count": num_items}
-        # pylint: disable=no-member
-        df = pd.read_sql_query(query.statement, query.session.bind)
-        data = df.to_dict(orient="records")  # pylint: disable=no-member
-        [self.add_text(d) for d in data]
-        return {
-            "data": data,
-            "pagination": {
-                "page_size": p_size,
-                "page_number": p_num,
-            },
-        }
+            return iter([json.dumps({"count": num_items})])
+        return self.generate_json(fetch_rows_in_chunks(query, self.ROWS_CHUNK_SIZE), p_num, p_size)
+
+    def generate_json(self, rows_chunks, p_num: int, p_size: int) -> Iterator[str]:
+        """Encodes {"data": [...], "pagination": {...}} a chunk of rows at a time"""
+        yield '{"data": ['
+        separator = ""
+        for rows in rows_chunks:
+            data = []
+            for row in rows:
+                d = dict(row)
+                self.add_text(d)
+                data.append(self.json_encoder.encode(d))
+            yield separator + ", ".join(data)
+            separator = ", "
+        pagination = {"page_size": p_size, "page_number": p_num}
+        yield f'], "pagination": {json.dumps(pagination)}}}'
 
     def get_base_query(self):
         query = (
@@ -266,7 +280,7 @@ class InvolvedQuery:
 
     def add_text(self, d: dict) -> None:
         def nan_to_none(v):
-            return None if v is None or math.isnan(v) else v
+            return None if v is None or (isinstance(v, float) and math.isnan(v)) else v
 
         d["vehicles"] = self.vehicle_type_bit_2_heb(d["vehicles"])
         n = d["day_in_week_hebrew"]
@@ -279,9 +293,8 @@ class InvolvedQuery:
             else self.INVOLVED_NOT_INJURED_HEBERW
         )
         vehicle_type = d["vehicle_vehicle_type_hebrew"]
-        vehicle_type = (
-            None if vehicle_type is None or math.isnan(vehicle_type) else int(vehicle_type)
-        )
+        vehicle_type = nan_to_none(vehicle_type)
+        vehicle_type = None if vehicle_type is None else int(vehicle_type)
         d["vehicle_type_short_hebrew"] = (
             self.vehicle_type_to_str[vehicle_type].short if vehicle_type else None
         )
@@ -290,10 +303,11 @@ class InvolvedQuery:
             if injured_type == 1
             else (self.vehicle_type_to_str[vehicle_type].full if vehicle_type else None)
         )
-        d["accident_timestamp"] = pd.to_datetime(d["accident_timestamp"]).strftime("%Y-%m-%d %H:%M")
+        timestamp = d["accident_timestamp"]
+        d["accident_timestamp"] = timestamp.strftime("%Y-%m-%d %H:%M") if timestamp else None
         for k in ["latitude", "longitude"]:
-            v = d[k]
-            d[k] = f"{v:.13f}" if not math.isnan(v) else ""
+            v = nan_to_none(d[k])
+            d[k] = f"{v:.13f}" if v is not None else ""
         for k in ["TEST-vehicle_type", "road1", "road2"]:
             d[k] = nan_to_none(d[k])
 
@@ -312,8 +326,9 @@ class InvolvedQuery:
             return injured_hebrew
 
     @staticmethod
-    def vehicle_type_bit_2_heb(bit_map: int) -> str:
-        if bit_map == 0:
+    @lru_cache(maxsize=None)
+    def vehicle_type_bit_2_heb(bit_map: Optional[int]) -> str:
+        if not bit_map:
             return ""
         res = [
             InvolvedQuery.vehicle_type_to_str[vehicle_type][0]
@@ -491,8 +506,17 @@ class ParamFilterExp:
 
     @staticmethod
     def add_params_filter(
-        query, params: Dict[str, List[str]], add_pagination=False
+        query,
+        params: Dict[str, List[str]],
+        add_pagination=False,
+        pfe: Optional[Dict[str, dict]] = None,
+        vehicles_col: Column = SDAccident.vehicles,
     ) -> Tuple[Any, int, int, bool]:
+        """
+        :param pfe: the columns of the params, ParamFilterExp.PFE by default
+        :param vehicles_col: the vehicles bitmap column the vcli param filters by
+        """
+        pfe = ParamFilterExp.PFE if pfe is None else pfe
         p_num = InvolvedQuery.PAGE_NUMBER_DEFAULT
         p_size = InvolvedQuery.PAGE_SIZE_DEFAULT
         param_ok = True
@@ -515,17 +539,13 @@ class ParamFilterExp:
             elif k == "vcl":
                 query = ParamFilterExp.add_vcl_filter(query, v)
             elif k == "vcli":
-                query = ParamFilterExp.add_vcli_filter(query, v)
+                query = ParamFilterExp.add_vcli_filter(query, v, vehicles_col)
             else:
-                p = ParamFilterExp.PFE.get(k)
+                p = pfe.get(k)
                 if p is not None and ("single" not in p or len(v) == 1):
-                    f = (
-                        ParamFilterExp.PFE[k]["op"]
-                        if "op" in ParamFilterExp.PFE[k]
-                        else (Column.__eq__ if len(v) == 1 else Column.in_)
-                    )
+                    f = p["op"] if "op" in p else (Column.__eq__ if len(v) == 1 else Column.in_)
                     val = v[0] if len(v) == 1 else v
-                    query = query.filter(or_(*[f(x, val) for x in ParamFilterExp.PFE[k]["col"]]))
+                    query = query.filter(or_(*[f(x, val) for x in p["col"]]))
                 else:
                     param_ok = False
             if not param_ok:
@@ -552,7 +572,7 @@ class ParamFilterExp:
         return query
 
     @staticmethod
-    def add_vcli_filter(query, values: List[str]):
+    def add_vcli_filter(query, values: List[str], vehicles_col: Column = SDAccident.vehicles):
         all_valuse = 0
         for v in values:
             if v.isdigit():
@@ -563,5 +583,5 @@ class ParamFilterExp:
                 all_valuse |= ParamFilterExp.VCLI_FILTER_DATA[val]["val"]
             else:
                 raise ValueError(f"{v}:invalid vcli filter value")
-        query = query.filter(SDAccident.vehicles.op("&")(all_valuse) != 0)
+        query = query.filter(vehicles_col.op("&")(all_valuse) != 0)
         return query
@@ -1,9 +1,10 @@
 from typing import List, Dict, Optional, Tuple, Any
 from copy import copy
-from sqlalchemy import case, desc, asc, not_
+from sqlalchemy import and_, case, desc, asc, not_
 from sqlalchemy.schema import Column
 from sqlalchemy.orm.query import Query
 import logging
+from anyway import config
 from anyway.models import (
     AccidentType,
     AgeGroup,
@@ -19,6 +20,7 @@ from anyway.models import (
     RoadWidth,
     SDAccident,
     SDInvolved,
+    SDInvolvedCube,
     Sex,
     SpeedLimit,
 )
@@ -26,6 +28,7 @@ from anyway.app_and_db import db
 from anyway.widgets import widget_utils as wd
 from anyway.views.safety_data.involved_query import InvolvedQuery, ParamFilterExp
 from anyway.views.safety_data import sd_utils as sdu
+from anyway.views.safety_data.sd_cache import get_cache_key, get_cached_result, set_cached_result
 
 GB = "gb"
 GB2 = "gb2"
@@ -37,15 +40,27 @@ class InvolvedQuery_GB(InvolvedQuery):
     def __init__(self):
         super().__init__()
         self.gb_filt = GBFilt2Col(self.S1)
+        self.cube_gb_filt = CubeGBFilt2Col()
 
     def get_data(self) -> List[Dict[str, Optional[str]]]:
         vals = sdu.get_params()
+        key = get_cache_key(vals)
+        res = get_cached_result(key)
+        if res is None:
+            res = self.calc_data(vals)
+            set_cached_result(key, res)
+        return res
+
+    def calc_data(self, vals: Dict[str, List[str]]) -> List[Dict[str, Optional[str]]]:
         involved_vals, gb_vals = split_dict(vals, [GB, GB2, LIMIT, SORT])
-        query = self.get_base_query()
-        query, _, _, count = ParamFilterExp.add_params_filter(query, involved_vals)
-        if count:
-            raise ValueError("count is not supported in group by. params: %s" % vals)
-        query, gb, gb2 = self.add_gb_filter(query, gb_vals)
+        if self.is_covered_by_cube(involved_vals, gb_vals):
+            query, gb, gb2 = self.get_cube_query(involved_vals, gb_vals)
+        else:
+            query = self.get_base_query()
+            query, _, _, count = ParamFilterExp.add_params_filter(query, involved_vals)
+            if count:
+                raise ValueError("count is not supported in group by. params: %s" % vals)
+            query, gb, gb2 = self.add_gb_filter(query, gb_vals)
         # pylint: disable=no-member
         dat = query.all()
         data = self.add_gb_text(dat, gb, gb2)
@@ -55,30 +70,64 @@ class InvolvedQuery_GB(InvolvedQuery):
             res = self.dictify_double_group_by(data)
         return res
 
-    def add_gb_filter(self, query: Query, vals: dict) -> Query:
+    @staticmethod
+    def is_covered_by_cube(involved_vals: dict, gb_vals: dict) -> bool:
+        return (
+            config.SAFETY_DATA_CUBE_ENABLED
+            and all(k in CUBE_PARAMS for k in involved_vals)
+            and all(g in CubeGBFilt2Col.PFE_GB for k in [GB, GB2] for g in gb_vals.get(k, []))
+        )
+
+    def get_cube_query(
+        self, involved_vals: dict, gb_vals: dict
+    ) -> Tuple[Query, str, Optional[str]]:
+        """The group by query over the counts of the cube, see sd_utils.sd_build_cube"""
+        query = db.session.query(SDInvolvedCube)
+        joins = {}
+        for g in gb_vals.get(GB, []) + gb_vals.get(GB2, []):
+            if "join" in CubeGBFilt2Col.PFE_GB[g]:
+                joins[CubeGBFilt2Col.PFE_GB[g]["join"]] = CubeGBFilt2Col.PFE_GB[g]["col"][-1]
+        for table, col in joins.items():
+            query = query.outerjoin(
+                table,
+                and_(
+                    col == table.id,
+                    SDInvolvedCube.accident_year == table.year,
+                    SDInvolvedCube.provider_code == table.provider_code,
+                ),
+            )
+        query, _, _, _ = ParamFilterExp.add_params_filter(
+            query, involved_vals, pfe=CUBE_PFE, vehicles_col=SDInvolvedCube.vehicles
+        )
+        # pylint: disable=no-member
+        count = db.func.sum(SDInvolvedCube.count)
+        return self.add_gb_filter(query, gb_vals, self.cube_gb_filt, count)
+
+    def add_gb_filter(
+        self,
+        query: Query,
+        vals: dict,
+        gb_filt: Optional["GBFilt2Col"] = None,
+        count: Optional[Column] = None,
+    ) -> Query:
+        gb_filt = gb_filt or self.gb_filt
+        # pylint: disable=no-member
+        count = db.func.count(SDInvolved._id) if count is None else count
         gb, gb2, vals = self.get_gb_vals(vals)
-        c1 = self.gb_filt.get_col(gb)
-        c1_val = self.gb_filt.get_gb_filt_val(gb)
+        c1 = gb_filt.get_col(gb)
+        c1_val = gb_filt.get_gb_filt_val(gb)
         if c1_val is not None:
             query = query.filter(not_(c1[-1].in_(c1_val)))
         query = query.filter(c1[-1] != None)
         if gb2 is None:
-            query = (
-                query.group_by(c1[0])
-                # pylint: disable=no-member
-                .with_entities(c1[0].label(gb), db.func.count(SDInvolved._id).label("count"))
-            )
+            query = query.group_by(c1[0]).with_entities(c1[0].label(gb), count.label("count"))
         else:
-            c2 = self.gb_filt.get_col(gb2)
-            c2_val = self.gb_filt.get_gb_filt_val(gb2)
+            c2 = gb_filt.get_col(gb2)
+            c2_val = gb_filt.get_gb_filt_val(gb2)
             if c2_val is not None:
                 query = query.filter(not_(c2[-1].in_(c2_val)))
             query = query.filter(c2[-1] != None)
-            query = (
-                query.group_by(c1[0], c2[0])
-                # pylint: disable=no-member
-                .with_entities(c1[0], c2[0], db.func.count(SDInvolved._id).label("count"))
-            )
+            query = query.group_by(c1[0], c2[0]).with_entities(c1[0], c2[0], count.label("count"))
         query, vals = self.add_gb_sort_limit(query, vals)
         return query, gb, gb2
 
@@ -285,3 +334,63 @@ class GBFilt2Col:
 
     def get_gb_filt_val(self, filt: str) -> Any:
         return self.FILT_TO_EMPTY.get(filt, None)
+
+
+class CubeGBFilt2Col(GBFilt2Col):
+    """The group by columns of the cube, a "join" table holds the hebrew text of the column"""
+
+    def __init__(self):
+        super().__init__(None)
+
+    PFE_GB: Dict[str, Dict[str, Any]] = {
+        "year": {
+            "col": (SDInvolvedCube.accident_year,),
+        },
+        "mn": {
+            "col": (SDInvolvedCube.accident_month,),
+        },
+        "sex": {
+            "col": (Sex.sex_hebrew, SDInvolvedCube.sex),
+            "join": Sex,
+        },
+        "age": {
+            "col": (AgeGroup.age_group_hebrew, SDInvolvedCube.age_group),
+            "join": AgeGroup,
+        },
+        "pt": {
+            "col": (PopulationType.population_type_hebrew, SDInvolvedCube.population_type),
+            "join": PopulationType,
+        },
+        "dn": {
+            "col": (DayNight.day_night_hebrew, SDInvolvedCube.day_night),
+            "join": DayNight,
+        },
+        "rt": {
+            "col": (RoadType.road_type_hebrew, SDInvolvedCube.road_type),
+            "join": RoadType,
+        },
+        "sev": {
+            "col": (InjurySeverity.injury_severity_hebrew, SDInvolvedCube.injury_severity),
+            "join": InjurySeverity,
+        },
+        "injt": {
+            "col": (InjuredType.injured_type_hebrew, SDInvolvedCube.injured_type),
+            "join": InjuredType,
+        },
+        "vcli": {
+            "col": (SDInvolvedCube.vehicles,),
+        },
+    }
+
+    def get_col(self, filt: str) -> Tuple[Column, ...]:
+        return self.PFE_GB[filt]["col"]
+
+
+# the params of ParamFilterExp.PFE the cube can filter by, with its columns
+CUBE_PFE = {
+    k: dict(
+        ParamFilterExp.PFE[k], col=[getattr(SDInvolvedCube, ParamFilterExp.PFE[k]["col"][0].key)]
+    )
+    for k in ["sy", "ey", "sev", "injt", "sex", "age", "pt", "dn", "mn", "rt"]
+}
+CUBE_PARAMS = [*CUBE_PFE, "vcli", "page_number", "page_size"]
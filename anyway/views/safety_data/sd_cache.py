@@ -0,0 +1,79 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from anyway.infographics_response_cache import get_shared_store
+
+RESULTS_CACHE_MAX_SIZE = 2048
+# without a shared store, a load_data of another process is noticed only when the results expire
+RESULTS_CACHE_TTL_SECONDS = 30 * 60
+GENERATION_KEY = "safety-data:generation"
+# params whose values are a single value, or whose order of values matters
+ORDERED_PARAMS = ("gb", "gb2", "lim", "sort")
+
+# cache key -> (creation time, generation, result)
+results_cache = OrderedDict()
+results_cache_lock = threading.Lock()
+local_generation = 0
+
+
+def get_cache_key(params: Dict[str, List[str]]) -> str:
+    """The filter values of a param are or-ed, so their order doesn't change the result"""
+    values = {
+        name: value if name in ORDERED_PARAMS else sorted(value) for name, value in params.items()
+    }
+    return json.dumps(values, sort_keys=True)
+
+
+def get_generation() -> int:
+    """
+    :returns: the generation of the safety data tables, results of older generations are stale
+    """
+    store = get_shared_store()
+    if store is None:
+        return local_generation
+    try:
+        return int(store.get(GENERATION_KEY) or 0)
+    except Exception as e:
+        logging.warning(f"failed reading the safety data generation: {e}")
+        return local_generation
+
+
+def get_cached_result(key: str) -> Optional[Any]:
+    generation = get_generation()
+    with results_cache_lock:
+        cached = results_cache.get(key)
+        if cached is None:
+            return None
+        created, cached_generation, result = cached
+        if cached_generation == generation and time.time() - created <= RESULTS_CACHE_TTL_SECONDS:
+            results_cache.move_to_end(key)
+            return result
+        del results_cache[key]
+    return None
+
+
+def set_cached_result(key: str, result: Any) -> None:
+    generation = get_generation()
+    with results_cache_lock:
+        results_cache[key] = (time.time(), generation, result)
+        results_cache.move_to_end(key)
+        while len(results_cache) > RESULTS_CACHE_MAX_SIZE:
+            results_cache.popitem(last=False)
+
+
+def invalidate_results_cache() -> None:
+    """Makes all the cached results stale, should be called whenever the safety data is loaded"""
+    global local_generation
+    with results_cache_lock:
+        local_generation += 1
+        results_cache.clear()
+    store = get_shared_store()
+    if store is not None:
+        try:
+            store.incr(GENERATION_KEY)
+        except Exception as e:
+            logging.warning(f"failed bumping the safety data generation: {e}")
@@ -2,17 +2,36 @@ import json
 import logging
 from typing import Iterable, Dict, Any, List
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from flask import request, Response
 from anyway.models import (
     Involved,
     SDAccident,
     SDInvolved,
+    SDInvolvedCube,
     AccidentMarkerView,
     Involved,
 )
 from anyway.app_and_db import db
 from anyway.utilities import chunked_generator
+from anyway.views.safety_data.sd_cache import invalidate_results_cache
+
+# the low cardinality columns the involved are counted by in the cube
+CUBE_ACCIDENT_DIMENSIONS = [
+    "provider_code",
+    "accident_year",
+    "accident_month",
+    "day_night",
+    "road_type",
+    "vehicles",
+]
+CUBE_INVOLVED_DIMENSIONS = [
+    "injury_severity",
+    "injured_type",
+    "sex",
+    "age_group",
+    "population_type",
+]
 
 
 def load_data():
@@ -20,11 +39,14 @@ def load_data():
     trans = conn.begin()
     sess = sessionmaker()(bind=conn)
     try:
+        sess.query(SDInvolvedCube).delete()
         sess.query(SDInvolved).delete()
         sess.query(SDAccident).delete()
         sd_load_accident(sess)
         sd_load_involved(sess)
+        sd_build_cube(sess)
         trans.commit()
+        invalidate_results_cache()
         return Response(json.dumps("Tables loaded", default=str), mimetype="application/json")
     except Exception as e:
         trans.rollback()
@@ -39,6 +61,27 @@ def sd_load_involved(sess: Session):
         sess.execute(SDInvolved.__table__.insert(), chunk)
 
 
+def sd_build_cube(sess: Session):
+    """Materializes the counts of the involved by the cube dimensions, within the db"""
+    dimensions = [getattr(SDAccident, name) for name in CUBE_ACCIDENT_DIMENSIONS] + [
+        getattr(SDInvolved, name) for name in CUBE_INVOLVED_DIMENSIONS
+    ]
+    query = (
+        sess.query(*dimensions, func.count(SDInvolved._id))
+        .join(
+            SDAccident,
+            and_(
+                SDInvolved.provider_code == SDAccident.provider_code,
+                SDInvolved.accident_id == SDAccident.accident_id,
+                SDInvolved.accident_year == SDAccident.accident_year,
+            ),
+        )
+        .group_by(*dimensions)
+    )
+    columns = CUBE_ACCIDENT_DIMENSIONS + CUBE_INVOLVED_DIMENSIONS + ["count"]
+    sess.execute(SDInvolvedCube.__table__.insert().from_select(columns, query.statement))
+
+
 def get_involved_data(sess: Session):
     for d in (
         sess.query(Involved, SDAccident)
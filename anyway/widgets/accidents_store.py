@@ -0,0 +1,219 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from anyway import config
+from anyway.app_and_db import db
+from anyway.infographics_response_cache import get_shared_store
+from anyway.models import AccidentMarkerView, InvolvedMarkerView
+
+# without a shared store, a markers import of another process is noticed only when the store expires
+ACCIDENTS_STORE_TTL_SECONDS = 6 * 60 * 60
+GENERATION_KEY = "accidents-store:generation"
+
+# the columns the widgets filter and group by, loaded into the store of each view
+STORE_COLUMNS = {
+    AccidentMarkerView: [
+        "provider_code",
+        "accident_timestamp",
+        "location_accuracy",
+        "road_segment_id",
+        "road1",
+        "yishuv_symbol",
+        "street1",
+        "street2",
+        "non_urban_intersection",
+        "accident_severity",
+        "accident_year",
+        "accident_type",
+        "day_night",
+        "accident_hour",
+        "road_light_hebrew",
+        "road_type",
+    ],
+    InvolvedMarkerView: [
+        "provider_code",
+        "accident_timestamp",
+        "location_accuracy",
+        "road_segment_id",
+        "road1",
+        "accident_yishuv_symbol",
+        "street1",
+        "street2",
+        "non_urban_intersection",
+        "accident_severity",
+        "injury_severity",
+        "injured_type",
+        "accident_year",
+        "involve_vehicle_type",
+        "age_group",
+    ],
+}
+# the location columns that have an index of the rows of each value
+INDEX_COLUMNS = [
+    "road_segment_id",
+    "road1",
+    "yishuv_symbol",
+    "accident_yishuv_symbol",
+    "street1",
+    "street2",
+    "non_urban_intersection",
+]
+
+
+def to_python_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class AccidentsStore:
+    """
+    In memory columnar copy of some columns of a markers view. Rows are selected by their
+    positions, with the index arrays of the location columns, and counted with np.bincount.
+    """
+
+    def __init__(self, df: pd.DataFrame, index_columns: Sequence[str]):
+        self.size = len(df)
+        self.columns: Dict[str, np.ndarray] = {name: df[name].to_numpy() for name in df.columns}
+        # column -> value -> sorted positions of the rows of the value
+        self.indexes: Dict[str, Dict[Any, np.ndarray]] = {
+            name: df.groupby(name, sort=False).indices for name in index_columns
+        }
+        # column -> (code of each row, -1 for null, the values of the codes)
+        self.codes: Dict[str, Tuple[np.ndarray, List[Any]]] = {}
+
+    def has_columns(self, names) -> bool:
+        return all(name in self.columns for name in names)
+
+    def all_rows(self) -> np.ndarray:
+        return np.arange(self.size)
+
+    def get_matches(self, name: str, values: np.ndarray, value) -> np.ndarray:
+        if value is None:
+            return pd.isnull(values)
+        if isinstance(value, list):
+            value = [self.get_column_value(name, v) for v in value if v is not None]
+            return np.isin(values, value)
+        return values == self.get_column_value(name, value)
+
+    def get_column_value(self, name: str, value):
+        if isinstance(value, str) and self.columns[name].dtype.kind in "iuf":
+            return float(value)
+        return value
+
+    def get_rows(self, name: str, value) -> np.ndarray:
+        """
+        :returns: the sorted positions of the rows where the column equals value, or is in it
+        when value is a list
+        """
+        index = self.indexes.get(name)
+        if index is None or value is None:
+            return np.flatnonzero(self.get_matches(name, self.columns[name], value))
+        values = value if isinstance(value, list) else [value]
+        rows = [index.get(self.get_column_value(name, v)) for v in values if v is not None]
+        rows = [r for r in rows if r is not None]
+        if not rows:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(rows)) if len(rows) > 1 else rows[0]
+
+    def filter_rows(self, rows: np.ndarray, name: str, value) -> np.ndarray:
+        return rows[self.get_matches(name, self.columns[name][rows], value)]
+
+    def filter_time(self, rows: np.ndarray, start_time, end_time) -> np.ndarray:
+        timestamps = self.columns["accident_timestamp"]
+        if start_time:
+            rows = rows[timestamps[rows] >= np.datetime64(start_time)]
+        if end_time:
+            rows = rows[timestamps[rows] <= np.datetime64(end_time)]
+        return rows
+
+    def get_codes(self, name: str) -> Tuple[np.ndarray, List[Any]]:
+        if name not in self.codes:
+            codes, uniques = pd.factorize(self.columns[name])
+            self.codes[name] = (codes, [to_python_value(v) for v in uniques.tolist()])
+        return self.codes[name]
+
+    def count_by(self, rows: np.ndarray, names: Sequence[str]) -> List[tuple]:
+        """
+        :returns: (value of each of names..., count) of the groups of rows, null values are None.
+        As the count("<name>") of get_accidents_stats, every row of a group is counted.
+        """
+        codes = [self.get_codes(name) for name in names]
+        group_codes = np.zeros(len(rows), dtype=np.int64)
+        for column_codes, uniques in codes:
+            group_codes = group_codes * (len(uniques) + 1) + column_codes[rows] + 1
+        counts = np.bincount(group_codes)
+        res = []
+        for group_code in np.flatnonzero(counts):
+            values, code = [], group_code
+            for _, uniques in reversed(codes):
+                code, value_code = divmod(code, len(uniques) + 1)
+                values.append(uniques[value_code - 1] if value_code else None)
+            res.append((*reversed(values), int(counts[group_code])))
+        return res
+
+
+# view -> (load time, generation, store), loaded on first use
+stores: Dict[Any, Tuple[float, int, AccidentsStore]] = {}
+local_generation = 0
+
+
+def load_accidents_store(table_obj) -> AccidentsStore:
+    start = time.time()
+    query = db.session.query(*[getattr(table_obj, name) for name in STORE_COLUMNS[table_obj]])
+    df = pd.read_sql_query(query.statement, query.session.bind)
+    store = AccidentsStore(df, [name for name in INDEX_COLUMNS if name in df.columns])
+    logging.info(
+        f"loaded {store.size} rows of {table_obj.__tablename__} into the accidents store "
+        f"in {time.time() - start:.2f} seconds"
+    )
+    return store
+
+
+def get_generation() -> int:
+    """
+    :returns: the generation of the markers views, stores of older generations are stale
+    """
+    store = get_shared_store()
+    if store is None:
+        return local_generation
+    try:
+        return int(store.get(GENERATION_KEY) or 0)
+    except Exception as e:
+        logging.warning(f"failed reading the accidents store generation: {e}")
+        return local_generation
+
+
+def get_accidents_store(table_obj) -> Optional[AccidentsStore]:
+    if not config.ACCIDENTS_STORE_ENABLED or table_obj not in STORE_COLUMNS:
+        return None
+    generation = get_generation()
+    cached = stores.get(table_obj)
+    if (
+        cached is None
+        or cached[1] != generation
+        or time.time() - cached[0] > ACCIDENTS_STORE_TTL_SECONDS
+    ):
+        cached = (time.time(), generation, load_accidents_store(table_obj))
+        stores[table_obj] = cached
+    return cached[2]
+
+
+def invalidate_accidents_stores():
+    """
+    Makes the stores of all the processes stale, they are loaded again on their next use. Should
+    be called whenever the markers are reloaded.
+    """
+    global local_generation
+    local_generation += 1
+    stores.clear()
+    store = get_shared_store()
+    if store is not None:
+        try:
+            store.incr(GENERATION_KEY)
+        except Exception as e:
+            logging.warning(f"failed bumping the accidents store generation: {e}")
@@ -1,9 +1,9 @@
 from anyway.request_params import RequestParams
-from anyway.widgets.widget_utils import get_accidents_stats, get_location_text
+from anyway.widgets.widget_utils import AccidentsStatsRequest, get_location_text
 from anyway.models import AccidentMarkerView
 from anyway.widgets.widget import register
 from anyway.widgets.all_locations_widgets.all_locations_widget import AllLocationsWidget
-from typing import Dict
+from typing import Dict, List
 
 # noinspection PyProtectedMember
 from flask_babel import _
@@ -23,6 +23,20 @@ class AccidentCountByAccidentTypeWidget(AllLocationsWidget):
             "Three most common accident types are displayed"
         )
 
+    @staticmethod
+    def get_stats_requests(request_params: RequestParams) -> List[AccidentsStatsRequest]:
+        return [
+            AccidentsStatsRequest(
+                table_obj=AccidentMarkerView,
+                filters=request_params.location_info,
+                group_by="accident_type",
+                count="accident_type",
+                start_time=request_params.start_time,
+                end_time=request_params.end_time,
+                resolution=request_params.resolution,
+            )
+        ]
+
     def generate_items(self) -> None:
         # noinspection PyUnresolvedReferences
         self.items = self.get_accident_count_by_accident_type(
@@ -38,15 +52,15 @@ class AccidentCountByAccidentTypeWidget(AllLocationsWidget):
 
     @staticmethod
     def get_accident_count_by_accident_type(location_info, start_time, end_time, resolution):
-        all_accident_type_count = get_accidents_stats(
+        all_accident_type_count = AccidentsStatsRequest(
             table_obj=AccidentMarkerView,
             filters=location_info,
             group_by="accident_type",
             count="accident_type",
             start_time=start_time,
             end_time=end_time,
-            resolution=resolution
-        )
+            resolution=resolution,
+        ).get_stats()
         merged_accident_type_count = [{"accident_type": "Collision", "count": 0}]
         for item in all_accident_type_count:
             at: AccidentType = AccidentType(item["accident_type"])
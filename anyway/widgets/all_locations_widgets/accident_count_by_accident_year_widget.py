@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, List
 
 from flask_babel import _
 
@@ -8,7 +8,7 @@ from anyway.request_params import RequestParams
 from anyway.widgets.all_locations_widgets.all_locations_widget import AllLocationsWidget
 from anyway.widgets.widget import register
 from anyway.widgets.widget_utils import (
-    get_accidents_stats,
+    AccidentsStatsRequest,
     gen_entity_labels,
     format_2_level_items,
     sort_and_fill_gaps_for_stacked_bar,
@@ -29,16 +29,22 @@ class AccidentCountByAccidentYearWidget(AllLocationsWidget):
         }
         self.information = "Fatal, severe and light accidents count in the specified years, split by accident severity"
 
+    @staticmethod
+    def get_stats_requests(request_params: RequestParams) -> List[AccidentsStatsRequest]:
+        return [
+            AccidentsStatsRequest(
+                table_obj=AccidentMarkerView,
+                filters=request_params.location_info,
+                group_by=("accident_year", "accident_severity"),
+                count="accident_severity",
+                start_time=request_params.start_time,
+                end_time=request_params.end_time,
+                resolution=request_params.resolution,
+            )
+        ]
+
     def generate_items(self) -> None:
-        res1 = get_accidents_stats(
-            table_obj=AccidentMarkerView,
-            filters=self.request_params.location_info,
-            group_by=("accident_year", "accident_severity"),
-            count="accident_severity",
-            start_time=self.request_params.start_time,
-            end_time=self.request_params.end_time,
-            resolution=self.request_params.resolution,
-        )
+        res1 = self.get_stats_requests(self.request_params)[0].get_stats()
         res2 = sort_and_fill_gaps_for_stacked_bar(
             res1,
             range(self.request_params.start_time.year, self.request_params.end_time.year + 1),
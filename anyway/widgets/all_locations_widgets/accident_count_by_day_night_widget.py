@@ -1,9 +1,9 @@
 from anyway.request_params import RequestParams
-from anyway.widgets.widget_utils import get_accidents_stats, get_location_text
+from anyway.widgets.widget_utils import AccidentsStatsRequest, get_location_text
 from anyway.models import AccidentMarkerView
 from anyway.widgets.widget import register
 from anyway.widgets.all_locations_widgets.all_locations_widget import AllLocationsWidget
-from typing import Dict
+from typing import Dict, List
 from flask_babel import _
 
 from anyway.backend_constants import DayNight
@@ -20,16 +20,22 @@ class AccidentCountByDayNightWidget(AllLocationsWidget):
             "Day/night are determined by sunrise and sunset at each day of the year."
         )
 
+    @staticmethod
+    def get_stats_requests(request_params: RequestParams) -> List[AccidentsStatsRequest]:
+        return [
+            AccidentsStatsRequest(
+                table_obj=AccidentMarkerView,
+                filters=request_params.location_info,
+                group_by="day_night",
+                count="day_night",
+                start_time=request_params.start_time,
+                end_time=request_params.end_time,
+                resolution=request_params.resolution,
+            )
+        ]
+
     def generate_items(self) -> None:
-        all_accident_day_night_count = get_accidents_stats(
-            table_obj=AccidentMarkerView,
-            filters=self.request_params.location_info,
-            group_by="day_night",
-            count="day_night",
-            start_time=self.request_params.start_time,
-            end_time=self.request_params.end_time,
-            resolution=self.request_params.resolution,
-        )
+        all_accident_day_night_count = self.get_stats_requests(self.request_params)[0].get_stats()
         all_items = []
         for item in all_accident_day_night_count:
             at: DayNight = DayNight(item["day_night"])
@@ -1,5 +1,5 @@
 from anyway.backend_constants import AccidentSeverity
-from anyway.widgets.widget_utils import get_accidents_stats, join_strings
+from anyway.widgets.widget_utils import AccidentsStatsRequest, join_strings
 from anyway.request_params import RequestParams
 from anyway.models import AccidentMarkerView
 from anyway.widgets.widget import register
@@ -18,6 +18,20 @@ class AccidentCountBySeverityWidget(AllLocationsWidget):
         super().__init__(request_params)
         self.rank = 1
 
+    @staticmethod
+    def get_stats_requests(request_params: RequestParams) -> List[AccidentsStatsRequest]:
+        return [
+            AccidentsStatsRequest(
+                table_obj=AccidentMarkerView,
+                filters=request_params.location_info,
+                group_by="accident_severity",
+                count="accident_severity",
+                start_time=request_params.start_time,
+                end_time=request_params.end_time,
+                resolution=request_params.resolution,
+            )
+        ]
+
     def generate_items(self) -> None:
         self.items = self.get_accident_count_by_severity(
             location_info=self.request_params.location_info,
@@ -31,15 +45,15 @@ class AccidentCountBySeverityWidget(AllLocationsWidget):
 
     @staticmethod
     def get_accident_count_by_severity(location_info, start_time, end_time, resolution):
-        count_by_severity = get_accidents_stats(
+        count_by_severity = AccidentsStatsRequest(
             table_obj=AccidentMarkerView,
             filters=location_info,
             group_by="accident_severity",
             count="accident_severity",
             start_time=start_time,
             end_time=end_time,
-            resolution=resolution
-        )
+            resolution=resolution,
+        ).get_stats()
         found_severities = [d["accident_severity"] for d in count_by_severity]
         items = {}
         total_accidents_count = 0
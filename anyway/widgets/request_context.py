@@ -0,0 +1,57 @@
+import copy
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from anyway.request_params import RequestParams
+
+
+class RequestContext:
+    """
+    State shared by the widgets of one infographics request, so it is computed once per request
+    instead of once per widget
+    """
+
+    def __init__(self, request_params: RequestParams):
+        self.request_params = request_params
+        # copied once per request, the widgets get their own copies of its dicts only
+        self.widgets_request_params = copy.deepcopy(request_params)
+        # (table, filters, start time, end time) -> the criteria of widget_utils.get_query
+        self.query_criteria: Dict[tuple, List[Any]] = {}
+        # road segment id -> its non urban junctions
+        self.segment_junctions: Dict[int, List[int]] = {}
+        # stats key of widget_utils.get_accidents_stats -> its result, set by plan_accidents_stats
+        self.accidents_stats: Dict[tuple, Any] = {}
+
+
+current_request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "current_request_context", default=None
+)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return current_request_context.get()
+
+
+@contextmanager
+def request_context(request_params: RequestParams):
+    token = current_request_context.set(RequestContext(request_params))
+    try:
+        yield current_request_context.get()
+    finally:
+        current_request_context.reset(token)
+
+
+def get_widget_request_params(request_params: RequestParams) -> RequestParams:
+    """
+    :returns: a copy of the request params for a widget. Widgets may change the dicts of their
+    params, e.g. adding filters to location_info, so these are not shared between widgets.
+    """
+    context = get_request_context()
+    if context is None or context.request_params is not request_params:
+        return copy.deepcopy(request_params)
+    widget_params = copy.copy(context.widgets_request_params)
+    widget_params.location_info = copy.deepcopy(widget_params.location_info)
+    widget_params.gps = copy.deepcopy(widget_params.gps)
+    widget_params.widget_specific = copy.deepcopy(widget_params.widget_specific)
+    return widget_params
@@ -1,8 +1,8 @@
 from anyway.request_params import RequestParams
-from anyway.widgets.widget_utils import get_accidents_stats
+from anyway.widgets.widget_utils import AccidentsStatsRequest
 from anyway.models import AccidentMarkerView
 from anyway.widgets.road_segment_widgets.road_segment_widget import RoadSegmentWidget
-from typing import Dict
+from typing import Dict, List
 from flask_babel import _
 
 
@@ -14,16 +14,22 @@ class AccidentCountByHourWidget(RoadSegmentWidget):
         super().__init__(request_params)
         self.rank = 11
 
+    @staticmethod
+    def get_stats_requests(request_params: RequestParams) -> List[AccidentsStatsRequest]:
+        return [
+            AccidentsStatsRequest(
+                table_obj=AccidentMarkerView,
+                filters=request_params.location_info,
+                group_by="accident_hour",
+                count="accident_hour",
+                start_time=request_params.start_time,
+                end_time=request_params.end_time,
+                resolution=request_params.resolution,
+            )
+        ]
+
     def generate_items(self) -> None:
-        self.items = get_accidents_stats(
-            table_obj=AccidentMarkerView,
-            filters=self.request_params.location_info,
-            group_by="accident_hour",
-            count="accident_hour",
-            start_time=self.request_params.start_time,
-            end_time=self.request_params.end_time,
-            resolution=self.request_params.resolution,
-        )
+        self.items = self.get_stats_requests(self.request_params)[0].get_stats()
 
     @staticmethod
     def localize_items(request_params: RequestParams, items: Dict) -> Dict:
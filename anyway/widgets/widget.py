@@ -1,8 +1,8 @@
-import copy
 import logging
 from typing import Union, Dict, List, Optional, Type
 import hashlib
 from anyway.request_params import RequestParams
+from anyway.widgets.request_context import get_widget_request_params
 
 
 class Widget:
@@ -16,6 +16,8 @@ class Widget:
     - Implement method generate_items()
     - Optionally set additional attributes if needed, and alter the returned values of
       `is_in_cache()` and `is_included()` when needed.
+    - Optionally declare the get_accidents_stats() calls of generate_items() in
+      `get_stats_requests()`, so they are computed together with those of other widgets.
     """
 
     request_params: RequestParams
@@ -28,7 +30,7 @@ class Widget:
     meta: Optional[Dict]
 
     def __init__(self, request_params: RequestParams):
-        self.request_params = copy.deepcopy(request_params)
+        self.request_params = get_widget_request_params(request_params)
         self.rank = -1
         self.items = None
         self.text = {}
@@ -58,6 +60,14 @@ class Widget:
     def is_relevant(request_params: RequestParams) -> bool:
         return True
 
+    @staticmethod
+    def get_stats_requests(request_params: RequestParams) -> List:
+        """
+        The widget_utils.AccidentsStatsRequest-s of the widget, that are computed with those of
+        the other widgets before the items are generated
+        """
+        return []
+
     @staticmethod
     def localize_items(request_params: RequestParams, items: Dict) -> Dict:
         if "name" in items:
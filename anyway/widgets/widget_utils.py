@@ -1,14 +1,17 @@
 import copy
+import json
 import logging
 import typing
 from collections import defaultdict
-from typing import Dict, Any, List, Type, Optional, Sequence, Tuple
+from dataclasses import dataclass
+from typing import Dict, Any, Iterable, List, Type, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
 # noinspection PyProtectedMember
 from flask_babel import _
-from sqlalchemy import func, distinct, between, or_, and_
+from sqlalchemy import func, distinct, between, or_, and_, tuple_
 
 from anyway.app_and_db import db
 from anyway.backend_constants import BE_CONST, LabeledCode, InjurySeverity
@@ -18,32 +21,50 @@ from anyway.vehicle_type import VehicleType
 from anyway.parsers.resolution_fields import ResolutionFields as RF
 from anyway.models import NewsFlash
 from anyway.request_params import RequestParams
+from anyway.widgets.accidents_store import AccidentsStore, get_accidents_store
+from anyway.widgets.request_context import get_request_context
 from anyway.widgets.segment_junctions import SegmentJunctions
 
 RC = BE_CONST.ResolutionCategories
 
 
 def get_query(table_obj, filters, start_time, end_time):
-    filters = remove_loc_text_fields_from_filter(filters)
     query = db.session.query(table_obj)
+    for criterion in get_query_criteria(table_obj, filters, start_time, end_time):
+        query = query.filter(criterion)
+    return query
+
+
+def get_query_criteria(table_obj, filters, start_time, end_time) -> list:
+    """
+    The criteria of get_query, computed once per request context
+    """
+    context = get_request_context()
+    if context is None:
+        return calc_query_criteria(table_obj, filters, start_time, end_time)
+    key = get_stats_key(table_obj, filters or {}, start_time, end_time)
+    if key not in context.query_criteria:
+        context.query_criteria[key] = calc_query_criteria(table_obj, filters, start_time, end_time)
+    return context.query_criteria[key]
+
+
+def calc_query_criteria(table_obj, filters, start_time, end_time) -> list:
+    filters = remove_loc_text_fields_from_filter(filters)
+    criteria = []
     if start_time:
-        query = query.filter(getattr(table_obj, "accident_timestamp") >= start_time)
+        criteria.append(getattr(table_obj, "accident_timestamp") >= start_time)
     if end_time:
-        query = query.filter(getattr(table_obj, "accident_timestamp") <= end_time)
+        criteria.append(getattr(table_obj, "accident_timestamp") <= end_time)
     if not filters:
-        return query
+        return criteria
     if "road_segment_id" not in filters.keys():
-        query = query.filter(get_expression_for_non_road_segment_fields(filters, table_obj, and_))
-        return query
+        criteria.append(get_expression_for_non_road_segment_fields(filters, table_obj, and_))
+        return criteria
     location_fields, other_fields = split_location_fields_and_others(filters)
     if other_fields:
-        query = query.filter(
-            get_expression_for_non_road_segment_fields(other_fields, table_obj, and_)
-        )
-    query = query.filter(
-        get_expression_for_road_segment_location_fields(location_fields, table_obj)
-    )
-    return query
+        criteria.append(get_expression_for_non_road_segment_fields(other_fields, table_obj, and_))
+    criteria.append(get_expression_for_road_segment_location_fields(location_fields, table_obj))
+    return criteria
 
 
 def remove_loc_text_fields_from_filter(filters: dict) -> dict:
@@ -93,11 +114,20 @@ def get_expression_for_road_segment_location_fields(filters, table_obj):
 
 
 def get_expression_for_segment_junctions(segment_id: int, table_obj):
-    sg = SegmentJunctions.get_instance()
-    junctions = sg.get_segment_junctions(segment_id)
+    junctions = get_segment_junctions(segment_id)
     return getattr(table_obj, "non_urban_intersection").in_(junctions)
 
 
+def get_segment_junctions(segment_id: int) -> List[int]:
+    context = get_request_context()
+    if context is not None and segment_id in context.segment_junctions:
+        return context.segment_junctions[segment_id]
+    junctions = SegmentJunctions.get_instance().get_segment_junctions(segment_id)
+    if context is not None:
+        context.segment_junctions[segment_id] = junctions
+    return junctions
+
+
 def get_filter_expression(table_obj, field_name, value):
     if field_name == "street1_hebrew" or field_name == "street1":
         return or_(
@@ -123,6 +153,26 @@ def split_location_fields_and_others(filters: dict) -> Tuple[dict, dict]:
     return location_fields, other_fields
 
 
+def get_stats_filters(filters: Optional[dict], resolution: Optional[RC]) -> dict:
+    filters = copy.copy(filters) if filters else {}
+    filters = add_resolution_location_accuracy_filter(filters, resolution)
+    provider_code_filters = [
+        BE_CONST.CBS_ACCIDENT_TYPE_1_CODE,
+        BE_CONST.CBS_ACCIDENT_TYPE_3_CODE,
+    ]
+    filters["provider_code"] = filters.get("provider_code", provider_code_filters)
+    return filters
+
+
+def get_count_expression(count, cnt_distinct: bool):
+    return func.count(count) if not cnt_distinct else func.count(distinct(count))
+
+
+def get_stats_key(table_obj, filters: dict, start_time, end_time, *stats) -> tuple:
+    filters_str = json.dumps(filters, sort_keys=True, default=str)
+    return (table_obj, filters_str, start_time, end_time, *stats)
+
+
 def get_accidents_stats(
     table_obj,
     columns=None,
@@ -134,13 +184,17 @@ def get_accidents_stats(
     end_time=None,
     resolution: Optional[RC] = None,
 ):
-    filters = filters or {}
-    filters = add_resolution_location_accuracy_filter(filters, resolution)
-    provider_code_filters = [
-        BE_CONST.CBS_ACCIDENT_TYPE_1_CODE,
-        BE_CONST.CBS_ACCIDENT_TYPE_3_CODE,
-    ]
-    filters["provider_code"] = filters.get("provider_code", provider_code_filters)
+    filters = get_stats_filters(filters, resolution)
+    if columns is None and group_by and isinstance(count, str):
+        key = get_stats_key(table_obj, filters, start_time, end_time, group_by, count, cnt_distinct)
+        context = get_request_context()
+        if context is not None and key in context.accidents_stats:
+            return copy.deepcopy(context.accidents_stats[key])
+        store = get_accidents_store(table_obj)
+        if store is not None and not cnt_distinct:
+            res = get_accidents_stats_from_store(store, filters, group_by, start_time, end_time)
+            if res is not None:
+                return res
 
     # get stats
     query = get_query(table_obj, filters, start_time, end_time)
@@ -160,10 +214,7 @@ def get_accidents_stats(
                 raise Exception(err_msg)
         else:
             query = query.group_by(group_by)
-            query = query.with_entities(
-                group_by,
-                func.count(count) if not cnt_distinct else func.count(distinct(count)),
-            )
+            query = query.with_entities(group_by, get_count_expression(count, cnt_distinct))
     df = pd.read_sql_query(query.statement, query.session.bind)
     df.rename(columns={"count_1": "count"}, inplace=True)  # pylint: disable=no-member
     df.columns = [c.replace("_hebrew", "") for c in df.columns]
@@ -172,6 +223,186 @@ def get_accidents_stats(
     )
 
 
+def get_accidents_stats_from_store(
+    store: AccidentsStore, filters: dict, group_by, start_time, end_time
+):
+    """
+    get_accidents_stats of a group by count, computed from the columnar store with the filters
+    of get_query
+    :returns: None when the store doesn't have a column of the filters or group_by
+    """
+    filters = remove_loc_text_fields_from_filter(filters)
+    group_by_columns = group_by if isinstance(group_by, tuple) else (group_by,)
+    needed_columns = {"accident_timestamp", *group_by_columns, *filters.keys()}
+    if "road_segment_id" in filters:
+        needed_columns.add("non_urban_intersection")
+    if "street1" in filters:
+        needed_columns.add("street2")
+    if not store.has_columns(needed_columns):
+        return None
+    if "road_segment_id" not in filters:
+        rows = get_store_rows(store, filters)
+    else:
+        location_fields, other_fields = split_location_fields_and_others(filters)
+        junctions = get_segment_junctions(filters["road_segment_id"])
+        rows = np.union1d(
+            get_store_rows(store, location_fields),
+            store.get_rows("non_urban_intersection", junctions),
+        )
+        rows = get_store_rows(store, other_fields, rows)
+    rows = store.filter_time(rows, start_time, end_time)
+    counts = store.count_by(rows, group_by_columns)
+    if isinstance(group_by, tuple):
+        return retro_dictify(counts)
+    return [{group_by.replace("_hebrew", ""): value, "count": count} for value, count in counts]
+
+
+def get_store_rows(store: AccidentsStore, filters: dict, rows: Optional[np.ndarray] = None):
+    """
+    :returns: the positions of the rows, out of rows or all the store, that match all the filters
+    """
+    filters = dict(filters)
+    if rows is None:
+        for field_name in [name for name in filters if name in store.indexes]:
+            value = filters.pop(field_name)
+            field_rows = store.get_rows(field_name, value)
+            if field_name == "street1":
+                field_rows = np.union1d(field_rows, store.get_rows("street2", value))
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows)
+        if rows is None:
+            rows = store.all_rows()
+    for field_name, value in filters.items():
+        if field_name == "street1":
+            rows = np.union1d(
+                store.filter_rows(rows, "street1", value), store.filter_rows(rows, "street2", value)
+            )
+        else:
+            rows = store.filter_rows(rows, field_name, value)
+    return rows
+
+
+@dataclass
+class AccidentsStatsRequest:
+    """
+    A group by count of get_accidents_stats, declared by a widget before its items are generated.
+    group_by is a column name, or a tuple of two column names.
+    """
+
+    table_obj: Any
+    filters: Optional[dict]
+    group_by: Union[str, Tuple[str, str]]
+    count: str
+    start_time: Any = None
+    end_time: Any = None
+    resolution: Optional[RC] = None
+    cnt_distinct: bool = False
+
+    def get_stats(self):
+        return get_accidents_stats(
+            table_obj=self.table_obj,
+            filters=self.filters,
+            group_by=self.group_by,
+            count=self.count,
+            cnt_distinct=self.cnt_distinct,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            resolution=self.resolution,
+        )
+
+
+def get_grouping_id(names: List[str], grouping_set: Tuple[str, ...]) -> int:
+    """
+    :returns: the value of grouping(*names) in the rows of grouping_set - the bits of the columns
+    that are not grouped by are set, and the first column is the most significant bit
+    """
+    return sum(
+        1 << (len(names) - 1 - i) for i, name in enumerate(names) if name not in grouping_set
+    )
+
+
+def get_grouping_sets_stats(
+    table_obj, filters: dict, start_time, end_time, requests: List[AccidentsStatsRequest]
+) -> Dict[tuple, Any]:
+    """
+    Computes the requests, that share table_obj, filters and times, in a single scan with a
+    GROUPING SETS query
+    :returns: stats key -> the result get_accidents_stats returns for the request
+    """
+    grouping_sets = list(
+        dict.fromkeys(
+            r.group_by if isinstance(r.group_by, tuple) else (r.group_by,) for r in requests
+        )
+    )
+    names = list(dict.fromkeys(name for grouping_set in grouping_sets for name in grouping_set))
+    counts = list(dict.fromkeys((r.count, r.cnt_distinct) for r in requests))
+    columns = {name: getattr(table_obj, name) for name in names}
+    query = get_query(table_obj, filters, start_time, end_time).with_entities(
+        *[columns[name].label(name) for name in names],
+        func.grouping(*columns.values()).label("grouping_id"),
+        *[
+            get_count_expression(count, cnt_distinct).label(f"count_{i}")
+            for i, (count, cnt_distinct) in enumerate(counts)
+        ],
+    )
+    query = query.group_by(
+        func.grouping_sets(
+            *[tuple_(*[columns[name] for name in grouping_set]) for grouping_set in grouping_sets]
+        )
+    )
+    grouping_ids = {
+        get_grouping_id(names, grouping_set): grouping_set for grouping_set in grouping_sets
+    }
+    rows_by_set = defaultdict(list)
+    for row in query.all():
+        rows_by_set[grouping_ids[row.grouping_id]].append(row)
+
+    res = {}
+    for r in requests:
+        grouping_set = r.group_by if isinstance(r.group_by, tuple) else (r.group_by,)
+        count_label = f"count_{counts.index((r.count, r.cnt_distinct))}"
+        rows = [
+            (*[getattr(row, name) for name in grouping_set], getattr(row, count_label))
+            for row in rows_by_set[grouping_set]
+        ]
+        if isinstance(r.group_by, tuple):
+            stats = retro_dictify(rows)
+        else:
+            df = pd.DataFrame(rows, columns=[r.group_by, "count"])
+            df.columns = [c.replace("_hebrew", "") for c in df.columns]
+            stats = df.to_dict(orient="records")  # pylint: disable=no-member
+        key = get_stats_key(
+            table_obj, filters, start_time, end_time, r.group_by, r.count, r.cnt_distinct
+        )
+        res[key] = stats
+    return res
+
+
+def plan_accidents_stats(requests: Iterable[AccidentsStatsRequest]) -> None:
+    """
+    Computes the requests that share their table, filters and times together, so
+    get_accidents_stats calls of these requests in the request context are not queried again.
+    Nothing is planned outside a request context.
+    """
+    context = get_request_context()
+    if context is None:
+        return
+    groups = defaultdict(list)
+    for r in requests:
+        if get_accidents_store(r.table_obj) is not None:
+            continue
+        filters = get_stats_filters(r.filters, r.resolution)
+        groups[get_stats_key(r.table_obj, filters, r.start_time, r.end_time)].append((filters, r))
+    for group in groups.values():
+        # a single request is computed as is by get_accidents_stats
+        if len(group) > 1:
+            (filters, r), requests_in_group = group[0], [r for _, r in group]
+            context.accidents_stats.update(
+                get_grouping_sets_stats(
+                    r.table_obj, filters, r.start_time, r.end_time, requests_in_group
+                )
+            )
+
+
 # noinspection Mypy
 def retro_dictify(iterable) -> Dict[Any, Dict[Any, Any]]:
     d = defaultdict(dict)
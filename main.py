@@ -94,10 +94,23 @@ def process():
 @click.option("--batch_size", type=int, default=5000)
 @click.option("--load_start_year", type=str, default=None)
 @click.option("--source", type=str, default="s3")
-def cbs(batch_size, load_start_year, source):
+@click.option(
+    "--workers", type=int, default=1, help="number of processes parsing the cbs directories"
+)
+def cbs(batch_size, load_start_year, source, workers):
     from anyway.parsers.cbs.executor import main
 
-    return main(batch_size=batch_size, load_start_year=load_start_year, source=source)
+    return main(
+        batch_size=batch_size, load_start_year=load_start_year, source=source, workers=workers
+    )
+
+
+@process.command()
+@click.option("--batch_size", type=int, default=5000)
+def cluster_pyramid(batch_size):
+    from anyway.clusters_calculator import build_cluster_pyramid
+
+    return build_cluster_pyramid(batch_size)
 
 
 @process.command()
@@ -347,19 +360,31 @@ def cache():
 
 
 @cache.command()
-def update_street():
+@click.option("--workers", type=int, default=1, help="number of processes building the cache")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="only regenerate widgets whose digest changed or whose location had new accidents",
+)
+def update_street(workers, incremental):
     """Update street cache"""
     from anyway.parsers.infographics_data_cache_updater import main_for_street
 
-    main_for_street()
+    main_for_street(workers, incremental)
 
 
 @cache.command()
-def update_road_segments():
+@click.option("--workers", type=int, default=1, help="number of processes building the cache")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="only regenerate widgets whose digest changed or whose location had new accidents",
+)
+def update_road_segments(workers, incremental):
     """Update road segments cache"""
     from anyway.parsers.infographics_data_cache_updater import main_for_road_segments
 
-    return main_for_road_segments()
+    return main_for_road_segments(workers, incremental)
 
 
 @process.command()
@@ -396,10 +421,16 @@ def create_tables():
 
 
 @create_tables.command()
-def create_cbs_tables():
+@click.option(
+    "--load_start_year",
+    type=int,
+    default=None,
+    help="only rebuild the rows of cbs accidents from this year on",
+)
+def create_cbs_tables(load_start_year):
     from anyway.parsers.cbs.executor import create_tables
 
-    return create_tables()
+    return create_tables(load_start_year)
 
 
 @cli.group()
@@ -484,6 +515,21 @@ def accidents_around_schools(start_date, end_date, distance, output_path):
     )
 
 
+@scripts.command()
+@click.option("--sizes", type=int, multiple=True, default=[100000, 500000, 1000000])
+@click.option("--zooms", type=int, multiple=True, default=[8, 9, 10, 11])
+@click.option(
+    "--greedy_max_size",
+    type=int,
+    default=100000,
+    help="skip the greedy clustering implementation above this number of markers",
+)
+def benchmark_clusters(sizes, zooms, greedy_max_size):
+    from anyway.scripts.benchmark_clusters import main
+
+    return main(sizes=sizes, zooms=zooms, greedy_max_size=greedy_max_size)
+
+
 @scripts.command()
 def test_airflow():
     print("my print")
@@ -1,10 +1,14 @@
+from pathlib import Path
 from unittest.mock import MagicMock
 
+import pandas as pd
 import pytest
 
 from anyway.parsers.cbs.exceptions import CBSParsingFailed
 from anyway.parsers.cbs.executor import main
 
+CBS_SAMPLE_DIRECTORY = "static/data/cbs/accidents_type_1/H20141041"
+
 @pytest.fixture
 def mock_s3_data_retriever(monkeypatch):
     monkeypatch.setattr('anyway.parsers.cbs.executor.S3DataRetriever', MagicMock())
@@ -34,3 +38,136 @@ def test_cbs_parsing_failed_is_raised_when_something_bad_happens(monkeypatch):
     with pytest.raises(CBSParsingFailed, match='Exception occurred while loading the cbs data: something bad'):
         main(batch_size=MagicMock(), source=MagicMock())
 
+
+
+def test_create_markers_is_identical_to_create_marker(monkeypatch):
+    from anyway.parsers.cbs import executor
+    from anyway import field_names
+
+    files = executor.get_files(CBS_SAMPLE_DIRECTORY)
+    accidents = files[executor.ACCIDENTS].head(1000)
+    cities = {
+        int(symbol): f"city {int(symbol)}"
+        for symbol in accidents[field_names.yishuv_symbol].dropna().unique()[::2]
+    }
+    monkeypatch.setattr(
+        executor.City,
+        "get_name_from_symbol_or_none",
+        staticmethod(lambda symbol: None if pd.isnull(symbol) else cities.get(int(symbol))),
+    )
+    monkeypatch.setattr(executor, "get_cities_names", lambda: cities)
+    lookups = {
+        key: files[key]
+        for key in (
+            executor.STREETS,
+            executor.ROADS,
+            executor.NON_URBAN_INTERSECTION,
+            executor.ROADS_KM_INDEX,
+        )
+    }
+
+    expected = [executor.create_marker(1, accident, **lookups) for _, accident in accidents.iterrows()]
+    markers = executor.create_markers(1, accidents, **lookups)
+
+    assert len(markers) == len(expected)
+    for marker, expected_marker in zip(markers, expected):
+        assert marker.keys() == expected_marker.keys()
+        for field, value in expected_marker.items():
+            if field in ("latitude", "longitude") and value is not None:
+                assert marker[field] == pytest.approx(value)
+            elif not (pd.isnull(value) and pd.isnull(marker[field])):
+                assert marker[field] == value, field
+
+
+def test_get_nearest_junction_key():
+    from anyway.parsers.cbs import executor
+
+    roads = {
+        (1, 2, 10.0): "a",
+        (1, 3, 30.0): "b",
+        (1, 4, 20.0): "c",
+        (1, 5, 10.0): "d",
+        (6, 7, 15.0): "e",
+    }
+    roads_km_index = executor.get_roads_km_index(roads)
+
+    assert executor.get_nearest_junction_key(1, 12.0, roads_km_index) == (1, 2, 10.0)
+    assert executor.get_nearest_junction_key(1, 26.0, roads_km_index) == (1, 3, 30.0)
+    # as near to both, the first junction in roads wins
+    assert executor.get_nearest_junction_key(1, 25.0, roads_km_index) == (1, 3, 30.0)
+    assert executor.get_nearest_junction_key(1, 15.0, roads_km_index) == (1, 2, 10.0)
+    assert executor.get_nearest_junction_key(6, 100.0, roads_km_index) == (6, 7, 15.0)
+    assert executor.get_nearest_junction_key(8, 10.0, roads_km_index) is None
+    assert executor.get_nearest_junction_key(1, float("nan"), roads_km_index) is None
+
+
+def test_transform_directory_in_worker_is_identical(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+    from anyway.parsers.cbs import executor
+
+    # the first lines of the big files are enough
+    for path in Path(CBS_SAMPLE_DIRECTORY).iterdir():
+        with open(path, "rb") as source, open(tmp_path / path.name, "wb") as target:
+            lines = source.readlines()
+            target.writelines(lines[:5001] if path.stat().st_size > 10**6 else lines)
+    args = (str(tmp_path), 1, 2000, {5000: "city"})
+
+    cbs_dictionary, batches = executor.transform_directory(*args)
+    batches = {name: list(file_batches) for name, file_batches in batches.items()}
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        worker_dictionary, worker_batches = pool.submit(
+            executor.transform_directory_in_worker, *args
+        ).result()
+
+    assert worker_dictionary == cbs_dictionary
+    assert worker_batches == batches
+    assert [rows_count for _, rows_count, _ in batches[executor.ACCIDENTS]][:2] == [2000, 2000]
+
+
+def test_sequential_import_creates_one_batch_at_a_time(tmp_path, monkeypatch):
+    from anyway.parsers.cbs import executor
+
+    for path in Path(CBS_SAMPLE_DIRECTORY).iterdir():
+        with open(path, "rb") as source, open(tmp_path / path.name, "wb") as target:
+            lines = source.readlines()
+            target.writelines(lines[:5001] if path.stat().st_size > 10**6 else lines)
+    created = []
+    create_vehicles = executor.create_vehicles
+
+    def count_vehicles(provider_code, frame_batch):
+        created.append(len(frame_batch))
+        return create_vehicles(provider_code, frame_batch)
+
+    monkeypatch.setattr(executor, "create_vehicles", count_vehicles)
+    _, batches = executor.transform_directory(str(tmp_path), 1, 1000, {5000: "city"})
+
+    assert created == []
+    next(batches[executor.VEHICLES])
+    assert created == [1000]
+
+
+def test_copy_data_of_integer_columns_is_integers():
+    import csv
+    from io import StringIO
+
+    from sqlalchemy import Integer
+
+    from anyway.models import Involved, Vehicle
+    from anyway.parsers.cbs import executor
+    from anyway.utilities import COPY_NULL, get_copy_data
+
+    files = executor.get_files(CBS_SAMPLE_DIRECTORY)
+    for table, rows in (
+        (Vehicle, executor.create_vehicles(1, files[executor.VEHICLES])),
+        (Involved, executor.create_involved(1, files[executor.INVOLVED], {})),
+    ):
+        columns = list(rows[0].keys())
+        integer_columns = [
+            i
+            for i, column in enumerate(columns)
+            if isinstance(table.__table__.columns[column].type, Integer)
+        ]
+        for values in csv.reader(StringIO(get_copy_data(rows, columns))):
+            for i in integer_columns:
+                # as COPY parses an integer column
+                assert values[i] == COPY_NULL or str(int(values[i])) == values[i], columns[i]
@@ -0,0 +1,150 @@
+import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anyway import config
+from anyway.infographics_response_cache import InMemoryKeyValueStore, set_shared_store
+from anyway.models import AccidentMarkerView
+from anyway.widgets import accidents_store
+from anyway.widgets.accidents_store import AccidentsStore, INDEX_COLUMNS, get_accidents_store
+from anyway.widgets.widget_utils import get_accidents_stats, get_accidents_stats_from_store
+
+
+@pytest.fixture
+def markers():
+    rng = np.random.default_rng(7)
+    size = 2000
+    street1 = rng.integers(1, 20, size).astype(float)
+    street1[::17] = np.nan
+    return pd.DataFrame(
+        {
+            "provider_code": rng.choice([1, 2, 3], size),
+            "accident_timestamp": pd.Timestamp("2018-01-01")
+            + pd.to_timedelta(rng.integers(0, 5 * 365 * 24, size), unit="h"),
+            "location_accuracy": rng.choice([1, 2, 3, 9], size),
+            "road_segment_id": rng.choice([np.nan, 10.0, 20.0], size),
+            "road1": rng.choice([1, 2, 90], size),
+            "yishuv_symbol": rng.choice([np.nan, 5000.0, 3000.0], size),
+            "street1": street1,
+            "street2": rng.integers(1, 20, size).astype(float),
+            "non_urban_intersection": rng.choice([np.nan, 100.0, 101.0, 102.0], size),
+            "accident_severity": rng.choice([1, 2, 3], size),
+            "accident_year": rng.choice([2018, 2019, 2020], size),
+            "day_night": rng.choice(["day", "night", None], size),
+        }
+    )
+
+
+@pytest.fixture
+def store(markers):
+    return AccidentsStore(markers, [c for c in INDEX_COLUMNS if c in markers.columns])
+
+
+def get_expected(df, mask, group_by):
+    counts = df[mask].groupby(list(group_by), dropna=False).size()
+    return {
+        tuple(None if pd.isnull(v) else v for v in (key if isinstance(key, tuple) else (key,))): n
+        for key, n in counts.items()
+    }
+
+
+def test_street_counts(markers, store):
+    filters = {"yishuv_symbol": 5000, "street1": 3, "provider_code": [1, 3]}
+    start, end = datetime.date(2019, 1, 1), datetime.date(2021, 6, 30)
+
+    res = get_accidents_stats_from_store(store, filters, "accident_severity", start, end)
+
+    mask = (
+        (markers.yishuv_symbol == 5000)
+        & ((markers.street1 == 3) | (markers.street2 == 3))
+        & markers.provider_code.isin([1, 3])
+        & (markers.accident_timestamp >= pd.Timestamp(start))
+        & (markers.accident_timestamp <= pd.Timestamp(end))
+    )
+    assert {(r["accident_severity"],): r["count"] for r in res} == get_expected(
+        markers, mask, ["accident_severity"]
+    )
+
+
+def test_road_segment_counts_include_junctions(markers, store):
+    filters = {"road1": 90, "road_segment_id": 10, "location_accuracy": [1, 3]}
+
+    with patch("anyway.widgets.widget_utils.get_segment_junctions", return_value=[100, 102]):
+        res = get_accidents_stats_from_store(
+            store, filters, ("accident_year", "accident_severity"), None, None
+        )
+
+    mask = (
+        ((markers.road1 == 90) & (markers.road_segment_id == 10))
+        | markers.non_urban_intersection.isin([100, 102])
+    ) & markers.location_accuracy.isin([1, 3])
+    expected = get_expected(markers, mask, ["accident_year", "accident_severity"])
+    assert {(y, s): n for y, counts in res.items() for s, n in counts.items()} == expected
+
+
+def test_null_groups_and_values(markers, store):
+    res = get_accidents_stats_from_store(store, {"yishuv_symbol": None}, "day_night", None, None)
+
+    mask = markers.yishuv_symbol.isnull()
+    assert {(r["day_night"],): r["count"] for r in res} == get_expected(
+        markers, mask, ["day_night"]
+    )
+
+
+def test_missing_column(store):
+    assert get_accidents_stats_from_store(store, {"road_type": 1}, "day_night", None, None) is None
+
+
+def test_get_accidents_stats_uses_store(store):
+    with patch("anyway.widgets.widget_utils.get_accidents_store", return_value=store), patch(
+        "anyway.widgets.widget_utils.get_query"
+    ) as get_query:
+        res = get_accidents_stats(
+            AccidentMarkerView,
+            filters={"yishuv_symbol": 3000},
+            group_by="accident_year",
+            count="accident_year",
+        )
+    get_query.assert_not_called()
+    assert sorted(r["accident_year"] for r in res) == [2018, 2019, 2020]
+
+
+def test_store_is_disabled():
+    assert get_accidents_store(AccidentMarkerView) is None
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    loads = []
+    monkeypatch.setattr(config, "ACCIDENTS_STORE_ENABLED", True)
+    monkeypatch.setattr(accidents_store, "stores", {})
+    monkeypatch.setattr(
+        accidents_store,
+        "load_accidents_store",
+        lambda table_obj: loads.append(table_obj) or object(),
+    )
+    return loads
+
+
+def test_store_is_reloaded_after_an_import_of_another_process(loads):
+    shared_store = InMemoryKeyValueStore()
+    set_shared_store(shared_store)
+    try:
+        first = get_accidents_store(AccidentMarkerView)
+        assert get_accidents_store(AccidentMarkerView) is first
+        # the import process bumps the generation of the shared store
+        shared_store.incr(accidents_store.GENERATION_KEY)
+        assert get_accidents_store(AccidentMarkerView) is not first
+        assert len(loads) == 2
+    finally:
+        set_shared_store(None)
+
+
+def test_store_expires_without_a_shared_store(loads, monkeypatch):
+    first = get_accidents_store(AccidentMarkerView)
+    monkeypatch.setattr(accidents_store, "ACCIDENTS_STORE_TTL_SECONDS", -1)
+    assert get_accidents_store(AccidentMarkerView) is not first
+    assert len(loads) == 2
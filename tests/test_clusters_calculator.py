@@ -0,0 +1,234 @@
+import datetime
+import itertools
+from collections import namedtuple
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, select
+
+from anyway import clusters_calculator
+from anyway import globalmaptiles as globaltiles
+from anyway.backend_constants import BE_CONST
+from anyway.clusters_calculator import (
+    aggregate_cluster_pyramid_cells,
+    get_cluster_pyramid_filter,
+    get_edge_markers,
+    get_inner_cells,
+    is_covered_by_cluster_pyramid,
+    retrieve_clusters_from_pyramid,
+)
+from anyway.models import ClusterPyramidCell, MarkerResult
+from anyway.pymapcluster import (
+    calculate_clusters,
+    cartesian_to_latlngs,
+    grid_cell_latlng_bounds,
+    latlngs_to_cartesian,
+)
+
+Marker = namedtuple("Marker", ["latitude", "longitude"])
+
+ALL_AGE_GROUPS = ",".join(str(age_group) for age_group in BE_CONST.ALL_AGE_GROUPS_LIST)
+
+
+def covered_kwargs(**overrides):
+    kwargs = {
+        "zoom": 10,
+        "show_day": 7,
+        "age_groups": ALL_AGE_GROUPS,
+        "start_date": datetime.date(2019, 1, 1),
+        "end_date": datetime.date(2021, 12, 31),
+    }
+    kwargs.update(overrides)
+    return kwargs
+
+
+def test_is_covered_by_cluster_pyramid():
+    assert is_covered_by_cluster_pyramid(**covered_kwargs())
+    assert is_covered_by_cluster_pyramid(**covered_kwargs(show_fatal=False, approx=False))
+    assert is_covered_by_cluster_pyramid(**covered_kwargs(end_date=datetime.date.today()))
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"zoom": 16},
+        {"show_day": 0},
+        {"weather": 2},
+        {"show_urban": 1},
+        {"age_groups": "1,2,3"},
+        {"start_time": 6, "end_time": 12},
+        {"start_date": datetime.date(2019, 3, 1)},
+        {"end_date": datetime.date(2020, 6, 30)},
+    ],
+)
+def test_is_not_covered_by_cluster_pyramid(overrides):
+    assert not is_covered_by_cluster_pyramid(**covered_kwargs(**overrides))
+
+
+def test_aggregate_cluster_pyramid_cells_matches_calculate_clusters():
+    markers = [Marker(32.0 + i * 0.013, 34.8 + i * 0.007) for i in range(100)]
+    frame = pd.DataFrame(
+        {
+            "latitude": [marker.latitude for marker in markers],
+            "longitude": [marker.longitude for marker in markers],
+            "accident_year": [2019 + i % 3 for i in range(100)],
+            "accident_severity": [1 + i % 3 for i in range(100)],
+            "location_accuracy": [None] * 50 + [1] * 50,
+            "provider_code": [1] * 100,
+        }
+    )
+    x, y, z = latlngs_to_cartesian(frame["latitude"].values, frame["longitude"].values)
+    frame = frame.assign(x=x, y=y, z=z)
+
+    cells = aggregate_cluster_pyramid_cells(frame, 11, globaltiles.GlobalMercator())
+    assert cells["size"].sum() == len(markers)
+    assert cells["location_accuracy"].isnull().sum() > 0
+
+    merged = cells.groupby(["cell_x", "cell_y"])[["size", "sum_x", "sum_y", "sum_z"]].sum()
+    lats, lngs = cartesian_to_latlngs(
+        merged["sum_x"].values.astype(float),
+        merged["sum_y"].values.astype(float),
+        merged["sum_z"].values.astype(float),
+    )
+    from_pyramid = sorted(zip(lats, lngs, merged["size"]))
+    from_markers = sorted(
+        (cluster["latitude"], cluster["longitude"], cluster["size"])
+        for cluster in calculate_clusters(markers, 11)
+    )
+    assert len(from_pyramid) == len(from_markers)
+    for (lat, lng, size), (expected_lat, expected_lng, expected_size) in zip(
+        from_pyramid, from_markers
+    ):
+        assert size == expected_size
+        assert lat == pytest.approx(expected_lat)
+        assert lng == pytest.approx(expected_lng)
+
+
+def test_get_inner_cells():
+    assert get_inner_cells(10, 20, 14, 23) == (11, 21, 13, 22)
+    assert get_inner_cells(10, 20, 11, 23) is None
+    assert get_inner_cells(10, 20, 14, 20) is None
+
+
+class FakeQuery:
+    def __init__(self, markers):
+        self.markers = markers
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        return self.markers
+
+
+def cell_center(mercator, cell_x, cell_y, zoom):
+    sw_lat, sw_lng, ne_lat, ne_lng = grid_cell_latlng_bounds(mercator, cell_x, cell_y, zoom)
+    return Marker((sw_lat + ne_lat) / 2, (sw_lng + ne_lng) / 2)
+
+
+def test_retrieve_clusters_from_pyramid_edges(monkeypatch):
+    mercator = globaltiles.GlobalMercator()
+    sw_lat, sw_lng, _, _ = grid_cell_latlng_bounds(mercator, 3125, 3113, 10)
+    _, _, ne_lat, ne_lng = grid_cell_latlng_bounds(mercator, 3129, 3117, 10)
+    inner = cell_center(mercator, 3127, 3115, 10)
+    edges = [cell_center(mercator, 3125, 3115, 10), cell_center(mercator, 3127, 3117, 10)]
+    monkeypatch.setattr(
+        clusters_calculator.AccidentMarker,
+        "bounding_box_query",
+        lambda **kwargs: MarkerResult(FakeQuery([inner, edges[0]]), FakeQuery([edges[1]]), None),
+    )
+    kwargs = covered_kwargs(
+        sw_lat=sw_lat + 1e-6, sw_lng=sw_lng + 1e-6, ne_lat=ne_lat - 1e-6, ne_lng=ne_lng - 1e-6
+    )
+    assert get_edge_markers(mercator, (3126, 3114, 3128, 3116), **kwargs) == edges
+    assert get_edge_markers(mercator, None, **kwargs) == [inner, edges[0], edges[1]]
+
+    pyramid_cells = []
+
+    def retrieve_pyramid_cells_clusters(cells_range, **kwargs):
+        pyramid_cells.append(cells_range)
+        return [{"longitude": inner.longitude, "latitude": inner.latitude, "size": 1}]
+
+    monkeypatch.setattr(
+        clusters_calculator, "retrieve_pyramid_cells_clusters", retrieve_pyramid_cells_clusters
+    )
+    clusters = retrieve_clusters_from_pyramid(**kwargs)
+    assert pyramid_cells == [(3126, 3114, 3128, 3116)]
+    assert sorted(cluster["size"] for cluster in clusters) == [1, 1, 1]
+    assert clusters[1:] == calculate_clusters(edges, 10)
+
+
+def bounding_box_query_matches(cell, **kwargs):
+    """Whether AccidentMarker.bounding_box_query returns the markers of the cell"""
+    approx, accurate = kwargs.get("approx", True), kwargs.get("accurate", True)
+    if not approx and not accurate:
+        return False
+    if cell["provider_code"] == BE_CONST.RSA_PROVIDER_CODE:
+        return kwargs["show_rsa"]
+    if not kwargs["show_accidents"] and cell["provider_code"] in (
+        BE_CONST.CBS_ACCIDENT_TYPE_1_CODE,
+        BE_CONST.CBS_ACCIDENT_TYPE_3_CODE,
+        BE_CONST.UNITED_HATZALA_CODE,
+    ):
+        return False
+    if accurate and not approx and cell["location_accuracy"] != 1:
+        return False
+    if approx and not accurate and cell["location_accuracy"] == 1:
+        return False
+    for arg, severity in (("show_fatal", 1), ("show_severe", 2), ("show_light", 3)):
+        if not kwargs.get(arg, True) and cell["accident_severity"] == severity:
+            return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def pyramid_cells():
+    engine = create_engine("sqlite://")
+    ClusterPyramidCell.__table__.create(engine)
+    cells = [
+        dict(
+            id=i,
+            zoom=10,
+            cell_x=0,
+            cell_y=0,
+            accident_year=2020,
+            accident_severity=severity,
+            location_accuracy=accuracy,
+            provider_code=provider_code,
+            size=1,
+            sum_x=0,
+            sum_y=0,
+            sum_z=0,
+        )
+        for i, (provider_code, accuracy, severity) in enumerate(
+            itertools.product([1, 2, 3, 4, 5], [1, 2, 9], [1, 2, 3])
+        )
+    ]
+    with engine.begin() as conn:
+        conn.execute(ClusterPyramidCell.__table__.insert(), cells)
+    return engine, cells
+
+
+@pytest.mark.parametrize(
+    "show_rsa,show_accidents,accurate,approx,show_fatal",
+    list(itertools.product([True, False], repeat=5)),
+)
+def test_cluster_pyramid_filter_matches_bounding_box_query(
+    pyramid_cells, show_rsa, show_accidents, accurate, approx, show_fatal
+):
+    engine, cells = pyramid_cells
+    kwargs = dict(
+        show_rsa=show_rsa,
+        show_accidents=show_accidents,
+        accurate=accurate,
+        approx=approx,
+        show_fatal=show_fatal,
+    )
+    table = ClusterPyramidCell.__table__
+    with engine.connect() as conn:
+        ids = conn.execute(
+            select([table.c.id]).where(get_cluster_pyramid_filter(**kwargs))
+        ).fetchall()
+
+    expected = {cell["id"] for cell in cells if bounding_box_query_matches(cell, **kwargs)}
+    assert {i for (i,) in ids} == expected
@@ -0,0 +1,43 @@
+import csv
+import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from sqlalchemy.orm import Query
+
+from anyway.views.news_flash.api import generate_csv, get_download_data_query
+
+
+def test_generate_csv_in_chunks():
+    rows_chunks = [
+        [(1, "תיק", datetime.datetime(2020, 1, 2, 10, 30)), (2, None, None)],
+        [(3, 'שם, "עם" פסיק', 12.5)],
+    ]
+
+    chunks = list(generate_csv(["מס תאונה", "סוג תיק", "חתימת זמן"], iter(rows_chunks)))
+
+    assert len(chunks) == 3
+    assert list(csv.reader(StringIO("".join(chunks)))) == [
+        ["", "מס תאונה", "סוג תיק", "חתימת זמן"],
+        ["0", "1", "תיק", "2020-01-02 10:30:00"],
+        ["1", "2", "", ""],
+        ["2", "3", 'שם, "עם" פסיק', "12.5"],
+    ]
+
+
+def test_download_data_query_columns():
+    with patch.object(Query, "__iter__", lambda self: iter([("הרוג",), ("פצוע קל",)])):
+        query, column_names = get_download_data_query(
+            {"yishuv_symbol": 5000}, datetime.datetime(2020, 1, 1), datetime.datetime(2021, 1, 1)
+        )
+
+    assert column_names[:7] == [
+        "מס תאונה",
+        "סוג תיק",
+        "סוג תאונה",
+        "חומרת תאונה",
+        "הרוג/ה",
+        "פצוע/ה קל",
+        "מהירות מותרת",
+    ]
+    assert len(query.statement.columns) == len(column_names)
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from anyway import config
+from anyway.parsers import geocoding
+from anyway.parsers.geocoding import FixtureBackend, GeocodingBackend, set_backend
+from anyway.parsers.location_extraction import geocode_extract, reverse_geocode_extract
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "geocoding_fixture.json")
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(config, "GEOCODING_CACHE_TABLE_ENABLED", False)
+    fixture_backend = FixtureBackend(FIXTURE_PATH)
+    set_backend(fixture_backend)
+    yield fixture_backend
+    set_backend(None)
+
+
+def test_geocode_extract_from_fixture(backend):
+    location = geocode_extract("כביש 90 ליד צומת ערבה")
+    assert location == {
+        "street": None,
+        "road_no": 90,
+        "intersection": None,
+        "city": None,
+        "address": "Route 90, Israel",
+        "subdistrict": "Arava",
+        "district": "South District",
+        "geom": {"lat": 30.7516, "lng": 35.2886},
+    }
+
+
+def test_geocode_is_cached_by_normalized_address(backend):
+    first = geocode_extract("רחוב הרצל תל אביב")
+    assert geocode_extract("  רחוב הרצל   תל אביב ") == first
+    assert first["street"] == "Herzl St"
+    assert backend.calls == 1
+
+
+def test_reverse_geocode_extract_from_fixture(backend):
+    location = reverse_geocode_extract(32.0621, 34.7705)
+    assert location["city"] == "Tel Aviv-Yafo"
+    assert reverse_geocode_extract(32.0621000001, 34.7705) == location
+    assert backend.calls == 1
+    assert reverse_geocode_extract(31.0, 34.0) is None
+
+
+def test_cache_table_is_used_before_the_backend(backend, monkeypatch):
+    monkeypatch.setattr(config, "GEOCODING_CACHE_TABLE_ENABLED", True)
+    stored = {}
+    monkeypatch.setattr(geocoding, "get_stored_results", stored.get)
+    monkeypatch.setattr(geocoding, "store_results", stored.__setitem__)
+
+    results = geocoding.geocode("רחוב הרצל תל אביב")
+    assert list(stored.values()) == [results]
+    # another process, with an empty in-process cache
+    set_backend(backend)
+    assert geocoding.geocode("רחוב הרצל תל אביב") == results
+    assert backend.calls == 1
+
+
+def test_failures_are_not_cached(backend, monkeypatch):
+    def fail(address, region):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(backend, "geocode", fail)
+    with pytest.raises(RuntimeError):
+        geocoding.geocode("רחוב הרצל תל אביב")
+    assert not geocoding.results_cache
+
+
+def test_backend_must_implement_the_api():
+    class GeocodeOnlyBackend(GeocodingBackend):
+        def geocode(self, address, region):
+            return []
+
+    with pytest.raises(TypeError):
+        GeocodeOnlyBackend()
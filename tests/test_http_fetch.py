@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from anyway.parsers import http_fetch, rss_sites
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the walla feed and articles of the tests directory, and some failing paths"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            count = server.requests[self.path]
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if self.path == "/feed/22":
+                self.send_text(server.feed)
+            elif self.path.startswith("/break/"):
+                with open(f"tests/{self.path.split('/')[-1]}.html", encoding="utf-8") as f:
+                    self.send_text(f.read())
+            elif self.path.startswith("/down/"):
+                self.send_text("down", 503)
+            elif self.path == "/flaky":
+                self.send_text("ok", 503 if count < 3 else 200)
+            elif self.path.startswith("/slow"):
+                time.sleep(0.1)
+                self.send_text(self.path)
+            elif self.path == "/hang":
+                time.sleep(1)
+                self.send_text("late")
+            else:
+                self.send_text("not found", 404)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def send_text(self, text, status=200):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_fetch, "FETCH_BACKOFF", 0.01)
+    monkeypatch.setattr(http_fetch, "host_semaphores", {})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.requests = Counter()
+    server.active = server.max_active = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    with open("tests/walla.xml", encoding="utf-8") as f:
+        server.feed = f.read().replace("https://news.walla.co.il/break/", f"{server.url}/break/")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_scrape_from_stand_in(server):
+    items = list(rss_sites.scrape_raw("walla", rss_source=f"{server.url}/feed/22"))
+
+    assert [item["author"] for item in items] == ["אלי אשכנזי", "טל שלו"]
+    assert [item["link"] for item in items] == [
+        f"{server.url}/break/3648139",
+        f"{server.url}/break/3647947",
+    ]
+    assert server.requests["/break/3648139"] == 1
+
+
+def test_scrape_skips_items_before_latest_date(server):
+    first = next(rss_sites.scrape_raw("walla", rss_source=f"{server.url}/feed/22"))
+    server.requests.clear()
+
+    items = list(
+        rss_sites.scrape_raw("walla", rss_source=f"{server.url}/feed/22", latest_date=first["date"])
+    )
+    assert items == []
+    assert set(server.requests) == {"/feed/22"}
+
+
+def test_scrape_skips_items_that_fail(server):
+    server.feed = server.feed.replace("/break/3648139", "/gone/3648139")
+
+    items = list(rss_sites.scrape_raw("walla", rss_source=f"{server.url}/feed/22"))
+    assert [item["link"] for item in items] == [f"{server.url}/break/3647947"]
+    assert server.requests["/gone/3648139"] == 1
+
+
+def test_scrape_stops_at_items_that_fail(server):
+    feed = server.feed
+    server.feed = feed.replace("/break/3648139", "/down/3648139")
+
+    items = list(rss_sites.scrape_raw("walla", rss_source=f"{server.url}/feed/22"))
+    assert [item["link"] for item in items] == [f"{server.url}/break/3647947"]
+    assert server.requests["/down/3648139"] == http_fetch.FETCH_RETRIES + 1
+
+    # the newer items of a failed item are left for the next scrape
+    server.feed = feed.replace("/break/3647947", "/down/3647947")
+    assert list(rss_sites.scrape_raw("walla", rss_source=f"{server.url}/feed/22")) == []
+
+
+def test_fetch_retries(server):
+    assert http_fetch.fetch(f"{server.url}/flaky") == "ok"
+    assert server.requests["/flaky"] == 3
+
+    with pytest.raises(requests.HTTPError):
+        http_fetch.fetch(f"{server.url}/missing")
+    assert server.requests["/missing"] == 1
+
+
+def test_fetch_timeout(server, monkeypatch):
+    monkeypatch.setattr(http_fetch, "FETCH_TIMEOUT", (1, 0.2))
+    monkeypatch.setattr(http_fetch, "FETCH_RETRIES", 1)
+    with pytest.raises(requests.Timeout):
+        http_fetch.fetch(f"{server.url}/hang")
+    assert server.requests["/hang"] == 2
+
+
+def test_fetch_all_limits_requests_per_host(server, monkeypatch):
+    monkeypatch.setattr(http_fetch, "FETCH_PER_HOST", 2)
+    urls = [f"{server.url}/slow/{i}" for i in range(8)]
+
+    assert list(http_fetch.fetch_all(urls, workers=8)) == [f"/slow/{i}" for i in range(8)]
+    assert server.max_active == 2
@@ -1,3 +1,4 @@
+import json
 import os
 import unittest
 from unittest import TestCase
@@ -6,6 +7,13 @@ import datetime
 from anyway.infographics_utils import get_infographics_data_for_location
 from anyway.request_params import RequestParams
 from anyway.backend_constants import BE_CONST
+from anyway.models import InfographicsRoadSegmentsDataCacheTemp
+from anyway.parsers.infographics_data_cache_updater import (
+    STREET_CACHE_TABLES,
+    build_cache_into_temp,
+    refresh_cache_data,
+    swap_temp_and_cache,
+)
 
 
 class TestInfographicsDataFromCache(TestCase):
@@ -53,5 +61,129 @@ class TestInfographicsDataFromCache(TestCase):
         self.assertEqual(res, {}, f"returned value in case of exception should be None")
 
 
+class TestBuildCacheIntoTemp(TestCase):
+    @patch("anyway.parsers.infographics_data_cache_updater.db")
+    @patch("anyway.parsers.infographics_data_cache_updater.create_cache_data")
+    def test_inserts_in_batches(self, create_cache_data, db):
+        create_cache_data.side_effect = lambda key: f"data {key['road_segment_id']}"
+        keys = ({"road_segment_id": i, "years_ago": 1} for i in range(5))
+        build_cache_into_temp(
+            InfographicsRoadSegmentsDataCacheTemp,
+            keys,
+            lambda key, data: {"road_segment_id": key["road_segment_id"], "data": data},
+            batch_size=2,
+        )
+        inserted = [c.args[1] for c in db.get_engine.return_value.execute.call_args_list]
+        self.assertEqual([len(rows) for rows in inserted], [2, 2, 1])
+        self.assertEqual(
+            [row["data"] for rows in inserted for row in rows], [f"data {i}" for i in range(5)]
+        )
+
+
+class TestSwapTempAndCache(TestCase):
+    def test_swaps_tables_and_indexes(self):
+        conn = Mock()
+        swap_temp_and_cache(conn, STREET_CACHE_TABLES)
+        statements = [c.args[0] for c in conn.execute.call_args_list]
+        self.assertEqual(
+            statements[1],
+            "lock table infographics_street_data_cache, infographics_street_data_cache_temp "
+            "in access exclusive mode",
+        )
+        self.assertEqual(
+            statements[2:5],
+            [
+                "alter table infographics_street_data_cache rename to infographics_cache_swap",
+                "alter table infographics_street_data_cache_temp "
+                "rename to infographics_street_data_cache",
+                "alter table infographics_cache_swap rename to infographics_street_data_cache_temp",
+            ],
+        )
+        renamed_indexes = [s.split()[2] for s in statements[5:] if "cache_swap" not in s]
+        self.assertEqual(
+            renamed_indexes,
+            [
+                "infographics_street_data_cache_temp_pkey",
+                "infographics_street_data_cache_temp_id_years_idx",
+            ],
+        )
+
+
+@patch("anyway.parsers.infographics_data_cache_updater.create_cache_data")
+@patch("anyway.parsers.infographics_data_cache_updater.location_has_accidents")
+@patch("anyway.parsers.infographics_data_cache_updater.get_request_params_from_request_values")
+@patch("anyway.parsers.infographics_data_cache_updater.widgets_dict")
+class TestRefreshCacheData(TestCase):
+    key = {"road_segment_id": 17, "years_ago": 1, "lang": "en"}
+    request_params = RequestParams(
+        years_ago=1,
+        location_text="",
+        location_info={"road_segment_id": 17},
+        resolution=BE_CONST.ResolutionCategories.SUBURBAN_ROAD,
+        gps={},
+        start_time=datetime.date(2022, 1, 1),
+        end_time=datetime.date(2022, 6, 30),
+        lang="en",
+        news_flash_description=None,
+    )
+
+    @staticmethod
+    def get_widget(name, digest):
+        widget = Mock(widget_digest=digest)
+        widget.name = name
+        widget.is_relevant.return_value = True
+        widget.return_value.serialize.return_value = {
+            "name": name,
+            "data": {"items": "new"},
+            "meta": {"widget_digest": digest},
+        }
+        return widget
+
+    @staticmethod
+    def get_cache_data(last_update="2022-06-30T00:00:00"):
+        return json.dumps(
+            {
+                "meta": {"dates_comment": {"date_range": [2022, 2022], "last_update": last_update}},
+                "widgets": [
+                    {"name": name, "data": {"items": "old"}, "meta": {"widget_digest": "d1"}}
+                    for name in ("a", "b")
+                ],
+            }
+        )
+
+    def test_up_to_date(self, widgets_dict, get_params, has_accidents, create_cache_data):
+        widgets_dict.values.return_value = [self.get_widget("a", "d1"), self.get_widget("b", "d1")]
+        get_params.return_value = self.request_params
+        self.assertIsNone(refresh_cache_data(self.key, self.get_cache_data()))
+        create_cache_data.assert_not_called()
+
+    def test_digest_changed(self, widgets_dict, get_params, has_accidents, create_cache_data):
+        widgets_dict.values.return_value = [self.get_widget("a", "d1"), self.get_widget("b", "d2")]
+        get_params.return_value = self.request_params
+        data = json.loads(refresh_cache_data(self.key, self.get_cache_data()))
+        self.assertEqual([w["data"]["items"] for w in data["widgets"]], ["old", "new"])
+        create_cache_data.assert_not_called()
+
+    def test_new_accidents(self, widgets_dict, get_params, has_accidents, create_cache_data):
+        widgets_dict.values.return_value = [self.get_widget("a", "d1"), self.get_widget("b", "d1")]
+        get_params.return_value = self.request_params
+        has_accidents.return_value = True
+        create_cache_data.return_value = "new data"
+        data = self.get_cache_data(last_update="2022-05-31T00:00:00")
+        self.assertEqual(refresh_cache_data(self.key, data), "new data")
+        self.assertEqual(has_accidents.call_args.args[1], datetime.date(2022, 6, 1))
+
+    def test_no_new_accidents(self, widgets_dict, get_params, has_accidents, create_cache_data):
+        widgets_dict.values.return_value = [self.get_widget("a", "d1"), self.get_widget("b", "d1")]
+        get_params.return_value = self.request_params
+        has_accidents.return_value = False
+        data = json.loads(
+            refresh_cache_data(self.key, self.get_cache_data(last_update="2022-05-31T00:00:00"))
+        )
+        self.assertEqual(data["meta"]["dates_comment"]["last_update"], "2022-06-30T00:00:00")
+        self.assertEqual([w["data"]["items"] for w in data["widgets"]], ["old", "old"])
+        create_cache_data.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
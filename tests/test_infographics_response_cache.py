@@ -0,0 +1,70 @@
+import pytest
+
+from anyway import infographics_response_cache
+from anyway.infographics_response_cache import (
+    InMemoryKeyValueStore,
+    get_cache_key,
+    get_cached_response,
+    invalidate_responses_cache,
+    set_cached_response,
+    set_shared_store,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    infographics_response_cache.responses_cache.clear()
+    set_shared_store(None)
+    yield
+    infographics_response_cache.responses_cache.clear()
+    set_shared_store(None)
+
+
+def test_get_cache_key_normalizes_values():
+    values = {"road_segment_id": "17", "years_ago": "5"}
+    assert get_cache_key(values) == get_cache_key(dict(values, lang="he", personalized="true"))
+    assert get_cache_key(values) != get_cache_key(dict(values, lang="en"))
+    assert get_cache_key(values) != get_cache_key(dict(values, years_ago="3"))
+
+
+def test_local_cache_lru_and_ttl(monkeypatch):
+    monkeypatch.setattr(infographics_response_cache, "RESPONSE_CACHE_MAX_SIZE", 2)
+    set_cached_response("a", "1")
+    set_cached_response("b", "2")
+    assert get_cached_response("a") == "1"
+    set_cached_response("c", "3")
+    assert get_cached_response("b") is None
+    assert get_cached_response("a") == "1"
+
+    monkeypatch.setattr(infographics_response_cache, "RESPONSE_CACHE_TTL_SECONDS", -1)
+    assert get_cached_response("a") is None
+
+
+def test_invalidate_local_cache():
+    set_cached_response("a", "1")
+    invalidate_responses_cache()
+    assert get_cached_response("a") is None
+
+
+def test_shared_store():
+    store = InMemoryKeyValueStore()
+    set_shared_store(store)
+    set_cached_response("a", "תשובה")
+
+    # another process only has the shared store
+    infographics_response_cache.responses_cache.clear()
+    assert get_cached_response("a") == "תשובה"
+
+    # the other process invalidated the cache, this process' copy is stale too
+    store.incr(infographics_response_cache.GENERATION_KEY)
+    assert get_cached_response("a") is None
+
+
+def test_in_memory_store_expiry():
+    store = InMemoryKeyValueStore()
+    store.set("a", "1", ex=-1)
+    store.set("b", "2")
+    assert store.get("a") is None
+    assert store.get("b") == b"2"
+    assert store.incr("counter") == 1
+    assert store.incr("counter") == 2
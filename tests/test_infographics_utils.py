@@ -1,4 +1,5 @@
 import unittest
+from collections import namedtuple
 from unittest.mock import patch
 from sqlalchemy import and_
 from anyway.widgets.widget_utils import (format_2_level_items,
@@ -9,7 +10,20 @@ from anyway.widgets.widget_utils import (format_2_level_items,
                                          get_filter_expression,
                                          get_expression_for_non_road_segment_fields,
                                          remove_loc_text_fields_from_filter,
+                                         get_grouping_id,
+                                         get_accidents_stats,
+                                         plan_accidents_stats,
+                                         AccidentsStatsRequest,
+                                         get_query_criteria,
                                          )
+from anyway.widgets.request_context import request_context, get_widget_request_params
+from anyway.widgets.all_locations_widgets.most_severe_accidents_table_widget import (
+    MostSevereAccidentsTableWidget,
+)
+from anyway.widgets.all_locations_widgets.accident_count_by_day_night_widget import (
+    AccidentCountByDayNightWidget,
+)
+from anyway.request_params import RequestParams
 from anyway.backend_constants import AccidentSeverity
 from anyway.models import AccidentMarkerView, RoadJunctionKM, RoadSegments, InvolvedMarkerView
 from anyway.widgets.segment_junctions import SegmentJunctions
@@ -238,6 +252,90 @@ class TestInfographicsUtilsCase(unittest.TestCase):
         actual = remove_loc_text_fields_from_filter(test)
         self.assertEqual(expected, actual, "3")
 
+    def test_get_grouping_id(self):
+        names = ["day_night", "accident_year", "accident_severity"]
+        self.assertEqual(3, get_grouping_id(names, ("day_night",)), "1")
+        self.assertEqual(4, get_grouping_id(names, ("accident_year", "accident_severity")), "2")
+
+    @patch("anyway.widgets.widget_utils.get_query")
+    def test_plan_accidents_stats(self, get_query):
+        row = namedtuple("row", ["day_night", "accident_year", "accident_severity",
+                                 "grouping_id", "count_0", "count_1"])
+        query = get_query.return_value.with_entities.return_value.group_by.return_value
+        query.all.return_value = [
+            row(1, None, None, 3, 5, 5),
+            row(2, None, None, 3, 7, 7),
+            row(None, 2020, 1, 4, 2, 2),
+            row(None, 2021, 3, 4, 10, 10),
+        ]
+        filters = {"yishuv_symbol": 5000}
+        requests = [
+            AccidentsStatsRequest(AccidentMarkerView, filters, "day_night", "day_night"),
+            AccidentsStatsRequest(AccidentMarkerView, filters,
+                                  ("accident_year", "accident_severity"), "accident_severity"),
+            AccidentsStatsRequest(AccidentMarkerView, {"yishuv_symbol": 1}, "day_night",
+                                  "day_night"),
+        ]
+        plan_accidents_stats(requests)
+        get_query.assert_not_called()
+        request_params = RequestParams(years_ago=1, location_text="", location_info={},
+                                       resolution=RC.CITY, gps={}, start_time=None,
+                                       end_time=None, lang="he")
+        with request_context(request_params):
+            plan_accidents_stats(requests)
+            get_query.assert_called_once()
+            day_night = requests[0].get_stats()
+            self.assertEqual([{"day_night": 1, "count": 5}, {"day_night": 2, "count": 7}],
+                             day_night, "1")
+            self.assertEqual({2020: {1: 2}, 2021: {3: 10}}, requests[1].get_stats(), "2")
+            day_night[0]["day_night"] = "day"
+            self.assertEqual(1, requests[0].get_stats()[0]["day_night"], "3")
+        self.assertEqual({"yishuv_symbol": 5000}, filters, "4")
+        with patch("anyway.widgets.widget_utils.pd") as pd:
+            get_accidents_stats(AccidentMarkerView, filters=filters, group_by="day_night",
+                                count="day_night")
+            pd.read_sql_query.assert_called_once()
+
+    @patch("anyway.widgets.widget_utils.SegmentJunctions")
+    @patch("anyway.widgets.widget_utils.calc_query_criteria")
+    def test_request_context(self, calc_query_criteria, sg):
+        sg.get_instance.return_value = sg
+        sg.get_segment_junctions.return_value = [1, 2]
+        request_params = RequestParams(years_ago=1, location_text="", location_info={"road1": 1},
+                                       resolution=RC.SUBURBAN_ROAD, gps={}, start_time=None,
+                                       end_time=None, lang="he")
+        with request_context(request_params):
+            widget_params = get_widget_request_params(request_params)
+            self.assertIsNot(request_params, widget_params, "1")
+            self.assertIsNot(widget_params, get_widget_request_params(request_params), "2")
+            for _ in range(2):
+                get_query_criteria(AccidentMarkerView, {"road1": 1}, None, None)
+                get_expression_for_segment_junctions(17, AccidentMarkerView)
+            get_query_criteria(AccidentMarkerView, {"road1": 2}, None, None)
+        self.assertEqual(2, calc_query_criteria.call_count, "3")
+        sg.get_segment_junctions.assert_called_once_with(17)
+        get_query_criteria(AccidentMarkerView, {"road1": 1}, None, None)
+        self.assertEqual(3, calc_query_criteria.call_count, "4")
+        self.assertIsNot(widget_params, get_widget_request_params(request_params), "5")
+
+    @patch("anyway.widgets.all_locations_widgets.most_severe_accidents_table_widget.pd")
+    @patch("anyway.widgets.all_locations_widgets.most_severe_accidents_table_widget.get_query")
+    def test_widgets_do_not_share_filters(self, get_query, pd):
+        pd.read_sql_query.return_value.to_dict.return_value = []
+        location_info = {"yishuv_symbol": 5000, "street1": 1}
+        request_params = RequestParams(years_ago=1, location_text="", location_info=location_info,
+                                       resolution=RC.STREET, gps={}, start_time=None,
+                                       end_time=None, lang="he")
+        with request_context(request_params):
+            table = MostSevereAccidentsTableWidget(request_params)
+            day_night = AccidentCountByDayNightWidget(request_params)
+            table.generate_items()
+            filters = get_query.call_args[0][1]
+            self.assertIn("accident_severity", filters, "1")
+            self.assertEqual({"yishuv_symbol": 5000, "street1": 1},
+                             day_night.request_params.location_info, "2")
+        self.assertEqual({"yishuv_symbol": 5000, "street1": 1}, location_info, "3")
+
 
 if __name__ == '__main__':
     unittest.main()
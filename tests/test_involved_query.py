@@ -1,4 +1,9 @@
+import datetime
+import json
 import unittest
+
+from sqlalchemy.dialects import postgresql
+
 from anyway.views.safety_data.involved_query import InvolvedQuery
 from anyway.views.safety_data.involved_query_gb import InvolvedQuery_GB
 from anyway import app as flask_app
@@ -35,6 +40,43 @@ class TestInvolvedQuery(unittest.TestCase):
         self.assertEqual(f((1 << 1) | (1 << 2)), "רכב נוסעים פרטי, טרנזיט")
         self.assertEqual(f((1 << 21) | (1 << 25)), "קורקינט חשמלי, משאית")
 
+    def test_generate_json(self):
+        row = dict(self.involved_result)
+        row.update(
+            {
+                "accident_timestamp": datetime.datetime(2014, 3, 23),
+                "day_in_week_hebrew": 1,
+                "vehicles": 1 << 1,
+                "latitude": 32.0701379776572,
+                "longitude": 34.7978130577587,
+                "injured_type_short_hebrew": 1,
+                "vehicle_vehicle_type_hebrew": 0,
+                "street1_hebrew": None,
+            }
+        )
+        empty_row = dict(
+            row, vehicles=None, latitude=None, longitude=None, vehicle_vehicle_type_hebrew=2
+        )
+        empty_row["TEST-injured_type"] = 3
+        chunks = list(InvolvedQuery().generate_json(iter([[row, empty_row], [row]]), 2, 50))
+
+        self.assertEqual(4, len(chunks))
+        res = json.loads("".join(chunks))
+        self.assertEqual({"page_size": 50, "page_number": 2}, res["pagination"])
+        self.assertEqual(3, len(res["data"]))
+        first = res["data"][0]
+        first.pop("street1_hebrew")
+        self.assertEqual(self.involved_result, first)
+        self.assertEqual(first, {k: v for k, v in res["data"][2].items() if k in first})
+        self.assertEqual("", res["data"][1]["vehicles"])
+        self.assertEqual("", res["data"][1]["latitude"])
+        self.assertEqual("טרנזיט", res["data"][1]["vehicle_type_short_hebrew"])
+
+    def test_get_data_checks_params_before_streaming(self):
+        with flask_app.test_request_context("/involved?unknown=1"):
+            with self.assertRaises(ValueError):
+                InvolvedQuery().get_data()
+
     def test_dictify_double_group_by(self):
         data = [
             ("2021", "Male", 10),
@@ -49,6 +91,29 @@ class TestInvolvedQuery(unittest.TestCase):
         actual = InvolvedQuery_GB.dictify_double_group_by(data)
         self.assertEqual(actual, expected)
 
+    def test_is_covered_by_cube(self):
+        f = InvolvedQuery_GB.is_covered_by_cube
+        self.assertTrue(f({"sy": ["2014"], "sev": ["1", "2"], "vcli": ["1"]}, {"gb": ["sex"]}))
+        self.assertTrue(f({}, {"gb": ["year"], "gb2": ["injt"], "sort": ["d"]}))
+        self.assertFalse(f({"city": ["5000"]}, {"gb": ["year"]}))
+        self.assertFalse(f({"vcl": ["1"]}, {"gb": ["year"]}))
+        self.assertFalse(f({"sy": ["2014"]}, {"gb": ["year"], "gb2": ["st"]}))
+        self.assertFalse(f({"count": []}, {"gb": ["year"]}))
+
+    def test_cube_query(self):
+        vals = {"sy": ["2014"], "sev": ["1", "2"], "vcli": ["1"]}
+        with flask_app.app_context():
+            query, gb, gb2 = InvolvedQuery_GB().get_cube_query(
+                vals, {"gb": ["sex"], "gb2": ["year"], "sort": ["d"]}
+            )
+            sql = str(query.statement.compile(dialect=postgresql.dialect()))
+        self.assertEqual(("sex", "year"), (gb, gb2))
+        self.assertIn("sum(safety_data_involved_cube.count) AS count", sql)
+        self.assertIn("LEFT OUTER JOIN sex ON safety_data_involved_cube.sex = sex.id", sql)
+        self.assertIn("safety_data_involved_cube.injury_severity IN", sql)
+        self.assertIn("(safety_data_involved_cube.vehicles & %(vehicles_1)s) != %(param_1)s", sql)
+        self.assertNotIn("safety_data_involved.", sql)
+
     def test_e2e(self):
         test_client = flask_app.test_client()
 
@@ -0,0 +1,115 @@
+import geohash
+import numpy as np
+import pandas as pd
+import pytest
+from geographiclib.geodesic import Geodesic
+
+from anyway.parsers import locations_index
+from anyway.parsers.location_extraction import get_db_matching_location
+from anyway.parsers.locations_index import LocationsIndex
+from anyway.parsers.resolution_fields import ResolutionFields as RF
+
+
+@pytest.fixture
+def markers():
+    rng = np.random.default_rng(11)
+    size = 3000
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, size + 1),
+            "road1": rng.choice([np.nan, 0, 1, 4, 90], size),
+            "road2": rng.choice([np.nan, 1, 6, 90], size),
+            "non_urban_intersection_hebrew": rng.choice([None, "צומת א"], size),
+            "yishuv_name": rng.choice([None, "", "תל אביב -יפו", "חיפה"], size),
+            "street1_hebrew": rng.choice([None, "", "הרצל", "אלנבי"], size),
+            "street2_hebrew": rng.choice([None, "ביאליק"], size),
+            "district_hebrew": rng.choice([None, "תל אביב"], size),
+            "region_hebrew": rng.choice([None, "מרכז", ""], size),
+            "road_segment_name": rng.choice([None, "א - ב"], size),
+            "longitude": rng.uniform(34.2, 35.6, size),
+            "latitude": rng.uniform(29.5, 33.2, size),
+        }
+    )
+
+
+class FakeDb:
+    def __init__(self, markers):
+        self.markers = markers
+        self.loads = 0
+
+    def get_markers_for_location_extraction(self):
+        self.loads += 1
+        return self.markers.copy()
+
+
+def scan_matching_location(markers, latitude, longitude, resolution, road_no=None):
+    """The full table scan get_db_matching_location did before the index"""
+    geod = Geodesic.WGS84
+    relevant_fields = RF.get_possible_fields(resolution)
+    markers = markers.copy()
+    markers["geohash"] = markers.apply(
+        lambda x: geohash.encode(x["latitude"], x["longitude"], precision=4), axis=1
+    )
+    markers_orig = markers.copy()
+    if resolution != "אחר":
+        if road_no is not None and road_no > 0 and "road1" in relevant_fields:
+            markers = markers.loc[(markers["road1"] == road_no) | (markers["road2"] == road_no)]
+        for field in relevant_fields:
+            if field == "road1":
+                markers = markers.loc[markers[field].notnull()]
+                markers = markers.loc[markers[field] > 0]
+            elif field in ["region_hebrew", "district_hebrew", "yishuv_name", "street1_hebrew"]:
+                markers = markers.loc[markers[field].notnull()]
+                markers = markers.loc[markers[field] != ""]
+    if markers.count()[0] == 0:
+        markers = markers_orig
+    curr_geohash = geohash.encode(latitude, longitude, precision=4)
+    if markers.loc[markers["geohash"] == curr_geohash].count()[0] > 0:
+        markers = markers.loc[markers["geohash"] == curr_geohash].copy()
+    markers["dist_point"] = markers.apply(
+        lambda x: geod.Inverse(latitude, longitude, x["latitude"], x["longitude"])["s12"], axis=1
+    )
+    return markers.loc[markers["dist_point"] == markers["dist_point"].min()].iloc[0]["id"]
+
+
+@pytest.mark.parametrize(
+    "resolution,road_no",
+    [
+        ("רחוב", None),
+        ("עיר", None),
+        ("מחוז", None),
+        ("אחר", None),
+        ("צומת עירוני", 90),
+        ("כביש בינעירוני", 90),
+    ],
+)
+def test_same_matches_as_table_scan(markers, resolution, road_no):
+    index = LocationsIndex(markers)
+    fields = RF.get_possible_fields(resolution)
+    rng = np.random.default_rng(5)
+    for latitude, longitude in zip(rng.uniform(29.4, 33.3, 30), rng.uniform(34.1, 35.7, 30)):
+        if resolution == "אחר":
+            res = index.get_nearest(latitude, longitude)
+        else:
+            res = index.get_matching_location(latitude, longitude, fields, road_no)
+        assert res["id"] == scan_matching_location(
+            markers, latitude, longitude, resolution, road_no
+        )
+
+
+def test_road_filter_falls_back_to_all_locations(markers):
+    index = LocationsIndex(markers)
+    res = index.get_matching_location(32.0, 34.8, ["road1"], road_no=12345)
+    assert res["id"] == scan_matching_location(markers, 32.0, 34.8, "אחר")
+
+
+def test_index_is_loaded_once(markers, monkeypatch):
+    monkeypatch.setattr(locations_index, "locations_index", None)
+    db = FakeDb(markers)
+    first = get_db_matching_location(db, 32.08, 34.78, "רחוב")
+    assert get_db_matching_location(db, 32.08, 34.78, "רחוב") == first
+    assert set(first) == {"yishuv_name", "street1_hebrew"}
+    assert db.loads == 1
+    locations_index.invalidate_locations_index()
+    get_db_matching_location(db, 32.08, 34.78, "רחוב")
+    assert db.loads == 2
@@ -237,5 +237,5 @@ def test_nan_becomes_none_before_insertion(monkeypatch):
         "anyway.parsers.news_flash_db_adapter", MagicMock()
     )
     adapter = DBAdapter(db=db_mock)
-    adapter.insert_new_newsflash(newsflash)
+    adapter.insert_new_newsflashes([newsflash])
     assert newsflash.road1 is None
@@ -145,11 +145,13 @@ class NewsFlashApiTestCase(unittest.TestCase):
         )
         db_mock.session.add(road_segment)
         db_mock.session.commit()
-        with patch("anyway.app_and_db.db", db_mock):
+        with patch("anyway.app_and_db.db", db_mock), \
+                patch("anyway.views.news_flash.api.invalidate_responses_cache") as invalidate:
             with patch("anyway.views.news_flash.api.request", mock_request):
                 id = self.session.query(NewsFlash).all()[0].id
                 return_value = update_news_flash_qualifying(id)
                 self.assertEqual(return_value.status_code, HTTPStatus.OK.value, "1")
+                invalidate.assert_called_once()
 
     def _test_update_news_flash_qualifying_manual_without_location(self):
         """
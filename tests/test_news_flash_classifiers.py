@@ -0,0 +1,345 @@
+import json
+import logging
+import random
+
+import pytest
+
+from anyway.parsers import location_extraction, news_flash_classifiers
+from anyway.parsers.keyword_matcher import KeywordMatcher
+
+# The keyword checks before the compiled matcher, a substring search per keyword
+
+
+def scan_tweet_with_accident_vehicle_and_person(text):
+    if ("הולך רגל" in text or "הולכת רגל" in text or "נהג" in text or "אדם" in text) and (
+        "רכב" in text
+        or "מכונית" in text
+        or "אופנוע" in text
+        or "ג'יפ" in text
+        or "טרקטור" in text
+        or "משאית" in text
+        or "אופניים" in text
+        or "קורקינט" in text
+    ):
+        return True
+    return False
+
+
+def scan_tweet_with_car_accident(text):
+    if "תאונת דרכים" in text or "ת.ד" in text:
+        return True
+    return False
+
+
+def scan_tweet_with_vehicles(text):
+    if (
+        "רכב" in text
+        or "מכונית" in text
+        or "אופנוע" in text
+        or "ג'יפ" in text
+        or "טרקטור" in text
+        or "משאית" in text
+        or "אופניים" in text
+        or "קורקינט" in text
+    ):
+        return True
+    return False
+
+
+def scan_classify_tweets(text):
+    return text.startswith("בשעה") and (
+        scan_tweet_with_accident_vehicle_and_person(text)
+        or scan_tweet_with_car_accident(text)
+        or scan_tweet_with_vehicles(text)
+    )
+
+
+def scan_classify_rss(text):
+    accident_words = ["תאונ", " דרסה ", " דרס ", " נדרס ", " נדרסה "]
+    working_accidents_words = ["תאונת עבודה", "תאונות עבודה"]
+    followup_accidents_words = [
+        "התאונ",
+        "תאונת ה",
+        "פורסם",
+        "הותר לפרסום",
+        "ההרוג",
+        "הפצוע",
+        "מאסר",
+        "נקבע מותו של ה",
+        "נקבע מותו של נהג ה",
+        "נקבע מותה של ה",
+        "נקבע מותה של נהגת ה",
+        "החשד",
+        "חשוד",
+        "רוכב ה",
+        "הורשע",
+        "אשם",
+        "אישום",
+        "מנוחות",
+        "נעצרו",
+        ': "',
+        "התאונה",
+    ]
+    involved_words = [
+        "רכב",
+        "מכונית",
+        "מכוניות",
+        "אוטובוס",
+        "ג'יפ",
+        "משאית",
+        "משאיות",
+        "קטנוע",
+        "טרקטור",
+        "אופנוע",
+        "אופניים",
+        "קורקינט",
+        "הולך רגל",
+        "הולכת רגל",
+        "הולכי רגל",
+    ]
+    hurt_words = [
+        "פגע",
+        "פגיע",
+        "פגוע",
+        "הריג",
+        "הרוג",
+        "נהרג",
+        "פצע",
+        "פציע",
+        "פצוע",
+        "התנגש",
+        "התהפך",
+        "התהפכ",
+        "החליק",
+        "החלק",
+    ]
+    shooting_words = [
+        " ירי ",
+        " ירייה ",
+        " יריות ",
+        'בקת"ב',
+        " מירי ",
+        "תופת",
+        "פיצוץ",
+        "נדקר",
+        "הושלך",
+        "הושלכו",
+        "נרגם",
+        "רצח",
+        "יידוי",
+        "תבערה",
+        "רקטות",
+        "רקטה",
+        " טיל ",
+        " נורתה ",
+        "פיגוע",
+        "נעצר",
+        "מטען חבלה",
+        "פגיעה ישירה",
+    ]
+    shooting_startswith = [" ירי", " ירייה", " יריות"]
+
+    abroad = text.split()[0].endswith(":") or "ישראלי" in text
+    explicit_accident = any([val in text for val in accident_words])
+    not_work_accident = all([val not in text for val in working_accidents_words])
+    not_followup_accident = all([val not in text for val in followup_accidents_words])
+    involved = any([val in text for val in involved_words])
+    hurt = any([val in text for val in hurt_words])
+    no_shooting = all([val not in text for val in shooting_words]) and all(
+        [not text.startswith(val) for val in shooting_startswith]
+    )
+    airplane = any(val in text for val in ["מטוס", "מסוק"])
+
+    return (
+        not abroad
+        and not airplane
+        and ((explicit_accident and not_work_accident) or (involved and hurt))
+        and no_shooting
+        and not_followup_accident
+    )
+
+
+def scan_extract_location_text(text):
+    if text is None:
+        return None
+    filter_ind = float("inf")
+    if text.find(".") != -1:
+        text = text[: text.find(".")]
+    try:
+        if text.find(".") != -1:
+            text = text[: text.find(".")]
+        forbid_words = ["תושב"]
+        hospital_words = ["בבית החולים", "בית חולים", "בית החולים", "מרכז רפואי"]
+        hospital_names = [
+            "שיבא",
+            "וולפסון",
+            "תל השומר",
+            "סוראסקי",
+            "הלל יפה",
+            'רמב"ם',
+            "רמבם",
+            "בני ציון",
+            "רוטשילד",
+            "גליל מערבי",
+            "זיו",
+            "פוריה",
+            "ברזילי",
+            "אסף הרופא",
+            "סורוקה",
+            "רבין",
+            "בלינסון",
+            "גולדה",
+            "כרמל",
+            "עמק",
+            "מאיר",
+            "קפלן",
+            "יוספטל",
+            "הדסה",
+            "שערי צדק",
+            "צאנז",
+            "לניאדו",
+            "אסותא",
+            "מעיני הישועה",
+            "מדיקל סנטר",
+            "איטלקי",
+            "המשפחה הקדושה",
+        ]
+        forbid_words.extend(hospital_words)
+        for forbid_word in forbid_words:
+            found_hospital = False
+            removed_punc = False
+            if forbid_word in text:
+                forbid_ind = text.find(forbid_word)
+                for punc_to_try in [",", " - "]:
+                    punc_before_ind = text.find(punc_to_try, 0, forbid_ind)
+                    punc_after_ind = text.find(punc_to_try, forbid_ind)
+                    if punc_before_ind != -1 or punc_after_ind != -1:
+                        if punc_before_ind == -1:
+                            text = text[(punc_after_ind + 1) :]
+                        elif punc_after_ind == -1:
+                            text = text[:punc_before_ind]
+                        else:
+                            text = text[:punc_before_ind] + " " + text[(punc_after_ind + 1) :]
+                        removed_punc = True
+                        break
+                if (not removed_punc) and (forbid_word in hospital_words):
+                    for hospital_name in hospital_names:
+                        hospital_ind = text.find(hospital_name)
+                        if (
+                            hospital_ind == forbid_ind + len(forbid_word) + 1
+                            or hospital_ind == forbid_ind + len(forbid_word) + 2
+                        ):
+                            text = (
+                                text[:hospital_ind] + text[hospital_ind + len(hospital_name) + 1 :]
+                            )
+                            forbid_ind = text.find(forbid_word)
+                            text = text[:forbid_ind] + text[forbid_ind + len(forbid_word) + 1 :]
+                            found_hospital = True
+                if (not found_hospital) and (not removed_punc):
+                    text = (
+                        text[:forbid_ind]
+                        + text[text.find(" ", forbid_ind + len(forbid_word) + 2) :]
+                    )
+
+    except Exception as _:
+        logging.exception("could not filter text {0}".format(text))
+
+    loc_tokens = [
+        "כביש",
+        "שדרות",
+        "רחוב",
+        "מחלף",
+        "צומת",
+        "יישוב",
+        "מושב",
+        "קיבוץ",
+        "התנחלות",
+        "שכונת",
+        "בדרך",
+    ]
+    for token in loc_tokens:
+        i = text.find(token)
+        if i >= 0:
+            filter_ind = min(filter_ind, i)
+
+    near_tokens = ["סמוך ל", "ליד ה"]  # maybe add: "ליד "
+    for token in near_tokens:
+        i = text.find(token)
+        if i >= 0:
+            filter_ind = min(filter_ind, i + len(token))
+
+    if filter_ind != float("inf"):
+        text = text[filter_ind:]
+
+    for token in near_tokens:
+        i = text.find(token)
+        if i >= 0:
+            text = text[:i] + token + text[i + len(token) :]
+    return text
+
+
+def read_corpus():
+    with open("tests/accidents_definitional_ynet.tsv", encoding="utf8") as f:
+        titles = [line.split("\t")[0] for line in f.read().split("\n")]
+    with open("tests/twitter.json") as f:
+        tweets = [tweet["full_text"] for tweet in json.load(f)]
+    words = sorted(
+        set(news_flash_classifiers.tweets_matcher.keyword_groups).union(
+            news_flash_classifiers.rss_matcher.keyword_groups,
+            location_extraction.location_text_matcher.keyword_groups,
+            location_extraction.HOSPITAL_NAMES,
+        )
+    )
+    # texts of the keywords and titles words, for the overlaps of keywords
+    rng = random.Random(7)
+    title_words = " ".join(titles).split()
+    mixed = []
+    for _ in range(3000):
+        parts = rng.sample(words, rng.randint(1, 5)) + rng.sample(title_words, rng.randint(1, 8))
+        rng.shuffle(parts)
+        mixed.append(rng.choice([" ", "", ", ", " - "]).join(parts))
+    return titles + tweets + mixed
+
+
+CORPUS = read_corpus()
+
+
+def test_classify_rss_same_as_scan():
+    for text in CORPUS:
+        assert news_flash_classifiers.classify_rss(text) == scan_classify_rss(text), text
+
+
+def test_classify_tweets_same_as_scan():
+    for text in CORPUS:
+        for tweet in [text, "בשעה " + text]:
+            assert news_flash_classifiers.classify_tweets(tweet) == scan_classify_tweets(tweet)
+            for name in [
+                "tweet_with_accident_vehicle_and_person",
+                "tweet_with_car_accident",
+                "tweet_with_vehicles",
+            ]:
+                actual = getattr(news_flash_classifiers, name)(tweet)
+                assert actual == globals()[f"scan_{name}"](tweet), (name, tweet)
+
+
+def test_extract_location_text_same_as_scan():
+    for text in CORPUS:
+        actual = location_extraction.extract_location_text(text)
+        assert actual == scan_extract_location_text(text), text
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("", {}),
+        ("התאונה", {"התאונ": 0, "התאונה": 0, "תאונ": 1}),
+        ("אבגד גד", {"גד": 2, "אבגד": 0, "בג": 1}),
+        ("aaa", {"a": 0, "aa": 0}),
+        ("ת.ד ותד", {"ת.ד": 0}),
+    ],
+)
+def test_keyword_matcher_finds_overlapping_keywords(text, expected):
+    matcher = KeywordMatcher(
+        {"x": ["התאונ", "תאונ", "התאונה", "גד", "אבגד", "a", "aa"], "y": ["בג", "ת.ד"]}
+    )
+    assert matcher.find(text) == expected
@@ -0,0 +1,93 @@
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from anyway.models import NewsFlash
+from anyway.parsers import news_flash
+from anyway.parsers.news_flash_db_adapter import DBAdapter
+
+
+def newsflash(source, link, **kwargs):
+    return NewsFlash(source=source, link=link, accident=False, **kwargs)
+
+
+def test_filter_new_newsflashes_in_one_query():
+    db_mock = MagicMock()
+    db_mock.session.query.return_value.filter.return_value.all.return_value = [("walla", "a")]
+    adapter = DBAdapter(db=db_mock)
+    items = [
+        newsflash("walla", "a"),
+        newsflash("walla", "b"),
+        newsflash("walla", "b"),
+        newsflash("ynet", "a"),
+    ]
+
+    res = adapter.filter_new_newsflashes(items)
+    assert res == [items[1], items[3]]
+    assert db_mock.session.query.call_count == 1
+
+
+def test_insert_new_newsflashes_in_one_statement():
+    db_mock = MagicMock()
+    db_mock.session.execute.return_value = [(7, "walla", "b")]
+    adapter = DBAdapter(db=db_mock)
+    items = [newsflash("walla", "a", road1=np.nan), newsflash("walla", "b")]
+
+    assert adapter.insert_new_newsflashes(items) == [items[1]]
+    assert items[0].road1 is None
+    assert items[0].id is None
+    assert items[1].id == 7
+    (query,), _ = db_mock.session.execute.call_args
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (source, link) DO NOTHING" in sql
+    assert "DEFAULT" in sql
+    assert "RETURNING news_flash.id, news_flash.source, news_flash.link" in sql
+    db_mock.session.commit.assert_called_once()
+
+
+def test_insert_new_newsflashes_without_link():
+    db_mock = MagicMock()
+    db_mock.session.execute.return_value = [(7, "walla", "a")]
+    adapter = DBAdapter(db=db_mock)
+    items = [newsflash("twitter", None), newsflash("walla", "a"), newsflash("twitter", None)]
+
+    assert adapter.insert_new_newsflashes(items) == items
+    assert items[1].id == 7
+    (query,), _ = db_mock.session.execute.call_args
+    params = query.compile(dialect=postgresql.dialect()).params
+    assert [params[key] for key in params if key.startswith("link")] == ["a"]
+    db_mock.session.add_all.assert_called_once_with([items[0], items[2]])
+
+
+class FakeDb:
+    def __init__(self, stored):
+        self.stored = set(stored)
+        self.inserted = []
+        self.removed_sessions = 0
+        self.lock = threading.Lock()
+
+    def filter_new_newsflashes(self, newsflashes):
+        return [n for n in newsflashes if (n.source, n.link) not in self.stored]
+
+    def insert_new_newsflashes(self, newsflashes):
+        self.inserted.append([n.link for n in newsflashes])
+
+    def remove_session(self):
+        with self.lock:
+            self.removed_sessions += 1
+
+
+def test_ingest_newsflashes_in_batches(monkeypatch):
+    monkeypatch.setattr(news_flash, "NEWSFLASH_BATCH_SIZE", 3)
+    db = FakeDb(stored=[("walla", "1"), ("walla", "4")])
+    items = [newsflash("walla", str(i)) for i in range(7)]
+
+    def process(item):
+        item.accident = int(item.link) % 2 == 0
+
+    news_flash.ingest_newsflashes(db, iter(items), process)
+    assert db.inserted == [["0", "2"], ["3", "5"], ["6"]]
+    assert [item.accident for item in items] == [True, False, True, False, False, False, True]
+    assert db.removed_sessions == 5
@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from anyway import globalmaptiles as globaltiles
+from anyway.pymapcluster import (
+    calculate_clusters,
+    center_geolocation,
+    grid_cell_coordinates,
+    grid_cell_latlng_bounds,
+)
+
+Marker = namedtuple("Marker", ["latitude", "longitude"])
+
+
+def test_calculate_clusters_empty():
+    assert calculate_clusters([], 10) == []
+
+
+def test_calculate_clusters_sizes_sum_to_number_of_markers():
+    markers = [Marker(32.0 + i * 0.01, 34.8 + i * 0.007) for i in range(200)]
+    for zoom in (8, 11, 16):
+        clusters = calculate_clusters(markers, zoom)
+        assert sum(cluster["size"] for cluster in clusters) == len(markers)
+
+
+def test_calculate_clusters_separates_far_markers():
+    tel_aviv = [Marker(32.0853, 34.7818), Marker(32.0854, 34.7819)]
+    eilat = [Marker(29.5577, 34.9519)]
+    clusters = calculate_clusters(tel_aviv + eilat, 10)
+    assert sorted(cluster["size"] for cluster in clusters) == [1, 2]
+
+
+def test_calculate_clusters_center_is_centroid():
+    markers = [Marker(32.0853, 34.7818), Marker(32.0855, 34.7822), Marker(32.0857, 34.7820)]
+    (cluster,) = calculate_clusters(markers, 10)
+    center_lat, center_lng = center_geolocation([(m.latitude, m.longitude) for m in markers])
+    assert cluster["size"] == 3
+    assert cluster["latitude"] == pytest.approx(center_lat)
+    assert cluster["longitude"] == pytest.approx(center_lng)
+    assert cluster["latitude"] == pytest.approx(32.0855, abs=1e-6)
+    assert cluster["longitude"] == pytest.approx(34.7820, abs=1e-6)
+
+
+def test_grid_cell_latlng_bounds():
+    mercator = globaltiles.GlobalMercator()
+    cell_x, cell_y = grid_cell_coordinates(mercator, np.array([32.08]), np.array([34.78]), 10)
+    sw_lat, sw_lng, ne_lat, ne_lng = grid_cell_latlng_bounds(mercator, cell_x[0], cell_y[0], 10)
+    assert sw_lat < 32.08 < ne_lat and sw_lng < 34.78 < ne_lng
+    corners_x, corners_y = grid_cell_coordinates(
+        mercator,
+        np.array([sw_lat + 1e-9, ne_lat - 1e-9]),
+        np.array([sw_lng + 1e-9, ne_lng - 1e-9]),
+        10,
+    )
+    assert list(corners_x) == [cell_x[0]] * 2 and list(corners_y) == [cell_y[0]] * 2
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+import pytest
+
+from anyway import app as flask_app
+from anyway.infographics_response_cache import InMemoryKeyValueStore, set_shared_store
+from anyway.views.safety_data import sd_cache
+from anyway.views.safety_data.involved_query_gb import InvolvedQuery_GB
+from anyway.views.safety_data.sd_cache import (
+    get_cache_key,
+    get_cached_result,
+    invalidate_results_cache,
+    set_cached_result,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    sd_cache.results_cache.clear()
+    set_shared_store(None)
+    yield
+    sd_cache.results_cache.clear()
+    set_shared_store(None)
+
+
+def test_get_cache_key_normalizes_filter_values():
+    params = {"city": ["5000", "1"], "sy": ["2014"], "gb": ["year"], "sort": ["d"]}
+    assert get_cache_key(params) == get_cache_key(
+        {"gb": ["year"], "sort": ["d"], "sy": ["2014"], "city": ["1", "5000"]}
+    )
+    assert get_cache_key(params) != get_cache_key(dict(params, gb=["city"]))
+    assert get_cache_key(params) != get_cache_key(dict(params, city=["5000"]))
+
+
+def test_invalidate_results_cache(monkeypatch):
+    set_cached_result("a", [1])
+    assert get_cached_result("a") == [1]
+    invalidate_results_cache()
+    assert get_cached_result("a") is None
+
+    set_cached_result("a", [1])
+    monkeypatch.setattr(sd_cache, "RESULTS_CACHE_TTL_SECONDS", -1)
+    assert get_cached_result("a") is None
+
+
+def test_shared_generation():
+    store = InMemoryKeyValueStore()
+    set_shared_store(store)
+    set_cached_result("a", [1])
+    assert get_cached_result("a") == [1]
+    # another process loaded the safety data
+    store.incr(sd_cache.GENERATION_KEY)
+    assert get_cached_result("a") is None
+
+
+def test_involved_groupby_uses_cache():
+    with patch.object(InvolvedQuery_GB, "calc_data", return_value=[{"_id": 2014, "count": 3}]):
+        with flask_app.test_request_context("/involved/groupby?gb=year&city=5000,1"):
+            assert InvolvedQuery_GB().get_data() == [{"_id": 2014, "count": 3}]
+        with flask_app.test_request_context("/involved/groupby?city=1,5000&gb=year"):
+            assert InvolvedQuery_GB().get_data() == [{"_id": 2014, "count": 3}]
+        assert InvolvedQuery_GB.calc_data.call_count == 1
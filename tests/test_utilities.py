@@ -1,5 +1,16 @@
 from anyway import config
-from anyway.utilities import is_valid_number, is_a_safe_redirect_url
+from unittest.mock import MagicMock
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+
+from anyway.models import AccidentMarker
+from anyway.utilities import (
+    is_valid_number,
+    is_a_safe_redirect_url,
+    copy_data_to_table,
+    get_copy_data,
+    run_query_and_insert_to_table_in_chunks,
+)
 
 
 # The main logic is implemented in external library, the only reason for this test is to make sure that this library
@@ -124,3 +135,54 @@ def test_url_redirect_checker_dev():
 
     for url in good_urls:
         assert is_a_safe_redirect_url(url)
+
+
+def test_copy_data_to_table():
+    copied = {}
+
+    def copy_expert(sql, buffer):
+        copied["sql"] = sql
+        copied["data"] = buffer.read()
+
+    conn = MagicMock()
+    conn.connection.cursor.return_value.copy_expert.side_effect = copy_expert
+    rows = [
+        {"id": 1, "mainStreet": "הרצל, 1", "geom": "SRID=4326;POINT(34.7 32.1)"},
+        {"id": 2, "mainStreet": None, "geom": ""},
+    ]
+
+    columns = ["id", "mainStreet", "geom"]
+    copy_data_to_table(conn, AccidentMarker, columns, get_copy_data(rows, columns))
+    assert copied["sql"] == (
+        'COPY markers ("id", "mainStreet", "geom") FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'
+    )
+    assert copied["data"] == '1,"הרצל, 1",SRID=4326;POINT(34.7 32.1)\r\n2,\\N,\r\n'
+    conn.connection.cursor.return_value.close.assert_called_once()
+
+
+def test_copy_data_of_whole_floats():
+    rows = [{"id": 1.0, "engine_volume": 6.0, "x": 180000.5}]
+    assert get_copy_data(rows, ["id", "engine_volume", "x"]) == "1,6,180000.5\r\n"
+
+
+def test_run_query_and_insert_to_table_in_chunks():
+    metadata = MetaData()
+    source = Table("source", metadata, Column("id", Integer), Column("value", Integer))
+    target = Table("target", metadata, Column("id", Integer), Column("double_value", Integer))
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    # repeated ids stay in the same chunk
+    ids = [1, 2, 2, 2, 2, 5, 8, 9, 9, 13, 14]
+    target_table = MagicMock(__table__=target, __tablename__="target")
+    query = select([source.c.id, (source.c.value * 2).label("double_value")]).where(
+        source.c.value != 0
+    )
+
+    with engine.begin() as conn:
+        conn.execute(source.insert(), [{"id": id_, "value": id_} for id_ in ids + [20]])
+        conn.execute(source.insert(), [{"id": 3, "value": 0}])
+        inserted = run_query_and_insert_to_table_in_chunks(query, target_table, source.c.id, 3, conn)
+        rows = conn.execute(select([target]).order_by(target.c.id)).fetchall()
+
+    assert inserted == len(ids) + 1
+    assert [tuple(row) for row in rows] == [(id_, id_ * 2) for id_ in sorted(ids + [20])]
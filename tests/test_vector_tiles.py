@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+from anyway import vector_tiles
+from anyway.vector_tiles import (
+    get_cached_tile,
+    get_filter_hash,
+    get_tile_latlng_bounds,
+    is_valid_tile,
+    set_cached_tile,
+)
+
+
+def test_get_tile_latlng_bounds():
+    assert get_tile_latlng_bounds(0, 0, 0) == pytest.approx(
+        (-85.0511287798, -180.0, 85.0511287798, 180.0)
+    )
+    # tel aviv is in the north-east quarter of the world, the top right tile in zoom 1
+    sw_lat, sw_lng, ne_lat, ne_lng = get_tile_latlng_bounds(1, 1, 0)
+    assert sw_lat == pytest.approx(0) and sw_lng == pytest.approx(0)
+    assert ne_lat > 32.08 and ne_lng > 34.78
+
+
+def test_is_valid_tile():
+    assert is_valid_tile(0, 0, 0)
+    assert is_valid_tile(22, 2**22 - 1, 0)
+    assert not is_valid_tile(1, 2, 0)
+    assert not is_valid_tile(1, 0, 2)
+    assert not is_valid_tile(23, 0, 0)
+    assert not is_valid_tile(1000, 0, 0)
+
+
+def test_get_filter_hash_ignores_tile_args():
+    filters = {"show_fatal": True, "start_date": datetime.date(2020, 1, 1)}
+    assert get_filter_hash(dict(filters, zoom=10, ne_lat=1.0)) == get_filter_hash(
+        dict(filters, zoom=12, ne_lat=2.0)
+    )
+    assert get_filter_hash(filters) != get_filter_hash(dict(filters, show_fatal=False))
+
+
+def test_tiles_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(vector_tiles, "TILE_CACHE_MAX_SIZE", 2)
+    monkeypatch.setattr(vector_tiles, "tiles_cache", vector_tiles.OrderedDict())
+    set_cached_tile("a", b"1")
+    set_cached_tile("b", b"2")
+    assert get_cached_tile("a") == b"1"
+    set_cached_tile("c", b"3")
+    assert get_cached_tile("b") is None
+    assert get_cached_tile("a") == b"1"
+    assert get_cached_tile("c") == b"3"
+
+
+def test_tiles_cache_expires(monkeypatch):
+    monkeypatch.setattr(vector_tiles, "TILE_CACHE_TTL_SECONDS", -1)
+    monkeypatch.setattr(vector_tiles, "tiles_cache", vector_tiles.OrderedDict())
+    set_cached_tile("a", b"1")
+    assert get_cached_tile("a") is None